@@ -0,0 +1,148 @@
+"""校验与分发的单条开销：对比改造前的 if/elif 实现与现在的 skill 注册表。
+
+    validate   /command 入口的完整参数校验（改造前为 validate_command + skill 内部的检查）
+    dispatch   按 action 找到 handler 并调用（用 ping / noop 排除 skill 本身的耗时）
+    execute    现在的 Executor.execute 全程（计时、组装结果），作参考；
+               admitted 为经 HTTP 入口校验后入队的任务，replayed 为 journal 回放、执行前复查参数
+    import     新进程里导入入口模块的耗时；handler 模块现在首次执行时才导入
+
+参考结果：查表校验比改造前的 if 链每条慢约 0.3–0.5 µs，dispatch 两者在误差范围内。
+
+用法：
+    python benchmarks/bench_dispatch.py --iterations 200000
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from actions import validate_command  # noqa: E402
+from cancellation import CancelEvent  # noqa: E402
+from executor import Executor  # noqa: E402
+from skill_registry import SKILLS  # noqa: E402
+from skills import SkillResult, noop, ping  # noqa: E402
+
+COMMANDS = [
+    {"action": "ping", "params": {}},
+    {"action": "sleep", "params": {"ms": 100}},
+    {"action": "notify", "params": {"title": "build", "message": "finished in 42s"}},
+    {"action": "open_url", "params": {"url": "https://example.com/some/path"}},
+    {"action": "open_app", "params": {"app_name": "Notes"}},
+]
+ALLOWED_APPS = {"Notes", "Safari", "Google Chrome", "Terminal", "Visual Studio Code"}
+URL_PATTERN = re.compile(r"^https?://", re.IGNORECASE)
+LEGACY_ACTIONS = {"ping", "noop", "stop", "open_app", "open_url", "notify", "screenshot", "sleep"}
+
+
+def legacy_validate(payload):
+    """改造前：validate_command 的最小校验，加上执行时 skill 函数里的检查。"""
+    if not isinstance(payload, dict):
+        return False, "body_must_be_object"
+    action = payload.get("action")
+    params = payload.get("params")
+    if not isinstance(action, str) or not action.strip():
+        return False, "action_required"
+    if action not in LEGACY_ACTIONS:
+        return False, "action_not_allowed"
+    if not isinstance(params, dict):
+        return False, "params_must_be_object"
+    if action == "open_app":
+        app_name = params.get("app_name")
+        if not isinstance(app_name, str) or not app_name.strip():
+            return False, "open_app_requires_app_name"
+        if app_name not in ALLOWED_APPS:
+            return False, "app_not_allowed"
+    if action == "open_url":
+        url = params.get("url")
+        if not isinstance(url, str) or not url.strip():
+            return False, "open_url_requires_url"
+        if len(url) > 2048:
+            return False, "url_too_long"
+        if not URL_PATTERN.match(url):
+            return False, "url_not_allowed"
+    if action == "notify":
+        title = params.get("title")
+        message = params.get("message")
+        if not isinstance(title, str) or not title.strip():
+            return False, "notify_requires_title"
+        if not isinstance(message, str) or not message.strip():
+            return False, "notify_requires_message"
+        if len(title) > 80:
+            return False, "title_too_long"
+        if len(message) > 200:
+            return False, "message_too_long"
+    if action == "screenshot" and params:
+        return False, "screenshot_params_must_be_empty"
+    if action == "sleep":
+        ms = params.get("ms")
+        if not isinstance(ms, int):
+            return False, "sleep_requires_ms"
+        if ms < 0 or ms > 5000:
+            return False, "ms_out_of_range"
+    return True, ""
+
+
+def legacy_dispatch(action, params, cancel_event) -> SkillResult:
+    if action == "ping":
+        return ping(params, None, cancel_event)
+    elif action == "noop":
+        return noop(params, None, cancel_event)
+    raise ValueError(action)
+
+
+def per_call_ns(func, items, iterations: int) -> float:
+    started = time.perf_counter()
+    for index in range(iterations):
+        func(items[index % len(items)])
+    return (time.perf_counter() - started) / iterations * 1e9
+
+
+def import_ms(module: str, repeats: int = 5) -> float:
+    code = (
+        f"import sys, time; sys.path.insert(0, {SRC!r}); "
+        f"t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    )
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout))
+    return min(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for name, func in (("legacy", legacy_validate), ("registry", validate_command)):
+        assert all(func(command)[0] for command in COMMANDS)
+        print(f"validate  {name:>9}  {per_call_ns(func, COMMANDS, args.iterations):8.0f} ns/command")
+
+    cancel_event = CancelEvent()
+    light = [{"action": "ping", "params": {}}, {"action": "noop", "params": {}}]
+    executor = Executor()
+    for name, func in (
+        ("legacy", lambda command: legacy_dispatch(command["action"], command["params"], cancel_event)),
+        (
+            "registry",
+            lambda command: SKILLS[command["action"]].handler()(command["params"], None, cancel_event),
+        ),
+    ):
+        print(f"dispatch  {name:>9}  {per_call_ns(func, light, args.iterations):8.0f} ns/command")
+    for name, validated in (("admitted", True), ("replayed", False)):
+        execute = lambda command: executor.execute(  # noqa: E731
+            command["action"], command["params"], cancel_event, validated=validated
+        )
+        print(f"execute   {name:>9}  {per_call_ns(execute, light, args.iterations):8.0f} ns/command")
+
+    for module in ("actions", "skills"):
+        print(f"import    {module:>9}  {import_ms(module):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""本地快速匹配的命中率与耗时。
+
+用法：
+    python benchmarks/bench_fast_path.py [--corpus benchmarks/nl_corpus.jsonl]
+
+expected 为 null 的条目应交给 LLM（快速匹配返回 None 才算正确）。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from phrase_matcher import match_phrase  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nl_corpus.jsonl")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as handle:
+        corpus = [json.loads(line) for line in handle if line.strip()]
+
+    hits = 0
+    wrong = []
+    for item in corpus:
+        matched = match_phrase(item["text"])
+        if matched is not None:
+            hits += 1
+            if matched != item["expected"]:
+                wrong.append(item["text"])
+
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for item in corpus:
+            match_phrase(item["text"])
+    per_call_us = (time.perf_counter() - started) / (args.rounds * len(corpus)) * 1e6
+
+    matchable = sum(1 for item in corpus if item["expected"] is not None)
+    print(f"corpus={len(corpus)}  matchable={matchable}")
+    print(f"fast-path hits={hits}  hit_rate={hits / len(corpus):.1%}  "
+          f"hit_rate_of_matchable={hits / matchable:.1%}")
+    print(f"wrong_matches={len(wrong)} {wrong}")
+    print(f"mean_latency={per_call_us:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
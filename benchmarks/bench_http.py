@@ -0,0 +1,131 @@
+"""HTTP 前端压测：50 个客户端轮询 /status 时的吞吐与 /stop 延迟。
+
+轮询客户端跑在独立进程里，避免与服务端线程争抢同一个 GIL。
+
+用法：
+    python benchmarks/bench_http.py --clients 50 --duration 5
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import server  # noqa: E402
+
+TOKEN = "bench-token"
+HEADERS = {"Authorization": f"Bearer {TOKEN}"}
+
+
+class LegacyHandler(server.SimpleHandler):
+    protocol_version = "HTTP/1.0"
+
+
+def _start(mode: str):
+    if mode == "legacy":
+        httpd = HTTPServer(("127.0.0.1", 0), LegacyHandler)
+    else:
+        httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def _poll_status(port: int, stop_event: threading.Event, counts: list, index: int) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while not stop_event.is_set():
+        try:
+            conn.request("GET", "/status", headers=HEADERS)
+            conn.getresponse().read()
+            counts[index] += 1
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.close()
+
+
+def _measure_stop(port: int, stop_event: threading.Event, latencies: list) -> None:
+    while not stop_event.is_set():
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("POST", "/stop", headers=HEADERS)
+        conn.getresponse().read()
+        conn.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+        stop_event.wait(0.2)
+
+
+def _run_pollers(port: int, clients: int, duration: float, results) -> None:
+    stop_event = threading.Event()
+    counts = [0] * clients
+    threads = [
+        threading.Thread(target=_poll_status, args=(port, stop_event, counts, index), daemon=True)
+        for index in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    results.put(sum(counts))
+
+
+def run(mode: str, clients: int, duration: float) -> dict:
+    httpd = _start(mode)
+    port = httpd.server_address[1]
+    stop_event = threading.Event()
+    latencies: list = []
+    results = multiprocessing.Queue()
+
+    pollers = multiprocessing.Process(target=_run_pollers, args=(port, clients, duration, results))
+    pollers.start()
+    # 等轮询客户端全部连上后再开始测 /stop
+    time.sleep(0.5)
+    stopper = threading.Thread(target=_measure_stop, args=(port, stop_event, latencies), daemon=True)
+    stopper.start()
+    total = results.get()
+    stop_event.set()
+    stopper.join(timeout=5)
+    pollers.join()
+    httpd.shutdown()
+    httpd.server_close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "clients": clients,
+        "requests_per_sec": round(total / duration, 1),
+        "stop_p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "stop_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2) if latencies else None,
+        "stop_max_ms": round(latencies[-1], 2) if latencies else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--mode", choices=("legacy", "concurrent", "both"), default="both")
+    args = parser.parse_args()
+
+    server.AUTH_TOKEN = TOKEN
+    server.SimpleHandler.log_message = lambda *a: None
+    modes = ("legacy", "concurrent") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        result = run(mode, args.clients, args.duration)
+        print(
+            f"{result['mode']:>10}  clients={result['clients']}  "
+            f"req/s={result['requests_per_sec']}  "
+            f"stop p50={result['stop_p50_ms']}ms p99={result['stop_p99_ms']}ms "
+            f"max={result['stop_max_ms']}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
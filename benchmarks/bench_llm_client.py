@@ -0,0 +1,69 @@
+"""连接池客户端 vs 每次新建连接（旧实现 urllib.request.urlopen）的对比。
+
+对本地桩服务（tests/llm_stub.py）发送请求，可用 --latency 模拟上游耗时。
+桩服务是明文 HTTP；线上为 HTTPS，每次新建连接还要多一次 TLS 握手，差距会更大。
+
+用法：
+    python benchmarks/bench_llm_client.py --requests 500 --latency 0
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from llm_client import LLMClient  # noqa: E402
+from llm_stub import StubLLMServer  # noqa: E402
+
+PAYLOAD = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "测试一下"}]}
+
+
+def _per_call(base_url: str) -> None:
+    request = urllib.request.Request(
+        f"{base_url}/chat/completions",
+        data=json.dumps(PAYLOAD).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=20) as response:
+        json.loads(response.read().decode("utf-8"))
+
+
+def _measure(name: str, call, count: int, stub: StubLLMServer) -> None:
+    connections_before = stub.connections
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(
+        f"{name:>9}  mean={sum(latencies) / count:.3f}ms  "
+        f"p50={latencies[count // 2]:.3f}ms  p99={latencies[int(count * 0.99) - 1]:.3f}ms  "
+        f"connections={stub.connections - connections_before}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency in seconds")
+    args = parser.parse_args()
+
+    stub = StubLLMServer(latency=args.latency).start()
+    client = LLMClient(stub.base_url)
+    try:
+        _measure("per-call", lambda: _per_call(stub.base_url), args.requests, stub)
+        _measure("pooled", lambda: client.post_json("/chat/completions", PAYLOAD), args.requests, stub)
+    finally:
+        client.close()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Agent 服务端负载压测：进程内启动 server，并发客户端混合调用各接口，结果输出为 JSON。
+
+- 客户端跑在独立进程里（每个客户端一个线程、一条 keep-alive 连接），不与服务端争抢 GIL。
+- 所有 skill 走真实的 Executor / skills 校验逻辑，但子进程调用被 StubRunner 替换，
+  Linux 上无需 macOS 工具即可运行。
+- STOP 传播时间：主进程定期发 POST /stop，计时到发送时正在执行的任务
+  全部在服务端实际结束为止。
+- 内存：按固定间隔采样进程 RSS，报告增长量。
+
+用法：
+    python benchmarks/bench_load.py --clients 20 --duration 10 \\
+        --mix command=40,status=40,logs=15,stop=5 --output result.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import server  # noqa: E402
+from actions import ACTION_LANES  # noqa: E402
+from executor import Executor  # noqa: E402
+from queue_manager import QueueManager  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+from skill_runner import RunOutcome  # noqa: E402
+
+TOKEN = "bench-token"
+HEADERS = {"Authorization": f"Bearer {TOKEN}", "Content-Type": "application/json"}
+ENDPOINTS = ("command", "status", "logs", "stop")
+# screenshot 会写文件，压测不用
+COMMANDS = (
+    {"action": "ping", "params": {}},
+    {"action": "noop", "params": {}},
+    {"action": "notify", "params": {"title": "bench", "message": "load test"}},
+    {"action": "open_url", "params": {"url": "https://example.com/"}},
+    {"action": "open_app", "params": {"app_name": "Safari"}},
+    {"action": "sleep", "params": {"ms": 20}},
+)
+
+
+class StubRunner:
+    """替代 SkillRunner：不启动子进程，只模拟工具耗时，STOP 时立即返回。"""
+
+    def __init__(self, latency: float) -> None:
+        self._latency = latency
+
+    def binary(self, name: str) -> str:
+        return name
+
+    def run(self, argv: List[str], cancel_event, timeout: float) -> RunOutcome:
+        if cancel_event.wait(min(self._latency, timeout)):
+            return RunOutcome(returncode=None, cancelled=True, terminate_ms=0)
+        return RunOutcome(returncode=0)
+
+
+def _parse_mix(raw: str) -> Dict[str, int]:
+    mix: Dict[str, int] = {}
+    for item in raw.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint in mix: {name}")
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("mix weights must not all be zero")
+    return mix
+
+
+def _percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(samples)
+
+    def pick(quantile: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * quantile))], 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # 非 Linux 只能拿到峰值（macOS 单位为字节，Linux 为 KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def _client(port: int, mix: Dict[str, int], seed: int, stop_at: float, out: Dict[str, Any]) -> None:
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.time() < stop_at:
+        name = rng.choices(names, weights)[0]
+        if name == "command":
+            method, path, body = "POST", "/command", json.dumps(rng.choice(COMMANDS))
+        elif name == "status":
+            method, path, body = "GET", "/status", None
+        elif name == "logs":
+            method, path, body = "GET", "/logs?limit=100", None
+        else:
+            method, path, body = "POST", "/stop", None
+
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=HEADERS)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if ok:
+            out["latencies"][name].append(elapsed_ms)
+        else:
+            out["errors"][name] += 1
+    conn.close()
+
+
+def _run_clients(port: int, clients: int, mix: Dict[str, int], duration: float, seed: int, results) -> None:
+    stop_at = time.time() + duration
+    outputs = [
+        {"latencies": {name: [] for name in ENDPOINTS}, "errors": {name: 0 for name in ENDPOINTS}}
+        for _ in range(clients)
+    ]
+    threads = [
+        threading.Thread(target=_client, args=(port, mix, seed + index, stop_at, outputs[index]), daemon=True)
+        for index in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = {"latencies": {name: [] for name in ENDPOINTS}, "errors": {name: 0 for name in ENDPOINTS}}
+    for output in outputs:
+        for name in ENDPOINTS:
+            merged["latencies"][name].extend(output["latencies"][name])
+            merged["errors"][name] += output["errors"][name]
+    results.put(merged)
+
+
+def _probe_stop(port: int, interval: float, done: threading.Event, samples: List[float]) -> None:
+    # 服务端在同一进程，直接观察 STOP 前正在执行的任务何时真正结束
+    manager = server.QUEUE_MANAGER
+    while not done.wait(interval):
+        running = [task["id"] for task in manager.status()["running"]]
+        if not running:
+            continue
+
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("POST", "/stop", headers=HEADERS)
+        conn.getresponse().read()
+        conn.close()
+        deadline = time.monotonic() + 5.0
+        while any((manager.get_task(task_id) or {}).get("finished_at") is None for task_id in running):
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.0005)
+        else:
+            samples.append((time.perf_counter() - started) * 1000)
+
+
+def _sample_memory(started: float, interval: float, done: threading.Event, samples: List[Dict[str, Any]]) -> None:
+    while True:
+        status = server.QUEUE_MANAGER.status()
+        samples.append(
+            {
+                "t": round(time.perf_counter() - started, 3),
+                "rss_bytes": _rss_bytes(),
+                "queued": len(status["queued"]),
+                "last_log_seq": server.QUEUE_MANAGER.last_log_seq(),
+            }
+        )
+        if done.wait(interval):
+            return
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server.AUTH_TOKEN = TOKEN
+    server.SimpleHandler.log_message = lambda *a: None
+    # 压测本身就是高频客户端，关闭限流
+    server.RATE_LIMITER = RateLimiter(0, 0)
+    server.QUEUE_MANAGER = QueueManager(
+        lanes=ACTION_LANES,
+        executor=Executor(runner=StubRunner(args.skill_latency_ms / 1000.0)),
+    )
+    httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    done = threading.Event()
+    stop_samples: List[float] = []
+    memory_samples: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    background = [
+        threading.Thread(target=_sample_memory, args=(started, args.sample_interval, done, memory_samples), daemon=True),
+        threading.Thread(target=_probe_stop, args=(port, args.stop_interval, done, stop_samples), daemon=True),
+    ]
+    for thread in background:
+        thread.start()
+
+    results = multiprocessing.Queue()
+    clients = multiprocessing.Process(
+        target=_run_clients,
+        args=(port, args.clients, args.mix, args.duration, args.seed, results),
+    )
+    clients.start()
+    merged = results.get()
+    clients.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    for thread in background:
+        thread.join(timeout=10)
+    httpd.shutdown()
+    httpd.server_close()
+
+    endpoints = {}
+    total = 0
+    for name in ENDPOINTS:
+        latencies = merged["latencies"][name]
+        total += len(latencies)
+        endpoints[name] = dict(
+            requests=len(latencies),
+            errors=merged["errors"][name],
+            rps=round(len(latencies) / elapsed, 1),
+            latency_ms=_percentiles(latencies),
+        )
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "clients": args.clients,
+            "duration": args.duration,
+            "mix": args.mix,
+            "skill_latency_ms": args.skill_latency_ms,
+            "seed": args.seed,
+        },
+        "throughput_rps": round(total / elapsed, 1),
+        "endpoints": endpoints,
+        "stop_propagation_ms": dict(samples=len(stop_samples), **_percentiles(stop_samples)),
+        "memory": {
+            "start_rss_bytes": memory_samples[0]["rss_bytes"],
+            "end_rss_bytes": memory_samples[-1]["rss_bytes"],
+            "growth_bytes": memory_samples[-1]["rss_bytes"] - memory_samples[0]["rss_bytes"],
+            "samples": memory_samples,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="秒")
+    parser.add_argument("--mix", type=_parse_mix, default="command=40,status=40,logs=15,stop=5",
+                        help="各接口的调用权重")
+    parser.add_argument("--skill-latency-ms", type=float, default=5.0, help="模拟的外部工具耗时")
+    parser.add_argument("--stop-interval", type=float, default=0.5, help="STOP 传播探测间隔（秒）")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="内存采样间隔（秒）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="结果 JSON 路径；省略时打印到标准输出")
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(text + "\n")
+        print(
+            f"throughput={result['throughput_rps']} req/s  "
+            f"stop p50={result['stop_propagation_ms']['p50']}ms p99={result['stop_propagation_ms']['p99']}ms  "
+            f"rss growth={result['memory']['growth_bytes']} bytes -> {args.output}"
+        )
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
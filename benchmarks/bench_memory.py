@@ -0,0 +1,102 @@
+"""日志存储内存压测：写入 100 万条事件，对比改造前的“每条一个字典”与现在的列存储。
+
+统计 tracemalloc 记录的常驻内存，以及写满后一次完整 gc.collect() 的耗时
+（常驻字典越多，分代 GC 扫描越慢）。
+
+用法：
+    python benchmarks/bench_memory.py --events 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from uuid import uuid4
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from log_store import LogStore  # noqa: E402
+
+EVENTS_PER_TASK = (("queued", "queued"), ("running", "running"), ("completed", "completed"))
+ACTIONS = ("ping", "notify", "open_url", "sleep")
+
+
+class DictLogStore:
+    """改造前的实现：定长列表里每条日志一个字典，按 task_id 用 deque 建索引。"""
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._buffer = [None] * capacity
+        self._by_task = {}
+        self._next_seq = 1
+
+    def record(self, ts, event, task_id, action, status, detail=None) -> int:
+        seq = self._next_seq
+        self._next_seq += 1
+        slot = seq % self._capacity
+        evicted = self._buffer[slot]
+        if evicted is not None:
+            seqs = self._by_task[evicted["task_id"]]
+            seqs.popleft()
+            if not seqs:
+                del self._by_task[evicted["task_id"]]
+        self._buffer[slot] = {
+            "ts": ts,
+            "event": event,
+            "task_id": task_id,
+            "action": action,
+            "status": status,
+            "detail": detail,
+            "seq": seq,
+        }
+        self._by_task.setdefault(task_id, deque()).append(seq)
+        return seq
+
+
+def run(name: str, store_factory, events: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = store_factory(events)
+    task_id = None
+    for index in range(events):
+        event, status = EVENTS_PER_TASK[index % 3]
+        if index % 3 == 0:
+            task_id = str(uuid4())
+        store.record(time.time(), event, task_id, ACTIONS[index // 3 % len(ACTIONS)], status)
+    write_seconds = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    gc_started = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - gc_started) * 1000
+    del store
+    gc.collect()
+    return {
+        "name": name,
+        "bytes_per_event": current / events,
+        "total_mb": current / 1024 / 1024,
+        "write_seconds": write_seconds,
+        "gc_ms": gc_ms,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for name, factory in (("dict", DictLogStore), ("columnar", LogStore)):
+        result = run(name, factory, args.events)
+        print(
+            f"{result['name']:>9}  events={args.events}  "
+            f"memory={result['total_mb']:.1f}MB ({result['bytes_per_event']:.0f} B/event)  "
+            f"write={result['write_seconds']:.2f}s  full gc={result['gc_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
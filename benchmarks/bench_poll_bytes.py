@@ -0,0 +1,105 @@
+"""轮询流量压测：客户端每隔固定间隔轮询 /status 和 /logs，统计每分钟传输的字节数。
+
+对比两种客户端：
+    plain        每次都完整下载（旧客户端行为）
+    conditional  带 If-None-Match 与 Accept-Encoding: gzip
+
+为了不真的等一分钟，按“轮询次数”模拟时间：interval 秒一次，共 60 / interval 轮；
+每 change_every 轮入队一个任务，模拟偶尔有状态变化。
+
+用法：
+    python benchmarks/bench_poll_bytes.py --interval 1 --tasks 30 --change-every 10
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import server  # noqa: E402
+from queue_manager import QueueManager  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+
+TOKEN = "bench-token"
+PATHS = ("/status", "/logs?limit=200")
+
+
+class _HoldExecutor:
+    """任务一直执行到被 STOP，保证 /status 里有稳定的 running 和 queued 列表。"""
+
+    def execute(self, action, params, cancel_event, validated=False):
+        cancel_event.wait()
+        return {"status": "stopped", "error_code": "stopped"}
+
+
+def _response_bytes(response: http.client.HTTPResponse, body: bytes) -> int:
+    # 状态行 + 响应头 + body（gzip 时为压缩后的字节数）
+    status_line = len(f"HTTP/1.1 {response.status} {response.reason}\r\n")
+    return status_line + len(str(response.msg)) + 2 + len(body)
+
+
+def run(mode: str, port: int, rounds: int, change_every: int) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    etags = {}
+    total = 0
+    not_modified = 0
+    for index in range(rounds):
+        if change_every and index and index % change_every == 0:
+            server.QUEUE_MANAGER.enqueue("noop", {})
+        for path in PATHS:
+            headers = {"Authorization": f"Bearer {TOKEN}"}
+            if mode == "conditional":
+                headers["Accept-Encoding"] = "gzip"
+                if path in etags:
+                    headers["If-None-Match"] = etags[path]
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            total += _response_bytes(response, body)
+            if response.status == 304:
+                not_modified += 1
+            if response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+    conn.close()
+    return {"mode": mode, "bytes": total, "not_modified": not_modified, "requests": rounds * len(PATHS)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--interval", type=float, default=1.0, help="轮询间隔（秒）")
+    parser.add_argument("--tasks", type=int, default=30, help="预先入队的任务数")
+    parser.add_argument("--change-every", type=int, default=10, help="每多少轮产生一次状态变化，0 表示不变")
+    args = parser.parse_args()
+
+    server.AUTH_TOKEN = TOKEN
+    server.SimpleHandler.log_message = lambda *a: None
+    # 压测本身就是高频客户端，关闭限流
+    server.RATE_LIMITER = RateLimiter(0, 0)
+    server.QUEUE_MANAGER = QueueManager(executor=_HoldExecutor(), log_capacity=100000)
+    httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    for index in range(args.tasks):
+        server.QUEUE_MANAGER.enqueue("notify", {"title": f"task {index}", "message": "benchmark payload"})
+    time.sleep(0.1)
+
+    rounds = max(1, int(round(60.0 / args.interval)))
+    results = [run(mode, port, rounds, args.change_every) for mode in ("plain", "conditional")]
+    httpd.shutdown()
+    httpd.server_close()
+
+    baseline = results[0]["bytes"]
+    for result in results:
+        print(
+            f"{result['mode']:>12}  bytes/min={result['bytes']}  "
+            f"304={result['not_modified']}/{result['requests']}  "
+            f"ratio={result['bytes'] / baseline:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""定时器压测：在已有大量待触发定时器时，登记与取消的单次开销，以及集中到期时的触发吞吐。
+
+用法：
+    python benchmarks/bench_timers.py --timers 100000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from timers import Timer, TimerQueue  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--timers", type=int, default=100_000)
+    args = parser.parse_args()
+
+    lock = threading.Lock()
+    fired = []
+    all_fired = threading.Event()
+
+    def fire(timer: Timer) -> None:
+        fired.append(timer.id)
+        if len(fired) == args.timers:
+            all_fired.set()
+
+    timers = TimerQueue(lock, fire)
+    far = time.time() + 3600
+    ids = [str(index) for index in range(args.timers)]
+
+    started = time.perf_counter()
+    for timer_id in ids:
+        with lock:
+            timers.schedule_locked(Timer(timer_id, "ping", {}, far + random.random() * 3600))
+    schedule_us = (time.perf_counter() - started) / args.timers * 1e6
+
+    # 已有 N 个待触发时再登记一个、取消一个
+    started = time.perf_counter()
+    for index in range(10_000):
+        with lock:
+            timers.schedule_locked(Timer(f"extra-{index}", "ping", {}, far + random.random() * 3600))
+            timers.cancel_locked(f"extra-{index}")
+    steady_us = (time.perf_counter() - started) / 10_000 * 1e6
+
+    random.shuffle(ids)
+    started = time.perf_counter()
+    for timer_id in ids:
+        with lock:
+            timers.cancel_locked(timer_id)
+    cancel_us = (time.perf_counter() - started) / args.timers * 1e6
+
+    now = time.time()
+    with lock:
+        for timer_id in ids:
+            timers.schedule_locked(Timer(timer_id, "ping", {}, now))
+    started = time.perf_counter()
+    all_fired.wait(60)
+    fire_seconds = time.perf_counter() - started
+
+    print(f"schedule          {schedule_us:6.2f} us/timer  (filling to {args.timers})")
+    print(f"schedule+cancel   {steady_us:6.2f} us/pair   (with {args.timers} pending)")
+    print(f"cancel            {cancel_us:6.2f} us/timer  (random order)")
+    print(f"fire              {len(fired) / fire_seconds:8.0f} timers/s  ({len(fired)} due at once)")
+
+
+if __name__ == "__main__":
+    main()
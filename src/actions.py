@@ -1,17 +1,32 @@
 # src/actions.py
+import math
+import time
 from typing import Any, Dict, Tuple
 
-# 白名单：允许的 action 列表
-ALLOWED_ACTIONS = {
-    "ping",
-    "noop",
-    "stop",
-    "open_app",
-    "open_url",
-    "notify",
-    "screenshot",
-    "sleep",
+from skill_registry import SKILLS
+
+# 白名单：允许的 action 列表（来自 skill 注册表）
+ALLOWED_ACTIONS = frozenset(SKILLS)
+
+# 执行通道：通道内按 FIFO 启动，limit 为并发上限
+# UI 类动作会抢占前台，必须串行；其余动作互不干扰，可并行
+LANE_LIMITS = {"ui": 1, "background": 4}
+ACTION_LANES = {
+    lane: {"limit": limit, "actions": {a for a, spec in SKILLS.items() if spec.lane == lane}}
+    for lane, limit in LANE_LIMITS.items()
 }
+# 宏通常包含 UI 步骤，整体放在 ui 通道，保证与其他 UI 动作不交错
+ACTION_LANES["ui"]["actions"].add("macro")
+
+# 调度参数：priority 越大越先执行；deadline_ms 为入队后的最长等待时间
+MIN_PRIORITY = -10
+MAX_PRIORITY = 10
+MAX_DEADLINE_MS = 24 * 3600 * 1000
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# 定时：run_at 为 Unix 时间戳（秒），delay_ms 相对现在；repeat_ms 为周期
+TIMER_FIELDS = ("run_at", "delay_ms", "repeat_ms")
+MAX_TIMER_DELAY_MS = 30 * 24 * 3600 * 1000
+MIN_REPEAT_MS = 1000
 
 def validate_command(payload: Dict[str, Any]) -> Tuple[bool, str]:
     """
@@ -19,7 +34,7 @@ def validate_command(payload: Dict[str, Any]) -> Tuple[bool, str]:
     - 必须是 dict
     - 必须包含 action(str) 与 params(dict)
     - action 必须在白名单
-    - params 按 action 做最小校验
+    - params 按注册表中该 action 的 schema 校验
     返回: (ok, error_message)
     """
     if not isinstance(payload, dict):
@@ -31,38 +46,74 @@ def validate_command(payload: Dict[str, Any]) -> Tuple[bool, str]:
     if not isinstance(action, str) or not action.strip():
         return False, "action_required"
 
-    if action not in ALLOWED_ACTIONS:
+    spec = SKILLS.get(action)
+    if spec is None:
         return False, "action_not_allowed"
 
     if not isinstance(params, dict):
         return False, "params_must_be_object"
 
-    # action별 파라미터 최소 검증
-    if action == "open_app":
-        app_name = params.get("app_name")
-        if not isinstance(app_name, str) or not app_name.strip():
-            return False, "open_app_requires_app_name"
-
-    if action == "open_url":
-        url = params.get("url")
-        if not isinstance(url, str) or not url.strip():
-            return False, "open_url_requires_url"
-
-    if action == "notify":
-        title = params.get("title")
-        message = params.get("message")
-        if not isinstance(title, str) or not title.strip():
-            return False, "notify_requires_title"
-        if not isinstance(message, str) or not message.strip():
-            return False, "notify_requires_message"
-
-    if action == "screenshot":
-        if params:
-            return False, "screenshot_params_must_be_empty"
-
-    if action == "sleep":
-        ms = params.get("ms")
-        if not isinstance(ms, int):
-            return False, "sleep_requires_ms"
+    # 参数按注册表里编译好的 schema 校验（类型、长度、范围、允许列表）
+    error = spec.validate(params)
+    if error is not None:
+        return False, error
+
+    return True, ""
+
+
+def validate_scheduling(payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """校验可选的 priority / deadline_ms / coalesce 及定时字段（与 action、params 同级）。"""
+    priority = payload.get("priority", 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        return False, "priority_must_be_integer"
+    if priority < MIN_PRIORITY or priority > MAX_PRIORITY:
+        return False, "priority_out_of_range"
+
+    deadline_ms = payload.get("deadline_ms")
+    if deadline_ms is not None:
+        if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, int):
+            return False, "deadline_ms_must_be_integer"
+        if deadline_ms <= 0 or deadline_ms > MAX_DEADLINE_MS:
+            return False, "deadline_ms_out_of_range"
+
+    if not isinstance(payload.get("coalesce", False), bool):
+        return False, "coalesce_must_be_boolean"
+
+    return validate_timer(payload)
+
+
+def validate_timer(payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """校验可选的 run_at / delay_ms / repeat_ms；都没有时视为立即入队。"""
+    if not has_timer(payload):
+        return True, ""
+    if payload.get("action") == "stop":
+        return False, "stop_cannot_be_scheduled"
+
+    run_at = payload.get("run_at")
+    delay_ms = payload.get("delay_ms")
+    if run_at is not None and delay_ms is not None:
+        return False, "run_at_and_delay_ms_are_exclusive"
+    if run_at is not None:
+        # json.loads 接受 NaN / Infinity，必须排除：NaN 与任何时间比较都为 False
+        if isinstance(run_at, bool) or not isinstance(run_at, (int, float)) or not math.isfinite(run_at):
+            return False, "run_at_must_be_number"
+        if run_at - time.time() > MAX_TIMER_DELAY_MS / 1000.0:
+            return False, "run_at_out_of_range"
+    if delay_ms is not None:
+        if isinstance(delay_ms, bool) or not isinstance(delay_ms, int):
+            return False, "delay_ms_must_be_integer"
+        if delay_ms < 0 or delay_ms > MAX_TIMER_DELAY_MS:
+            return False, "delay_ms_out_of_range"
+
+    repeat_ms = payload.get("repeat_ms")
+    if repeat_ms is not None:
+        if isinstance(repeat_ms, bool) or not isinstance(repeat_ms, int):
+            return False, "repeat_ms_must_be_integer"
+        if repeat_ms < MIN_REPEAT_MS or repeat_ms > MAX_TIMER_DELAY_MS:
+            return False, "repeat_ms_out_of_range"
 
     return True, ""
+
+
+def has_timer(payload: Dict[str, Any]) -> bool:
+    return any(payload.get(field) is not None for field in TIMER_FIELDS)
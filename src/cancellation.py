@@ -0,0 +1,37 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class CancelEvent(threading.Event):
+    """threading.Event 的子类：set() 时同步触发已注册的回调（如终止子进程）。"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._callbacks_lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        # 第一次 set() 的 monotonic 时间，用于统计 STOP 到实际取消的延迟
+        self.set_at: Optional[float] = None
+
+    def set(self) -> None:
+        with self._callbacks_lock:
+            callbacks = self._callbacks
+            self._callbacks = []
+            if self.set_at is None:
+                self.set_at = time.monotonic()
+            super().set()
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
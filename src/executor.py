@@ -1,47 +1,59 @@
 import time
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from skills import (
-    SkillError,
-    SkillResult,
-    notify,
-    open_app,
-    open_url,
-    redact_params,
-    screenshot,
-    sleep,
-)
+from cancellation import CancelEvent
+from macros import CompiledStep
+from skill_registry import SKILLS, SkillError, SkillResult
+from skill_runner import SkillRunner
 
 
 class Executor:
+    def __init__(self, runner: Optional[SkillRunner] = None) -> None:
+        self._runner = runner or SkillRunner()
+
     def execute(
         self,
         action: str,
         params: Dict[str, Any],
-        should_stop: Callable[[], bool],
+        cancel_event: CancelEvent,
+        validated: bool = False,
+    ) -> Dict[str, Any]:
+        """执行一条指令；validated=True 表示参数已在入口校验过（HTTP 入队），不再重复校验。"""
+        if cancel_event.is_set():
+            return self._stopped_result("stopped_before_execute")
+        if action == "macro":
+            return self._execute_macro(params, cancel_event)
+        return self._execute_step(action, params, cancel_event, validate=not validated)
+
+    def _execute_step(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        cancel_event: CancelEvent,
+        validate: bool,
     ) -> Dict[str, Any]:
-        if should_stop():
+        if cancel_event.is_set():
             return self._stopped_result("stopped_before_execute")
+        # 查表分发；handler 所在模块在第一次执行时才导入
+        spec = SKILLS.get(action)
+        if spec is None or spec.handler_path is None:
+            return self._failed_result("action_not_supported", "action not supported")
 
         started_at = time.time()
         result: Optional[SkillResult] = None
         error_code: Optional[str] = None
+        terminate_ms: Optional[int] = None
 
         try:
-            if action == "open_app":
-                result = open_app(params)
-            elif action == "open_url":
-                result = open_url(params)
-            elif action == "notify":
-                result = notify(params)
-            elif action == "screenshot":
-                result = screenshot(params)
-            elif action == "sleep":
-                result = sleep(params, should_stop)
-            else:
-                return self._failed_result("action_not_supported", "action not supported")
+            # 只有绕过 HTTP 入口的任务（journal 回放、直接调用）才在这里校验
+            if validate:
+                error = spec.validate(params)
+                if error is not None:
+                    raise SkillError(error, error.replace("_", " "))
+            result = spec.handler()(params, self._runner, cancel_event)
         except SkillError as exc:
             error_code = exc.code
+            terminate_ms = exc.terminate_ms
             result = SkillResult(ok=False, message=exc.message)
         except Exception:
             error_code = "execution_failed"
@@ -52,8 +64,11 @@ class Executor:
         if result is None:
             return self._failed_result("execution_failed", "execution failed")
 
-        if result.message == "stopped" or should_stop():
-            return self._stopped_result("stopped_during_execute", duration_ms)
+        if result.terminate_ms is not None:
+            terminate_ms = result.terminate_ms
+
+        if result.message == "stopped" or cancel_event.is_set():
+            return self._stopped_result("stopped_during_execute", duration_ms, terminate_ms)
 
         return {
             "status": "ok" if result.ok else "failed",
@@ -61,16 +76,60 @@ class Executor:
             "artifact_path": result.artifact_path,
             "error_code": error_code,
             "duration_ms": duration_ms,
-            "params_redacted": redact_params(action, params),
+            "terminate_ms": terminate_ms,
+            "params_redacted": spec.redact_params(params),
         }
 
-    def _stopped_result(self, message: str, duration_ms: int = 0) -> Dict[str, Any]:
+    def _execute_macro(self, params: Dict[str, Any], cancel_event: CancelEvent) -> Dict[str, Any]:
+        # 按顺序执行，共用同一个取消事件，任一步失败或被 STOP 即结束；
+        # 注册时校验过的步骤直接调用 handler，journal 回放出来的普通 dict 仍逐步校验
+        started_at = time.time()
+        steps: List[Dict[str, Any]] = []
+        last: Dict[str, Any] = {"status": "ok", "message": "macro_completed", "error_code": None}
+        for step in params["steps"]:
+            last = self._execute_step(
+                step["action"],
+                step["params"],
+                cancel_event,
+                validate=not isinstance(step, CompiledStep),
+            )
+            steps.append(
+                {
+                    "action": step["action"],
+                    "status": last["status"],
+                    "duration_ms": last["duration_ms"],
+                    "error_code": last["error_code"],
+                    "artifact_path": last["artifact_path"],
+                }
+            )
+            if last["status"] != "ok":
+                break
+
+        return {
+            "status": last["status"],
+            "message": "macro_completed" if last["status"] == "ok" else last["message"],
+            "artifact_path": None,
+            "error_code": last["error_code"],
+            "duration_ms": int((time.time() - started_at) * 1000),
+            "terminate_ms": last.get("terminate_ms"),
+            # 只记录宏名和步骤的 action，各步骤的参数不进日志
+            "params_redacted": {
+                "name": params.get("name"),
+                "steps": [step["action"] for step in params["steps"]],
+            },
+            "steps": steps,
+        }
+
+    def _stopped_result(
+        self, message: str, duration_ms: int = 0, terminate_ms: Optional[int] = None
+    ) -> Dict[str, Any]:
         return {
             "status": "stopped",
             "message": message,
             "artifact_path": None,
             "error_code": "stopped",
             "duration_ms": duration_ms,
+            "terminate_ms": terminate_ms,
         }
 
     def _failed_result(self, code: str, message: str) -> Dict[str, Any]:
@@ -80,4 +139,5 @@ class Executor:
             "artifact_path": None,
             "error_code": code,
             "duration_ms": 0,
+            "terminate_ms": None,
         }
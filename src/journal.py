@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from task_table import TERMINAL_EVENTS
+
+SEGMENT_PATTERN = re.compile(r"^journal-(\d{8})\.jsonl$")
+
+
+class RecoveredState:
+    def __init__(self) -> None:
+        # 按入队顺序保存仍未结束的任务；running 表示崩溃时正在执行
+        self.live: Dict[str, Dict[str, Any]] = {}
+        self.history: List[Dict[str, Any]] = []
+        self.records = 0
+
+    @property
+    def pending(self) -> List[Dict[str, Any]]:
+        return [_strip(task) for task in self.live.values() if task["status"] != "running"]
+
+    @property
+    def interrupted(self) -> List[Dict[str, Any]]:
+        return [_strip(task) for task in self.live.values() if task["status"] == "running"]
+
+
+class Journal:
+    """追加写的任务日志（JSONL 分段文件）。
+
+    append() 只把记录放进内存批次，由后台线程批量写入并 fsync（group commit）：
+    上一次 fsync 期间到达的记录会合并成下一批，入队热路径不会因磁盘 IO 阻塞。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_bytes: int = 16 * 1024 * 1024,
+        max_segments: int = 8,
+        history_limit: int = 10000,
+        fsync: bool = True,
+    ) -> None:
+        self._directory = directory
+        self._segment_bytes = segment_bytes
+        self._max_segments = max_segments
+        self._history_limit = history_limit
+        self._fsync = fsync
+
+        os.makedirs(directory, exist_ok=True)
+        self._recovered = self._replay(self._segment_paths())
+
+        self._lock = threading.Lock()
+        self._has_records = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._batch: List[Dict[str, Any]] = []
+        self._appended = 0
+        self._written = 0
+        self._closed = False
+        self._compact_lock = threading.Lock()
+
+        self._file = None
+        self._file_size = 0
+        self._open_new_segment()
+        self._writer = threading.Thread(target=self._write_loop, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    def recovered(self) -> RecoveredState:
+        return self._recovered
+
+    def append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._batch.append(record)
+            self._appended += 1
+            if len(self._batch) == 1:
+                self._has_records.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前 append 的记录全部落盘。"""
+        with self._lock:
+            target = self._appended
+            self._has_records.notify()
+            return self._durable.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._has_records.notify()
+        self._writer.join()
+
+    def compact(self) -> None:
+        with self._compact_lock:
+            self._compact_closed_segments()
+
+    def _compact_closed_segments(self) -> None:
+        # 只压缩已关闭的段；当前写入段不动
+        closed = self._segment_paths()[:-1]
+        if len(closed) < 2:
+            return
+        records = list(self._iter_records(closed))
+        state = self._replay_records(records)
+        tail = records[-self._history_limit:]
+        tail_ids = {id(record) for record in tail}
+        # 窗口之外但仍未结束的任务，需要保留其 queued 记录（含 params）和最新的 running 记录，
+        # 否则回放时正在执行的任务会被当成排队中而重跑；按原顺序写回
+        keep_ids = set()
+        for task in state.live.values():
+            keep_ids.add(id(task["record"]))
+            if "running_record" in task:
+                keep_ids.add(id(task["running_record"]))
+        head = [
+            record
+            for record in records[: len(records) - len(tail)]
+            if id(record) in keep_ids
+        ]
+
+        target = closed[-1]
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            for record in head + tail:
+                handle.write(json.dumps(record, ensure_ascii=False))
+                handle.write("\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, target)
+        for path in closed[:-1]:
+            os.remove(path)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._lock:
+                while not self._batch and not self._closed:
+                    self._has_records.wait()
+                if not self._batch:
+                    break
+                batch = self._batch
+                self._batch = []
+
+            self._write_batch(batch)
+
+            with self._lock:
+                self._written += len(batch)
+                self._durable.notify_all()
+
+        self._file.close()
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+        encoded = data.encode("utf-8")
+        self._file.write(encoded)
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+        self._file_size += len(encoded)
+        if self._file_size >= self._segment_bytes:
+            self._open_new_segment()
+            if len(self._segment_paths()) > self._max_segments:
+                self.compact()
+
+    def _open_new_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        paths = self._segment_paths()
+        next_index = int(SEGMENT_PATTERN.match(os.path.basename(paths[-1])).group(1)) + 1 if paths else 1
+        path = os.path.join(self._directory, f"journal-{next_index:08d}.jsonl")
+        self._file = open(path, "ab")
+        self._file_size = 0
+
+    def _segment_paths(self) -> List[str]:
+        names = sorted(name for name in os.listdir(self._directory) if SEGMENT_PATTERN.match(name))
+        return [os.path.join(self._directory, name) for name in names]
+
+    def _replay(self, paths: List[str]) -> RecoveredState:
+        return self._replay_records(self._iter_records(paths))
+
+    def _replay_records(self, records) -> RecoveredState:
+        state = RecoveredState()
+        history: Deque[Dict[str, Any]] = deque(maxlen=self._history_limit)
+        live = state.live
+        for record in records:
+            state.records += 1
+            history.append(record)
+            event = record.get("event")
+            task_id = record.get("task_id")
+            if event == "queued" and "params" in record:
+                live[task_id] = {
+                    "id": task_id,
+                    "action": record["action"],
+                    "params": record["params"],
+                    "lane": record.get("lane"),
+                    "priority": record.get("priority", 0),
+                    "deadline_at": record.get("deadline_at"),
+                    "enqueued_at": record.get("enqueued_at"),
+                    "status": "queued",
+                    "record": record,
+                }
+            elif event == "running" and task_id in live:
+                live[task_id]["status"] = "running"
+                live[task_id]["running_record"] = record
+            elif event in TERMINAL_EVENTS:
+                live.pop(task_id, None)
+        state.history = list(history)
+        return state
+
+    def _iter_records(self, paths: List[str]):
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # 崩溃时最后一行可能只写了一半，忽略
+                        continue
+
+
+def _strip(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in task.items() if key not in ("record", "running_record")}
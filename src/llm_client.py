@@ -0,0 +1,129 @@
+import http.client
+import json
+import queue
+import random
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMClientError(Exception):
+    pass
+
+
+class LLMClient:
+    """OpenAI 兼容接口的 HTTP 客户端：keep-alive 连接池、有限次重试（带抖动）、单次与总超时。"""
+
+    def __init__(
+        self,
+        base_url: str = "https://api.openai.com/v1",
+        *,
+        pool_size: int = 4,
+        attempt_timeout: float = 10.0,
+        total_timeout: float = 20.0,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+    ) -> None:
+        url = urlsplit(base_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"invalid base_url: {base_url}")
+        self._scheme = url.scheme
+        self._host = url.hostname
+        self._port = url.port
+        self._base_path = url.path.rstrip("/")
+        self._attempt_timeout = attempt_timeout
+        self._total_timeout = total_timeout
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(pool_size)
+
+    def post_json(
+        self, path: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8")
+        all_headers = {"Content-Type": "application/json"}
+        all_headers.update(headers or {})
+        deadline = time.monotonic() + self._total_timeout
+
+        last_error = "no_attempt"
+        for attempt in range(self._max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                status, raw = self._send(path, body, all_headers, min(self._attempt_timeout, remaining))
+            except (OSError, http.client.HTTPException) as exc:
+                last_error = f"connection_error: {exc.__class__.__name__}"
+            else:
+                if status == 200:
+                    try:
+                        return json.loads(raw)
+                    except ValueError:
+                        raise LLMClientError("invalid_json_response")
+                if status not in RETRYABLE_STATUS:
+                    raise LLMClientError(f"http_status_{status}")
+                last_error = f"http_status_{status}"
+
+            if attempt < self._max_retries:
+                # 指数退避 + 全抖动，避免多个请求同时重试
+                delay = random.uniform(0, self._backoff * (2 ** attempt))
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+
+        raise LLMClientError(f"request_failed ({last_error})")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _send(self, path: str, body: bytes, headers: Dict[str, str], timeout: float):
+        conn, reused = self._acquire(timeout)
+        try:
+            try:
+                return self._request(conn, path, body, headers, timeout)
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.BadStatusLine):
+                if not reused:
+                    raise
+                # 池中连接可能已被服务端关闭：换新连接重发一次，不计入重试次数
+                conn.close()
+                conn = self._connect(timeout)
+                return self._request(conn, path, body, headers, timeout)
+        except BaseException:
+            conn.close()
+            raise
+
+    def _request(self, conn, path: str, body: bytes, headers: Dict[str, str], timeout: float):
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        conn.request("POST", self._base_path + path, body=body, headers=headers)
+        response = conn.getresponse()
+        raw = response.read()
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return response.status, raw
+
+    def _acquire(self, timeout: float):
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._connect(timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _connect(self, timeout: float) -> http.client.HTTPConnection:
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=timeout)
@@ -1,10 +1,13 @@
 import json
 import os
-import urllib.request
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, Tuple
 
-
-ALLOWED_ACTIONS = {"stop", "sleep", "ping", "noop"}
+from llm_client import LLMClient, LLMClientError
+from metrics import METRICS
+from parse_cache import ParseCache
+from phrase_matcher import match_phrase
+from skill_registry import SKILLS
 
 SYSTEM_PROMPT = """あなたは自然言語をアクションJSONに変換するエンジンです。
 必ず次のいずれかのJSONのみを返してください。
@@ -24,12 +27,65 @@ class LLMParseError(Exception):
     pass
 
 
+PARSE_CACHE = ParseCache(
+    max_entries=int(os.environ.get("LLM_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(24 * 3600))),
+    path=os.environ.get("LLM_CACHE_PATH") or None,
+)
+
+LLM_CLIENT = LLMClient(
+    os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+    attempt_timeout=float(os.environ.get("LLM_ATTEMPT_TIMEOUT_SECONDS", "10")),
+    total_timeout=float(os.environ.get("LLM_TOTAL_TIMEOUT_SECONDS", "20")),
+    max_retries=int(os.environ.get("LLM_MAX_RETRIES", "2")),
+)
+
+
+PARSE_SECONDS = METRICS.histogram(
+    "agent_llm_parse_seconds", "Natural-language parse latency by source", ("source",)
+)
+
+
+def _cache_lookups() -> Dict[Tuple[str, ...], float]:
+    stats = PARSE_CACHE.stats()
+    return {("hit",): stats["hits"], ("miss",): stats["misses"]}
+
+
+# 命中率 = hit / (hit + miss)；直接读 ParseCache 自己的计数，解析路径上不额外记录
+METRICS.gauge(
+    "agent_llm_cache_lookups_total",
+    "Parse cache lookups by result",
+    _cache_lookups,
+    ("result",),
+    metric_type="counter",
+)
+
+
 def parse_natural_language(text: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    source = "error"
+    try:
+        result, source = _parse(text)
+        return result
+    finally:
+        PARSE_SECONDS.observe(time.perf_counter() - started, (source,))
+
+
+def _parse(text: str) -> Tuple[Dict[str, Any], str]:
+    # 固定说法本地直接解析：STOP 不必等网络
+    matched = match_phrase(text)
+    if matched is not None:
+        return matched, "fast_path"
+
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise LLMParseError("OPENAI_API_KEY is not set")
 
     model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    cached = PARSE_CACHE.get(text, model)
+    if cached is not None:
+        return cached, "cache"
+
     payload = {
         "model": model,
         "temperature": 0,
@@ -39,22 +95,21 @@ def parse_natural_language(text: str) -> Dict[str, Any]:
         ],
     }
 
-    request = urllib.request.Request(
-        "https://api.openai.com/v1/chat/completions",
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-
-    with urllib.request.urlopen(request, timeout=20) as response:
-        raw = response.read().decode("utf-8")
-        data = json.loads(raw)
+    try:
+        data = LLM_CLIENT.post_json(
+            "/chat/completions",
+            payload,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    except LLMClientError as exc:
+        raise LLMParseError(str(exc))
 
     content = _extract_content(data)
-    return _validate_output(content)
+    result = _validate_output(content)
+    # 只缓存通过校验的结果；失败可能是偶发，下次仍应询问模型
+    if "error" not in result:
+        PARSE_CACHE.put(text, model, result)
+    return result, "llm"
 
 
 def _extract_content(data: Dict[str, Any]) -> str:
@@ -80,17 +135,11 @@ def _validate_output(content: str) -> Dict[str, Any]:
 
     action = parsed.get("action")
     params = parsed.get("params")
-    if action not in ALLOWED_ACTIONS:
-        return {"error": "unsupported_or_ambiguous_request"}
-    if not isinstance(params, dict):
+    # 与 /command 共用注册表里的校验器；strict 额外拒绝 schema 以外的参数
+    spec = SKILLS.get(action) if isinstance(action, str) else None
+    if spec is None or not spec.llm or not isinstance(params, dict):
         return {"error": "unsupported_or_ambiguous_request"}
-
-    if action == "sleep":
-        ms = params.get("ms")
-        if not isinstance(ms, int):
-            return {"error": "unsupported_or_ambiguous_request"}
-
-    if action in {"stop", "ping", "noop"} and params:
+    if spec.validate(params, strict=True) is not None:
         return {"error": "unsupported_or_ambiguous_request"}
 
     return {"action": action, "params": params}
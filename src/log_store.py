@@ -0,0 +1,177 @@
+import sys
+import threading
+from array import array
+from typing import Any, Dict, List, Mapping, Optional
+
+
+class _Vocabulary:
+    """重复出现的字符串（event / action / status）编码为整数，按列存储时只占 4 字节。"""
+
+    def __init__(self) -> None:
+        self._codes: Dict[Optional[str], int] = {None: 0}
+        self._values: List[Optional[str]] = [None]
+
+    def code(self, value: Optional[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(sys.intern(value))
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def value(self, code: int) -> Optional[str]:
+        return self._values[code]
+
+
+class LogStore:
+    """定长环形日志：seq 单调递增，旧记录被覆盖，并按 task_id 建索引。
+
+    记录按列存在定长数组里（时间戳、编码后的 event/action/status、task_id 引用），
+    不为每条日志保留字典；只在 query() 返回时临时生成 JSON 字典。
+    task 索引为“同一任务上一条记录的 seq”链表，每条记录只多 8 字节。
+    """
+
+    def __init__(self, capacity: int = 10000) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self._capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._event = array("I", bytes(4 * capacity))
+        self._action = array("I", bytes(4 * capacity))
+        self._status = array("I", bytes(4 * capacity))
+        self._prev = array("q", bytes(8 * capacity))
+        self._task_id: List[Optional[str]] = [None] * capacity
+        self._detail: List[Optional[str]] = [None] * capacity
+        self._vocabulary = _Vocabulary()
+        # task_id -> 该任务最新一条记录的 seq
+        self._task_last: Dict[str, int] = {}
+        self._next_seq = 1
+        # 最早可能存在的 seq；start_at() 之后不是 1，之前的槽位没有记录
+        self._first_seq = 1
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def start_at(self, seq: int) -> None:
+        """让下一条记录从 seq 开始编号；只能在写入任何记录之前调用（重启时沿用 journal 的编号）。"""
+        with self._lock:
+            if self._next_seq != 1:
+                raise ValueError("log store is not empty")
+            self._next_seq = self._first_seq = max(seq, 1)
+
+    def append(self, entry: Mapping[str, Any]) -> int:
+        """兼容字典形式的写入（如 journal 回放）；若 entry 可写则回填 seq。"""
+        seq = self.record(
+            entry.get("ts"),
+            entry.get("event"),
+            entry.get("task_id"),
+            entry.get("action"),
+            entry.get("status"),
+            entry.get("detail"),
+        )
+        if isinstance(entry, dict):
+            entry["seq"] = seq
+        return seq
+
+    def record(
+        self,
+        ts: Optional[float],
+        event: Optional[str],
+        task_id: str,
+        action: Optional[str],
+        status: Optional[str],
+        detail: Optional[str] = None,
+    ) -> int:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            slot = seq % self._capacity
+            evicted_id = self._task_id[slot]
+            if evicted_id is not None and self._task_last.get(evicted_id) == seq - self._capacity:
+                # 被覆盖的是该任务仅剩的最后一条
+                del self._task_last[evicted_id]
+
+            vocabulary = self._vocabulary
+            self._ts[slot] = ts or 0.0
+            self._event[slot] = vocabulary.code(event)
+            self._action[slot] = vocabulary.code(action)
+            self._status[slot] = vocabulary.code(status)
+            self._task_id[slot] = task_id
+            self._detail[slot] = sys.intern(detail) if isinstance(detail, str) else detail
+            self._prev[slot] = self._task_last.get(task_id, 0)
+            self._task_last[task_id] = seq
+            self._appended.notify_all()
+            return seq
+
+    def wait(self, since_seq: int, timeout: Optional[float]) -> bool:
+        """阻塞直到出现 seq > since_seq 的记录或超时，返回是否有新记录。"""
+        with self._lock:
+            return self._appended.wait_for(
+                lambda: self._next_seq - 1 > since_seq, timeout
+            )
+
+    def query(
+        self,
+        *,
+        since_seq: int = 0,
+        task_id: Optional[str] = None,
+        event: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            first = max(self._next_seq - self._capacity, self._first_seq, since_seq + 1)
+            if task_id is not None:
+                seqs = self._task_seqs(task_id, first)
+            else:
+                seqs = range(first, self._next_seq)
+
+            event_code = None
+            if event is not None:
+                event_code = self._vocabulary.find(event)
+                if event_code is None:
+                    return []
+
+            result: List[Dict[str, Any]] = []
+            for seq in seqs:
+                slot = seq % self._capacity
+                if event_code is not None and self._event[slot] != event_code:
+                    continue
+                result.append(self._to_dict(seq, slot))
+                if limit is not None and len(result) >= limit:
+                    break
+            return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return min(self._next_seq - self._first_seq, self._capacity)
+
+    def _task_seqs(self, task_id: str, first: int) -> List[int]:
+        seqs = []
+        seq = self._task_last.get(task_id, 0)
+        while seq >= first:
+            seqs.append(seq)
+            seq = self._prev[seq % self._capacity]
+        seqs.reverse()
+        return seqs
+
+    def _to_dict(self, seq: int, slot: int) -> Dict[str, Any]:
+        # 字段顺序与改为列存储之前的日志字典一致
+        value = self._vocabulary.value
+        return {
+            "ts": self._ts[slot],
+            "event": value(self._event[slot]),
+            "task_id": self._task_id[slot],
+            "action": value(self._action[slot]),
+            "status": value(self._status[slot]),
+            "detail": self._detail[slot],
+            "seq": seq,
+        }
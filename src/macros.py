@@ -0,0 +1,85 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from actions import validate_command
+
+MAX_MACRO_STEPS = 20
+MACRO_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class MacroError(Exception):
+    """宏定义不合法；index 为出错步骤的下标（与宏本身有关的错误为 None）。"""
+
+    def __init__(self, code: str, index: Optional[int] = None) -> None:
+        super().__init__(code)
+        self.code = code
+        self.index = index
+
+
+class CompiledStep(dict):
+    """注册时已校验过的宏步骤；执行器据此跳过逐步校验。
+
+    序列化进 journal 后回放出来的是普通 dict，仍会在执行前校验。
+    """
+
+
+class MacroRegistry:
+    """服务端命名宏：有序的 action/params 列表，注册时按 skill 注册表一次性校验。
+
+    运行时整段步骤作为一个 action 为 macro 的任务入队，共用一个取消事件，
+    STOP 对整个宏原子生效；执行时不再逐步经过 HTTP 和白名单校验。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._macros: Dict[str, List[CompiledStep]] = {}
+
+    def register(self, name: Any, steps: Any) -> List[CompiledStep]:
+        if not isinstance(name, str) or not MACRO_NAME_PATTERN.match(name):
+            raise MacroError("macro_name_invalid")
+        compiled = compile_steps(steps)
+        with self._lock:
+            self._macros[name] = compiled
+        return compiled
+
+    def get(self, name: str) -> Optional[List[CompiledStep]]:
+        with self._lock:
+            return self._macros.get(name)
+
+    def names(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {
+                name: [step["action"] for step in steps]
+                for name, steps in sorted(self._macros.items())
+            }
+
+    def load(self, path: str) -> None:
+        """从 JSON 文件（{name: [steps]}）加载，任何一个宏不合法都抛 MacroError。"""
+        with open(path, encoding="utf-8") as handle:
+            definitions = json.load(handle)
+        if not isinstance(definitions, dict):
+            raise MacroError("macros_file_must_be_object")
+        for name, steps in definitions.items():
+            self.register(name, steps)
+
+
+def compile_steps(steps: Any) -> List[CompiledStep]:
+    if not isinstance(steps, list) or not steps:
+        raise MacroError("macro_steps_required")
+    if len(steps) > MAX_MACRO_STEPS:
+        raise MacroError("macro_too_long")
+
+    compiled = []
+    for index, step in enumerate(steps):
+        ok, error = validate_command(step)
+        if not ok:
+            raise MacroError(error, index)
+        # STOP 要立即生效，不能排在宏里等前面的步骤执行完
+        if step["action"] == "stop":
+            raise MacroError("stop_not_allowed_in_macro", index)
+        # 深拷贝并丢弃 priority 等多余字段：注册后的步骤不受调用方后续修改影响
+        params = json.loads(json.dumps(step["params"]))
+        compiled.append(CompiledStep(action=step["action"], params=params))
+    return compiled
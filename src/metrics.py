@@ -0,0 +1,250 @@
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 秒；覆盖亚毫秒级的锁等待到分钟级的任务执行
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+Labels = Tuple[str, ...]
+
+
+class _Sharded:
+    """按线程分片的计数存储：每个线程只写自己的分片，记录路径无锁。
+
+    线程 ident 会被复用，但同一时刻只有一个存活线程持有某个 ident，
+    所以分片数受并发线程数限制，不会随短命的 HTTP 处理线程无限增长。
+    """
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str, labelnames: Sequence[str]) -> None:
+        self._registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._shards: Dict[int, Dict[Labels, List[float]]] = {}
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[Labels, List[float]]:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._shards_lock:
+                shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def _merged(self, width: int) -> Dict[Labels, List[float]]:
+        merged: Dict[Labels, List[float]] = {}
+        for shard in list(self._shards.values()):
+            for labels, cells in list(shard.items()):
+                total = merged.setdefault(labels, [0] * width)
+                for index, value in enumerate(cells):
+                    total[index] += value
+        return merged
+
+    def _format_labels(self, labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Counter(_Sharded):
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        if not self._registry.enabled:
+            return
+        shard = self._shard()
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0]
+        cells[0] += amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._merged(1).get(labels, [0])[0]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, cells in sorted(self._merged(1).items()):
+            lines.append(f"{self.name}{self._format_labels(labels)} {_number(cells[0])}")
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, help_text, labelnames)
+        self._bounds = tuple(sorted(buckets))
+        # 每个 label 组合一行：各桶计数（最后一个为 +Inf）、sum、count
+        self._width = len(self._bounds) + 3
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        if not self._registry.enabled:
+            return
+        shard = self._shard()
+        cells = shard.get(labels)
+        if cells is None:
+            cells = shard[labels] = [0] * self._width
+        cells[bisect.bisect_left(self._bounds, value)] += 1
+        cells[-2] += value
+        cells[-1] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        cells = self._merged(self._width).get(labels)
+        return int(cells[-1]) if cells else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, cells in sorted(self._merged(self._width).items()):
+            cumulative = 0
+            for bound, count in zip(self._bounds + (float("inf"),), cells):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(labels, [('le', le)])} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{self._format_labels(labels)} {_number(cells[-2])}")
+            lines.append(f"{self.name}_count{self._format_labels(labels)} {_number(cells[-1])}")
+        return lines
+
+
+class Gauge:
+    """抓取时才调用回调取值，热路径上没有任何记录开销。"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Labels, float]],
+        metric_type: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in sorted(self._collect().items()):
+            pairs = ",".join(f'{key}="{_escape(label)}"' for key, label in zip(self.labelnames, labels))
+            suffix = "{" + pairs + "}" if pairs else ""
+            lines.append(f"{self.name}{suffix} {_number(value)}")
+        return lines
+
+
+class InstrumentedLock:
+    """包装 threading.Lock，记录等待与持有时间；可直接作为 threading.Condition 的底层锁。"""
+
+    def __init__(self, name: str, wait: Histogram, hold: Histogram) -> None:
+        self._lock = threading.Lock()
+        self._labels = (name,)
+        self._wait = wait
+        self._hold = hold
+        self._owner: Optional[int] = None
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+            self._owner = threading.get_ident()
+            self._wait.observe(self._acquired_at - started, self._labels)
+        return acquired
+
+    def release(self) -> None:
+        held = time.perf_counter() - self._acquired_at
+        self._owner = None
+        self._lock.release()
+        self._hold.observe(held, self._labels)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def _is_owned(self) -> bool:
+        # Condition 默认用 acquire(False) 探测，会污染统计；这里按持有线程判断
+        return self._owner == threading.get_ident()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = True) -> None:
+        # enabled 可在运行时切换；关闭后 observe/inc 只剩一次属性判断
+        self.enabled = enabled
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(self, name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(name, lambda: Histogram(self, name, help_text, labelnames, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        collect: Callable[[], Dict[Labels, float]],
+        labelnames: Sequence[str] = (),
+        metric_type: str = "gauge",
+    ) -> Gauge:
+        """注册回调型指标；已在别处计数的值（如缓存命中数）可用 metric_type="counter" 直接暴露。"""
+        with self._lock:
+            # 回调型指标允许重新注册（例如替换了被观测的对象）
+            gauge = Gauge(name, help_text, labelnames, collect, metric_type)
+            self._metrics[name] = gauge
+            return gauge
+
+    def lock(self, name: str):
+        """返回给 name 计时的锁；指标关闭时直接返回普通 threading.Lock，没有任何开销。"""
+        if not self.enabled:
+            return threading.Lock()
+        wait = self.histogram("agent_lock_wait_seconds", "Time spent waiting to acquire a lock", ("lock",))
+        hold = self.histogram("agent_lock_hold_seconds", "Time a lock was held", ("lock",))
+        return InstrumentedLock(name, wait, hold)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+METRICS = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "1") != "0")
@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+from uuid import uuid4
+
+from parse_cache import normalize_text
+
+FINISHED_STATUSES = {"done", "rejected", "failed", "expired", "cancelled"}
+
+
+class ParseBusyError(Exception):
+    """等待解析的请求已达上限。"""
+
+
+class _Job:
+    """一次上游解析；相同文本的票据共享同一个 job。"""
+
+    __slots__ = ("key", "text", "tickets")
+
+    def __init__(self, key: str, text: str) -> None:
+        self.key = key
+        self.text = text
+        self.tickets: List[Dict[str, Any]] = []
+
+
+class ParseDispatcher:
+    """自然语言解析的异步票据：提交立即返回 ticket_id，由有限个 worker 线程调用 LLM。
+
+    - fast_parse 命中（如“停止”）时在调用线程内直接完成，不排队。
+    - 规范化后相同的文本在解析中时共享一次上游调用，各自的票据分别派发；
+      每个 job 最多挂 max_tickets_per_job 张票据，未完成票据总数因此有上界。
+    - 每张票据有 deadline，过期后即使解析完成也不再派发。
+    - cancel_pending() 供 STOP 调用：取消所有未完成的票据，未开始的 job 直接丢弃。
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[str], Dict[str, Any]],
+        dispatch: Callable[[Dict[str, Any]], Dict[str, Any]],
+        *,
+        fast_parse: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+        workers: int = 4,
+        max_pending: int = 32,
+        max_tickets_per_job: int = 64,
+        deadline_seconds: float = 30.0,
+        max_tickets: int = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._parse = parse
+        self._dispatch = dispatch
+        self._fast_parse = fast_parse
+        self._max_pending = max_pending
+        self._max_tickets_per_job = max_tickets_per_job
+        self._deadline = deadline_seconds
+        self._max_tickets = max_tickets
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._has_jobs = threading.Condition(self._lock)
+        self._finished = threading.Condition(self._lock)
+        self._queue: Deque[_Job] = deque()
+        self._inflight: Dict[str, _Job] = {}
+        self._tickets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for index in range(workers):
+            threading.Thread(target=self._work, name=f"nl-parse-{index}", daemon=True).start()
+
+    def submit(self, text: str) -> Dict[str, Any]:
+        now = self._clock()
+        ticket = {
+            "ticket_id": str(uuid4()),
+            "text": text,
+            "status": "pending",
+            "created_at": time.time(),
+            "command": None,
+            "outcome": None,
+            "error": None,
+            "coalesced": False,
+        }
+        deadline = now + self._deadline
+
+        fast = self._fast_parse(text) if self._fast_parse is not None else None
+        if fast is not None:
+            with self._lock:
+                self._store_locked(ticket)
+            self._complete(ticket, deadline, fast, None)
+            with self._lock:
+                return _public(ticket)
+
+        key = normalize_text(text)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is None:
+                if len(self._queue) >= self._max_pending:
+                    raise ParseBusyError("nl_queue_full")
+                job = self._inflight[key] = _Job(key, text)
+                self._queue.append(job)
+                self._has_jobs.notify()
+            elif len(job.tickets) >= self._max_tickets_per_job:
+                raise ParseBusyError("nl_queue_full")
+            else:
+                ticket["coalesced"] = True
+            ticket["_deadline"] = deadline
+            job.tickets.append(ticket)
+            self._store_locked(ticket)
+            return _public(ticket)
+
+    def get(self, ticket_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """查询票据；wait > 0 时最多等待这么久直到票据结束。"""
+        end = self._clock() + wait
+        with self._lock:
+            while True:
+                ticket = self._tickets.get(ticket_id)
+                if ticket is None:
+                    return None
+                self._expire_locked(ticket, self._clock())
+                remaining = end - self._clock()
+                if ticket["status"] in FINISHED_STATUSES or remaining <= 0:
+                    return _public(ticket)
+                self._finished.wait(remaining)
+
+    def cancel_pending(self) -> List[str]:
+        with self._lock:
+            cancelled = []
+            for job in list(self._inflight.values()):
+                for ticket in job.tickets:
+                    # dispatching 的票据已在派发，交给随后的 stop_all 清理
+                    if ticket["status"] in ("pending", "parsing"):
+                        ticket["status"] = "cancelled"
+                        cancelled.append(ticket["ticket_id"])
+                job.tickets = []
+            # 未开始的 job 直接丢弃；已在调用上游的 job 结果会被忽略
+            for job in self._queue:
+                self._inflight.pop(job.key, None)
+            self._queue.clear()
+            self._finished.notify_all()
+            return cancelled
+
+    def _work(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._has_jobs.wait()
+                job = self._queue.popleft()
+                now = self._clock()
+                for ticket in job.tickets:
+                    self._expire_locked(ticket, now)
+                if not any(ticket["status"] == "pending" for ticket in job.tickets):
+                    self._inflight.pop(job.key, None)
+                    continue
+                for ticket in job.tickets:
+                    if ticket["status"] == "pending":
+                        ticket["status"] = "parsing"
+
+            result, error = None, None
+            try:
+                result = self._parse(job.text)
+            except Exception as exc:
+                error = str(exc) or "parse_failed"
+
+            with self._lock:
+                self._inflight.pop(job.key, None)
+                tickets = list(job.tickets)
+            for ticket in tickets:
+                self._complete(ticket, ticket["_deadline"], result, error)
+
+    def _complete(
+        self,
+        ticket: Dict[str, Any],
+        deadline: float,
+        result: Optional[Dict[str, Any]],
+        error: Optional[str],
+    ) -> None:
+        with self._lock:
+            if ticket["status"] in FINISHED_STATUSES:
+                return
+            if self._clock() > deadline:
+                ticket["status"] = "expired"
+                self._finished.notify_all()
+                return
+            # 先占住状态，避免与 cancel_pending 并发时重复派发
+            ticket["status"] = "dispatching"
+
+        status, outcome = "done", None
+        if error is not None:
+            status = "failed"
+        elif "error" in result:
+            status, error = "rejected", result["error"]
+        else:
+            try:
+                outcome = self._dispatch(result)
+            except Exception as exc:
+                status, error = "rejected", str(exc) or "dispatch_failed"
+
+        with self._lock:
+            ticket["command"] = result if result is not None and "error" not in result else None
+            ticket["outcome"] = outcome
+            ticket["error"] = error
+            ticket["status"] = status
+            self._finished.notify_all()
+
+    def _expire_locked(self, ticket: Dict[str, Any], now: float) -> None:
+        if ticket["status"] in ("pending", "parsing") and now > ticket.get("_deadline", now):
+            ticket["status"] = "expired"
+            self._finished.notify_all()
+
+    def _store_locked(self, ticket: Dict[str, Any]) -> None:
+        self._tickets[ticket["ticket_id"]] = ticket
+        # 只淘汰已结束的票据；未结束的挪到末尾，不挡住后面已结束票据的淘汰
+        scanned = 0
+        while len(self._tickets) > self._max_tickets and scanned < len(self._tickets):
+            oldest_id, oldest = next(iter(self._tickets.items()))
+            if oldest["status"] in FINISHED_STATUSES:
+                del self._tickets[oldest_id]
+            else:
+                self._tickets.move_to_end(oldest_id)
+                scanned += 1
+
+
+def _public(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in ticket.items() if not key.startswith("_")}
@@ -0,0 +1,91 @@
+import copy
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    # NFKC 统一全角/半角，再把连续空白折叠成一个空格
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class ParseCache:
+    """自然语言解析结果缓存：LRU 淘汰 + TTL 过期，可选落盘。"""
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 512,
+        ttl_seconds: float = 24 * 3600,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._path = path
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._load()
+
+    def get(self, text: str, model: str) -> Optional[Dict[str, Any]]:
+        key = self._key(text, model)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= self._clock():
+                if item is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(item[1])
+
+    def put(self, text: str, model: str, value: Dict[str, Any]) -> None:
+        key = self._key(text, model)
+        with self._lock:
+            self._entries[key] = (self._clock() + self._ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+            if self._path:
+                self._save()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _key(self, text: str, model: str) -> str:
+        return f"{model}\x00{normalize_text(text)}"
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "r", encoding="utf-8") as handle:
+                stored = json.load(handle)
+        except (OSError, ValueError):
+            return
+        now = self._clock()
+        for key, expires_at, value in stored[-self._max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+
+    def _save(self) -> None:
+        # 先写临时文件再替换，避免进程中断留下半个文件
+        tmp_path = f"{self._path}.tmp"
+        stored = [[key, expires_at, value] for key, (expires_at, value) in self._entries.items()]
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(stored, handle, ensure_ascii=False)
+        os.replace(tmp_path, self._path)
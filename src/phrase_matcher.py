@@ -0,0 +1,103 @@
+import re
+from typing import Any, Dict, Optional
+
+from parse_cache import normalize_text
+from skill_registry import SKILLS
+
+# 常见说法直接映射到 action，不经过 LLM（见 docs/module8_llm.md）
+EXACT_PHRASES = {
+    "stop": {
+        "stop", "暂停", "暂停一下", "停", "停下", "停一下", "停止", "停下来", "别做了", "取消",
+        "ストップ", "止めて", "ちょっと止めて", "止まって", "停止して", "やめて", "中止", "中止して",
+    },
+    "ping": {
+        "ping", "测试", "测试一下", "テスト", "テストして", "ピン",
+    },
+    "noop": {
+        "noop", "什么都别做", "什么都不要做", "什么也别做", "何もしないで", "何もしない",
+    },
+}
+
+_PHRASE_TO_ACTION = {
+    phrase: action for action, phrases in EXACT_PHRASES.items() for phrase in phrases
+}
+
+_UNIT_MS = {
+    "毫秒": 1,
+    "ミリ秒": 1,
+    "ms": 1,
+    "秒": 1000,
+    "秒钟": 1000,
+    "s": 1000,
+    "分钟": 60000,
+    "分": 60000,
+}
+
+_CJK_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+_NUMBER = r"(?P<num>\d+(?:\.\d+)?|[零一二两三四五六七八九十]+)"
+_UNIT = r"(?P<unit>毫秒|ミリ秒|ms|秒钟|秒|s|分钟|分)"
+_SLEEP_PATTERNS = [
+    # 中文：等3秒 / 等待500毫秒 / 等一秒
+    re.compile(rf"^(?:请)?(?:等待|等等|等)\s*{_NUMBER}\s*{_UNIT}(?:吧)?$"),
+    # 日本語：3秒待って / 500ミリ秒待ってください / 2秒待機
+    re.compile(rf"^{_NUMBER}\s*{_UNIT}\s*(?:待って|待つ|待機|待機して)(?:ください|下さい)?$"),
+]
+
+_STRIP_CHARS = " 。．.!！?？~～、,，"
+_PREFIXES = ("请",)
+_SUFFIXES = ("ください", "下さい", "吧")
+
+
+def match_phrase(text: str) -> Optional[Dict[str, Any]]:
+    """本地快速匹配：命中返回 action JSON，未命中返回 None 交给 LLM。"""
+    if not isinstance(text, str):
+        return None
+    normalized = normalize_text(text).strip(_STRIP_CHARS).casefold()
+    if not normalized:
+        return None
+
+    action = _PHRASE_TO_ACTION.get(normalized) or _PHRASE_TO_ACTION.get(_strip_affixes(normalized))
+    if action is not None:
+        return {"action": action, "params": {}}
+
+    for pattern in _SLEEP_PATTERNS:
+        match = pattern.match(normalized)
+        if match is None:
+            continue
+        value = _parse_number(match.group("num"))
+        if value is None:
+            return None
+        ms = value * _UNIT_MS[match.group("unit")]
+        if abs(ms - round(ms)) > 1e-6:
+            return None
+        params = {"ms": int(round(ms))}
+        # 与 LLM 输出走同一套校验：超出 skill 范围（如「等10秒」）不在本地放行，交给 LLM 路径报错
+        if SKILLS["sleep"].validate(params, strict=True) is not None:
+            return None
+        return {"action": "sleep", "params": params}
+    return None
+
+
+def _strip_affixes(text: str) -> str:
+    for prefix in _PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    for suffix in _SUFFIXES:
+        if text.endswith(suffix):
+            text = text[: -len(suffix)]
+    return text.strip(_STRIP_CHARS)
+
+
+def _parse_number(raw: str) -> Optional[float]:
+    if raw[0].isdigit():
+        return float(raw)
+    # 仅支持 0-99 的中文数字：三、十、十五、二十、九十九
+    if "十" not in raw:
+        return _CJK_DIGITS[raw] if len(raw) == 1 else None
+    tens, _, ones = raw.partition("十")
+    if len(tens) > 1 or len(ones) > 1 or "十" in ones:
+        return None
+    tens_value = _CJK_DIGITS.get(tens, 1) if tens else 1
+    ones_value = _CJK_DIGITS.get(ones, 0) if ones else 0
+    return float(tens_value * 10 + ones_value)
@@ -1,131 +1,630 @@
+import gzip
+import heapq
+import itertools
+import json
+import math
 import threading
 import time
-from collections import deque
-from typing import Any, Deque, Dict, List, Optional
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import uuid4
 
+from cancellation import CancelEvent
+from executor import Executor
+from journal import Journal, RecoveredState
+from log_store import LogStore
+from metrics import METRICS
+from task import Task
+from task_table import TaskTable
+from timers import Timer, TimerQueue
+
+DEFAULT_LANE = "default"
+LOG_FIELDS = ("ts", "event", "task_id", "action", "status", "detail")
+# 按最近一段时间的出队速度估算 Retry-After
+DRAIN_WINDOW_SECONDS = 60.0
+MAX_RETRY_AFTER_SECONDS = 60
+TIMER_IDEMPOTENCY_PREFIX = "timer:"
+# 锁外构建 /status 快照的尝试次数，期间状态一直在变就退回锁内构建
+SNAPSHOT_ATTEMPTS = 2
+
+TASK_WAIT_SECONDS = METRICS.histogram(
+    "agent_task_wait_seconds", "Time from enqueue to execution start", ("action",)
+)
+TASK_RUN_SECONDS = METRICS.histogram(
+    "agent_task_run_seconds", "Time spent executing a task", ("action",)
+)
+STOP_LATENCY_SECONDS = METRICS.histogram(
+    "agent_stop_latency_seconds", "Time from STOP to the running task returning", ("action",)
+)
+TIMER_DROPPED = METRICS.counter(
+    "agent_timer_dropped_total", "Timer runs skipped because the queue was full", ("action",)
+)
+
+
+class _Lane:
+    def __init__(self, name: str, limit: int, lock: threading.Lock) -> None:
+        if limit <= 0:
+            raise ValueError(f"lane {name} limit must be positive")
+        self.name = name
+        self.limit = limit
+        # 小顶堆：(-priority, 入队序号, task)，同优先级按入队顺序
+        self.heap: List[Tuple[int, int, Task]] = []
+        self.wakeup = threading.Condition(lock)
+
+
+class QueueFullError(Exception):
+    """队列已达上限；retry_after 为按近期出队速度估算的建议重试秒数。"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("queue_full")
+        self.retry_after = retry_after
+
+
+class StatusSnapshot:
+    """某个版本的队列状态（只读）；JSON 及其 gzip 按版本缓存，重复读取不再序列化。"""
+
+    __slots__ = ("boot_id", "version", "data", "_json", "_gzip")
+
+    def __init__(self, boot_id: str, version: int, data: Dict[str, Any]) -> None:
+        self.boot_id = boot_id
+        self.version = version
+        self.data = data
+        self._json: Optional[bytes] = None
+        self._gzip: Optional[bytes] = None
+
+    @property
+    def etag(self) -> str:
+        # version 每次启动从 0 重新计数，带上启动标识，重启前存下的 ETag 不会误判成未变化
+        return f'"{self.boot_id}-s{self.version}"'
+
+    def to_json(self) -> bytes:
+        # 并发下可能重复计算一次，但结果相同，无需加锁
+        if self._json is None:
+            self._json = json.dumps({"ok": True, "data": self.data}).encode("utf-8")
+        return self._json
+
+    def to_gzip(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.to_json(), compresslevel=6, mtime=0)
+        return self._gzip
+
 
 class QueueManager:
-    def __init__(self, *, step_delay: float = 0.05, steps: int = 5) -> None:
-        self._queue: Deque[Dict[str, Any]] = deque()
-        self._current: Optional[Dict[str, Any]] = None
-        self._logs: List[Dict[str, Any]] = []
-        self._lock = threading.Lock()
-        self._stop_token = 0
-        self._step_delay = step_delay
-        self._steps = steps
-        self._worker = threading.Thread(target=self._run, daemon=True)
-        self._worker.start()
-
-    def enqueue(self, action: str, params: Dict[str, Any]) -> str:
-        task_id = str(uuid4())
-        task = {
-            "id": task_id,
-            "action": action,
-            "params": params,
-            "status": "queued",
-        }
+    def __init__(
+        self,
+        *,
+        executor: Optional[Executor] = None,
+        log_capacity: int = 10000,
+        lanes: Optional[Dict[str, Dict[str, Any]]] = None,
+        journal: Optional[Journal] = None,
+        idempotency_window: float = 600.0,
+        max_idempotency_keys: int = 10000,
+        max_queue_depth: Optional[int] = None,
+    ) -> None:
+        # 执行通道：每个通道内 FIFO，limit 个 worker 并发；未配置时所有 action 串行
+        self._lock = METRICS.lock("queue")
+        self._lanes: Dict[str, _Lane] = {}
+        self._lane_of: Dict[str, str] = {}
+        for name, config in (lanes or {}).items():
+            self._lanes[name] = _Lane(name, config["limit"], self._lock)
+            for action in config["actions"]:
+                self._lane_of[action] = name
+        if DEFAULT_LANE not in self._lanes:
+            self._lanes[DEFAULT_LANE] = _Lane(DEFAULT_LANE, 1, self._lock)
+
+        self._running: Dict[str, Task] = {}
+        self._sequence = itertools.count()
+        # 所有通道排队任务总数上限；None 表示不限
+        self._max_queue_depth = max_queue_depth
+        self._drained: deque = deque(maxlen=256)
+        # 每次状态变化 version + 1；快照在变化后的第一次读取时重建
+        self._version = 0
+        # 每次启动不同：快照版本和日志 seq 都是进程内计数，拼进 ETag 区分重启前后
+        self.boot_id = uuid4().hex[:12]
+        self._snapshot = StatusSnapshot(
+            self.boot_id, 0, {"current": None, "running": [], "queued": [], "version": 0}
+        )
+        # 请求了合并的排队中任务按 (action, params) 建索引，合并重复指令时 O(1) 查找
+        self._queued_index: Dict[Tuple[str, str], Dict[str, Task]] = {}
+        # Idempotency-Key -> (task_id, 过期时间)；窗口固定，按插入顺序即按过期顺序
+        self._idempotency: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._idempotency_window = idempotency_window
+        self._max_idempotency_keys = max_idempotency_keys
+        # 每个运行中任务一个取消事件：STOP 时 set，执行侧无需再持锁轮询
+        self._cancel_events: Dict[str, CancelEvent] = {}
+        self._logs = LogStore(log_capacity)
+        self._tasks = TaskTable()
+        self._executor = executor or Executor()
+        self._journal = journal
+        if journal is not None:
+            self._restore(journal.recovered())
+        self._closed = False
+        # 延时 / 周期任务与队列共用一把锁，到期时直接在锁内入队
+        self._timers = TimerQueue(self._lock, self._fire_timer_locked)
+        self._workers: List[threading.Thread] = []
+        for lane in self._lanes.values():
+            for index in range(lane.limit):
+                worker = threading.Thread(
+                    target=self._run,
+                    args=(lane,),
+                    name=f"lane-{lane.name}-{index}",
+                    daemon=True,
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def enqueue(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        *,
+        priority: int = 0,
+        deadline_ms: Optional[int] = None,
+    ) -> str:
+        return self.submit(action, params, priority=priority, deadline_ms=deadline_ms)["task_id"]
+
+    def submit(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        *,
+        priority: int = 0,
+        deadline_ms: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+        coalesce: bool = False,
+        validated: bool = False,
+    ) -> Dict[str, Any]:
+        """入队并说明是否去重：deduplicated 为 None / "idempotency_key" / "coalesced"。
+
+        validated=True 表示参数已按 skill 注册表校验过（HTTP 入口），执行前不再重复校验。
+        """
+        task = self._new_task(action, params, priority, deadline_ms, coalesce)
+        task.validated = validated
         with self._lock:
-            self._queue.append(task)
-            self._log_event("queued", task)
-        return task_id
+            if idempotency_key is not None:
+                existing = self._lookup_idempotency_locked(idempotency_key)
+                if existing is not None:
+                    return {"task_id": existing, "deduplicated": "idempotency_key"}
+            task_id, deduplicated = task.id, None
+            merged = self._find_coalescible_locked(task)
+            if merged is not None:
+                task_id, deduplicated = merged.id, "coalesced"
+            else:
+                self._check_capacity_locked(1)
+                self._append_locked(task)
+            if idempotency_key is not None:
+                self._remember_idempotency_locked(idempotency_key, task_id)
+        return {"task_id": task_id, "deduplicated": deduplicated}
 
-    def stop_all(self) -> Dict[str, Any]:
+    def enqueue_many(
+        self,
+        commands: List[Dict[str, Any]],
+        *,
+        stop_first: bool = False,
+        validated: bool = False,
+    ) -> Dict[str, Any]:
+        # 一次持锁完成（可选的 STOP 与）全部入队，其他请求不会插到批次中间
+        tasks = [
+            self._new_task(
+                command["action"],
+                command["params"],
+                command.get("priority", 0),
+                command.get("deadline_ms"),
+                command.get("coalesce", False),
+            )
+            for command in commands
+        ]
+        for task in tasks:
+            task.validated = validated
+        task_ids = []
         with self._lock:
-            self._stop_token += 1
-            cancelled = []
-            while self._queue:
-                task = self._queue.popleft()
-                task["status"] = "cancelled"
-                cancelled.append(task["id"])
-                self._log_event("cancelled", task, detail="queue_cleared")
+            # 容量不足时整批拒绝，且不执行 STOP；STOP 会先清空队列，所以只需容纳本批
+            self._check_capacity_locked(len(tasks), after_stop=stop_first)
+            stop_result = self._stop_all_locked() if stop_first else None
+            for task in tasks:
+                merged = self._find_coalescible_locked(task)
+                if merged is not None:
+                    task_ids.append(merged.id)
+                    continue
+                self._append_locked(task)
+                task_ids.append(task.id)
+        return {"task_ids": task_ids, "stop": stop_result}
 
-            if self._current is not None:
-                self._current["status"] = "cancelled"
-                self._log_event("cancelled", self._current, detail="stop_requested")
+    def schedule(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        *,
+        run_at: Optional[float] = None,
+        delay_ms: Optional[int] = None,
+        repeat_ms: Optional[int] = None,
+        priority: int = 0,
+        deadline_ms: Optional[int] = None,
+        coalesce: bool = False,
+        idempotency_key: Optional[str] = None,
+        validated: bool = False,
+    ) -> Dict[str, Any]:
+        """登记延时或周期任务，到期后按普通任务入队；未给 run_at / delay_ms 时首次在一个周期后触发。"""
+        if run_at is None:
+            run_at = time.time() + (delay_ms if delay_ms is not None else repeat_ms or 0) / 1000.0
+        timer = Timer(
+            str(uuid4()),
+            action,
+            params,
+            run_at,
+            repeat_ms=repeat_ms,
+            priority=priority,
+            deadline_ms=deadline_ms,
+            coalesce=coalesce,
+            validated=validated,
+        )
+        if coalesce:
+            timer.fingerprint = _fingerprint(action, params)
+        # 与任务共用窗口和容量，但键加前缀：同一个 key 不会把 timer_id 当作 task_id 返回
+        key = TIMER_IDEMPOTENCY_PREFIX + idempotency_key if idempotency_key is not None else None
+        with self._lock:
+            if key is not None:
+                existing = self._lookup_idempotency_locked(key)
+                if existing is not None:
+                    return {"timer_id": existing, "deduplicated": "idempotency_key"}
+            self._timers.schedule_locked(timer)
+            if key is not None:
+                self._remember_idempotency_locked(key, timer.id)
+        return {"timer_id": timer.id, "run_at": run_at, "deduplicated": None}
 
-            return {
-                "ok": True,
-                "cancelled_queue": cancelled,
-                "current": self._current["id"] if self._current else None,
-            }
+    def get_timer(self, timer_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            timer = self._timers.get_locked(timer_id)
+            return timer.to_dict() if timer is not None else None
 
-    def status(self) -> Dict[str, Any]:
+    def cancel_timer(self, timer_id: str) -> bool:
         with self._lock:
-            queue_snapshot = list(self._queue)
-            current_snapshot = dict(self._current) if self._current else None
-        return {
-            "current": current_snapshot,
-            "queued": queue_snapshot,
-        }
+            return self._timers.cancel_locked(timer_id)
 
-    def logs(self) -> List[Dict[str, Any]]:
+    def pending_timers(self) -> int:
+        return len(self._timers)
+
+    def stop_all(self) -> Dict[str, Any]:
+        # 单次持锁内清空所有通道，STOP 对所有通道原子生效
         with self._lock:
-            return list(self._logs)
+            return self._stop_all_locked()
 
-    def _run(self) -> None:
-        while True:
-            task = None
+    def close(self, timeout: float = 2.0) -> None:
+        """停止所有通道 worker 和定时线程，运行中的任务收到取消信号。
+
+        排队中的任务不标记取消，journal 里仍是待执行，重启后照常恢复；close 之后不应再入队。
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for event in self._cancel_events.values():
+                event.set()
+            for lane in self._lanes.values():
+                lane.wakeup.notify_all()
+            self._timers.close_locked()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._timers.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        # 返回的字典在多个读者之间共享，调用方不要修改
+        return self.status_snapshot().data
+
+    def status_snapshot(self) -> StatusSnapshot:
+        # 状态未变化时只是一次引用读取，不碰队列锁
+        snapshot = self._snapshot
+        if snapshot.version == self._version:
+            return snapshot
+        # 锁内只浅拷贝堆和运行列表，排序和 to_dict 在锁外做；
+        # 发布前确认期间没有新的状态变化（任务字段的修改都伴随 version + 1），否则重来
+        for _ in range(SNAPSHOT_ATTEMPTS):
             with self._lock:
-                if self._queue:
-                    task = self._queue.popleft()
-                    self._current = task
-                    task["status"] = "running"
-                    self._log_event("running", task)
-                    stop_token = self._stop_token
-                else:
-                    self._current = None
-                    stop_token = self._stop_token
-
-            if task is None:
-                time.sleep(0.1)
-                continue
+                if self._snapshot.version == self._version:
+                    return self._snapshot
+                version = self._version
+                heaps = [list(lane.heap) for lane in self._lanes.values()]
+                running = list(self._running.values())
+            built = _build_snapshot(self.boot_id, version, heaps, running)
+            with self._lock:
+                if self._version == version:
+                    self._snapshot = built
+                    return built
+        # 状态变化太频繁时退回锁内构建，保证读者总能拿到一致的快照
+        with self._lock:
+            if self._snapshot.version != self._version:
+                self._snapshot = _build_snapshot(
+                    self.boot_id,
+                    self._version,
+                    [lane.heap for lane in self._lanes.values()],
+                    list(self._running.values()),
+                )
+            return self._snapshot
 
-            if self._should_stop(stop_token):
-                self._mark_cancelled(task, "stop_requested")
-                continue
+    def logs(
+        self,
+        *,
+        since_seq: int = 0,
+        task_id: Optional[str] = None,
+        event: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        # LogStore 自带锁，读日志不再占用队列锁
+        return self._logs.query(
+            since_seq=since_seq, task_id=task_id, event=event, limit=limit
+        )
 
-            cancelled = self._execute_action(task, stop_token)
-            if cancelled:
-                self._mark_cancelled(task, "stop_requested")
-            else:
-                self._mark_completed(task)
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._tasks.get(task_id)
 
-    def _execute_action(self, task: Dict[str, Any], stop_token: int) -> bool:
-        # 模块 4：仅模拟执行时间，实际执行器在后续模块实现
-        for _ in range(self._steps):
-            time.sleep(self._step_delay)
-            if self._should_stop(stop_token):
-                return True
-        return False
+    def queue_depths(self) -> Dict[str, int]:
+        # 只读列表长度，不取锁；给 /metrics 抓取用，允许瞬时不一致
+        return {name: len(lane.heap) for name, lane in self._lanes.items()}
 
-    def _should_stop(self, stop_token: int) -> bool:
-        with self._lock:
-            return self._stop_token != stop_token
+    def last_log_seq(self) -> int:
+        return self._logs.last_seq
+
+    def wait_for_logs(self, since_seq: int, timeout: Optional[float]) -> bool:
+        return self._logs.wait(since_seq, timeout)
+
+    def _new_task(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        priority: int = 0,
+        deadline_ms: Optional[int] = None,
+        coalesce: bool = False,
+    ) -> Task:
+        now = time.time()
+        task = Task(
+            str(uuid4()),
+            action,
+            params,
+            lane=self._lane_of.get(action, DEFAULT_LANE),
+            priority=priority,
+            # 用墙上时钟，便于写入 journal 后跨重启仍有意义
+            deadline_at=now + deadline_ms / 1000.0 if deadline_ms is not None else None,
+            enqueued_at=now,
+        )
+        if coalesce:
+            # 在锁外算一次，之后入队、合并、出队都直接用
+            task.fingerprint = _fingerprint(action, params)
+        return task
+
+    def _append_locked(self, task: Task, event: str = "queued") -> None:
+        lane = self._lanes[task.lane]
+        heapq.heappush(lane.heap, (-task.priority, next(self._sequence), task))
+        if task.fingerprint is not None:
+            self._queued_index.setdefault(task.fingerprint, {})[task.id] = task
+        self._log_event(event, task)
+        lane.wakeup.notify()
+
+    def _check_capacity_locked(self, needed: int, after_stop: bool = False) -> None:
+        if self._max_queue_depth is None:
+            return
+        depth = 0 if after_stop else sum(len(lane.heap) for lane in self._lanes.values())
+        if depth + needed > self._max_queue_depth:
+            raise QueueFullError(self._retry_after_locked(depth + needed - self._max_queue_depth))
+
+    def _retry_after_locked(self, excess: int) -> int:
+        # 以窗口内最早一次出队到现在的平均速度估算；worker 卡住时速度自然衰减
+        now = time.monotonic()
+        recent = [at for at in self._drained if now - at <= DRAIN_WINDOW_SECONDS]
+        if len(recent) < 2:
+            return MAX_RETRY_AFTER_SECONDS
+        rate = len(recent) / max(now - recent[0], 1e-3)
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(excess / rate)))
+
+    def _unindex_locked(self, task: Task) -> None:
+        key = task.fingerprint
+        if key is None:
+            return
+        same = self._queued_index.get(key)
+        if same is None:
+            return
+        same.pop(task.id, None)
+        if not same:
+            del self._queued_index[key]
+
+    def _find_coalescible_locked(self, task: Task) -> Optional[Task]:
+        # 合并到最早入队的相同指令；它若可能在新请求的 deadline 之前过期，则不合并
+        if task.fingerprint is None:
+            return None
+        for existing in self._queued_index.get(task.fingerprint, {}).values():
+            if existing.deadline_at is None:
+                return existing
+            if task.deadline_at is not None and existing.deadline_at >= task.deadline_at:
+                return existing
+        return None
+
+    def _lookup_idempotency_locked(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        while self._idempotency:
+            oldest = next(iter(self._idempotency.values()))
+            if oldest[1] > now:
+                break
+            self._idempotency.popitem(last=False)
+        entry = self._idempotency.get(key)
+        return entry[0] if entry is not None else None
 
-    def _mark_cancelled(self, task: Dict[str, Any], detail: str) -> None:
+    def _remember_idempotency_locked(self, key: str, task_id: str) -> None:
+        self._idempotency[key] = (task_id, time.monotonic() + self._idempotency_window)
+        while len(self._idempotency) > self._max_idempotency_keys:
+            self._idempotency.popitem(last=False)
+
+    def _restore(self, state: RecoveredState) -> None:
+        # 重启恢复：回放历史日志；崩溃时正在执行的任务标记为 interrupted，不重跑
         with self._lock:
-            task["status"] = "cancelled"
-            self._log_event("cancelled", task, detail=detail)
+            # 沿用 journal 里的 seq：最后一条回放记录的编号与重启前相同，客户端的 since_seq 游标继续有效
+            history = state.history
+            last_seq = max((record.get("seq") or 0 for record in history), default=0)
+            if last_seq > len(history):
+                self._logs.start_at(last_seq - len(history) + 1)
+            for record in history:
+                self._logs.record(*(record.get(key) for key in LOG_FIELDS))
+            for data in state.interrupted:
+                task = Task.from_dict(data, data.get("lane") or DEFAULT_LANE)
+                task.status = "interrupted"
+                self._log_event("interrupted", task, detail="process_restarted")
+            for data in state.pending:
+                lane = data.get("lane")
+                if lane not in self._lanes:
+                    lane = self._lane_of.get(data["action"], DEFAULT_LANE)
+                self._append_locked(Task.from_dict(data, lane), event="requeued")
+
+    def _fire_timer_locked(self, timer: Timer) -> None:
+        task = self._new_task(timer.action, timer.params, timer.priority, timer.deadline_ms)
+        task.validated = timer.validated
+        task.fingerprint = timer.fingerprint
+        merged = self._find_coalescible_locked(task)
+        if merged is not None:
+            # 上一次触发的任务还在排队，本次并入，周期任务不会越积越多
+            timer.last_task_id = merged.id
+            return
+        try:
+            self._check_capacity_locked(1)
+        except QueueFullError:
+            TIMER_DROPPED.inc((timer.action,))
+            return
+        self._append_locked(task)
+        timer.last_task_id = task.id
+
+    def _stop_all_locked(self) -> Dict[str, Any]:
+        cancelled = []
+        for lane in self._lanes.values():
+            for _, _, task in lane.heap:
+                self._unindex_locked(task)
+                task.status = "cancelled"
+                cancelled.append(task.id)
+                self._log_event("cancelled", task, detail="queue_cleared")
+            lane.heap.clear()
+
+        for task in self._running.values():
+            self._cancel_events[task.id].set()
+            task.status = "cancelled"
+            self._log_event("cancelled", task, detail="stop_requested")
+
+        running = list(self._running)
+        return {
+            "ok": True,
+            "cancelled_queue": cancelled,
+            "current": running[0] if running else None,
+            "running": running,
+            # 定时器可能有十万级，只返回数量
+            "cancelled_timers": self._timers.clear_locked(),
+        }
+
+    def _run(self, lane: _Lane) -> None:
+        while True:
+            with self._lock:
+                task = self._next_task_locked(lane)
+                if task is None:
+                    return
+                cancel_event = CancelEvent()
+                self._cancel_events[task.id] = cancel_event
+                self._running[task.id] = task
+                task.status = "running"
+                self._log_event("running", task)
 
-    def _mark_completed(self, task: Dict[str, Any]) -> None:
+            labels = (task.action,)
+            started = time.perf_counter()
+            if task.enqueued_at is not None:
+                TASK_WAIT_SECONDS.observe(max(0.0, time.time() - task.enqueued_at), labels)
+            try:
+                result = self._executor.execute(
+                    task.action, task.params, cancel_event, validated=task.validated
+                )
+            except Exception:
+                result = {"status": "failed", "error_code": "execution_failed"}
+            TASK_RUN_SECONDS.observe(time.perf_counter() - started, labels)
+            if cancel_event.set_at is not None:
+                STOP_LATENCY_SECONDS.observe(time.monotonic() - cancel_event.set_at, labels)
+            self._mark_finished(task, result)
+
+    def _next_task_locked(self, lane: _Lane) -> Optional[Task]:
+        while True:
+            # 空闲时阻塞在条件变量上，由 enqueue 唤醒，不再轮询；close 后返回 None
+            while not lane.heap and not self._closed:
+                lane.wakeup.wait()
+            if self._closed:
+                return None
+            _, _, task = heapq.heappop(lane.heap)
+            self._unindex_locked(task)
+            self._drained.append(time.monotonic())
+            deadline_at = task.deadline_at
+            if deadline_at is not None and deadline_at < time.time():
+                # 已过期的任务直接丢弃，不迟到执行
+                task.status = "expired"
+                self._log_event("expired", task, detail="deadline_passed")
+                continue
+            return task
+
+    def _mark_finished(self, task: Task, result: Dict[str, Any]) -> None:
         with self._lock:
-            task["status"] = "completed"
-            self._log_event("completed", task)
+            self._running.pop(task.id, None)
+            self._cancel_events.pop(task.id, None)
+            task.result = result
+            if result["status"] == "stopped":
+                task.status = "cancelled"
+                self._log_event("cancelled", task, detail="stop_requested")
+            elif result["status"] == "failed":
+                task.status = "failed"
+                self._log_event("failed", task, detail=result.get("error_code"))
+            else:
+                task.status = "completed"
+                self._log_event("completed", task)
 
     def _log_event(
         self,
         event: str,
-        task: Dict[str, Any],
+        task: Task,
         detail: Optional[str] = None,
     ) -> None:
-        self._logs.append(
-            {
-                "ts": time.time(),
+        ts = time.time()
+        # 所有状态变化都会经过这里记录事件，顺带推进快照版本
+        self._version += 1
+        seq = self._logs.record(ts, event, task.id, task.action, task.status, detail)
+        self._tasks.on_event(event, task, ts)
+        if self._journal is not None:
+            entry = {
+                "ts": ts,
                 "event": event,
-                "task_id": task["id"],
-                "action": task["action"],
-                "status": task["status"],
+                "task_id": task.id,
+                "action": task.action,
+                "status": task.status,
                 "detail": detail,
+                "seq": seq,
             }
-        )
+            if event == "queued":
+                # 只有 queued 记录携带 params，重启时据此恢复队列
+                entry.update(
+                    params=task.params,
+                    lane=task.lane,
+                    priority=task.priority,
+                    deadline_at=task.deadline_at,
+                    enqueued_at=task.enqueued_at,
+                )
+            self._journal.append(entry)
+
+
+def _build_snapshot(
+    boot_id: str, version: int, heaps: List[List[Tuple[int, int, Task]]], running: List[Task]
+) -> StatusSnapshot:
+    # 快照是 HTTP 边界：只在这里把任务记录转成 JSON 字典
+    queued = [item[2].to_dict() for heap in heaps for item in sorted(heap)]
+    running_dicts = [task.to_dict() for task in running]
+    return StatusSnapshot(
+        boot_id,
+        version,
+        {
+            "current": running_dicts[0] if running_dicts else None,
+            "running": running_dicts,
+            "queued": queued,
+            "version": version,
+        },
+    )
+
+
+def _fingerprint(action: str, params: Dict[str, Any]) -> Tuple[str, str]:
+    # params 规范化为 JSON（键排序），作为可哈希的索引键
+    return action, json.dumps(params, sort_keys=True, separators=(",", ":"))
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+
+class RateLimiter:
+    """按 key（鉴权 token 或客户端地址）分桶的令牌桶限流。
+
+    rate 为每秒补充的令牌数，burst 为桶容量；rate <= 0 表示不限流。
+    只保留最近活跃的 max_keys 个桶，伪造大量地址不会让内存无限增长。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        *,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._rate = rate
+        self._burst = max(burst, 1.0)
+        self._max_keys = max_keys
+        self._clock = clock
+        # key -> [剩余令牌, 上次补充时间]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._rate > 0
+
+    def acquire(self, key: str) -> float:
+        """尝试取一个令牌：成功返回 0，否则返回需要等待的秒数。"""
+        if not self.enabled:
+            return 0.0
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self._burst, now]
+                if len(self._buckets) > self._max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self._rate
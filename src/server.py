@@ -1,50 +1,315 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
 import json
+import math
 import os
+import queue
+import selectors
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 
-from actions import validate_command
-from queue_manager import QueueManager
+from actions import (
+    ACTION_LANES,
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    has_timer,
+    validate_command,
+    validate_scheduling,
+)
+from journal import Journal
+from llm_parser import parse_natural_language
+from macros import MacroError, MacroRegistry
+from metrics import METRICS
+from nl_dispatcher import ParseBusyError, ParseDispatcher
+from phrase_matcher import match_phrase
+from queue_manager import QueueFullError, QueueManager
+from rate_limit import RateLimiter
 
 HOST = "0.0.0.0"
 PORT = 8080
 
 AUTH_TOKEN = os.environ.get("AUTH_TOKEN")
-QUEUE_MANAGER = QueueManager()
+MAX_LOGS_LIMIT = 1000
+DEFAULT_EVENTS_WAIT_MS = 25000
+MAX_EVENTS_WAIT_MS = 60000
+SSE_KEEPALIVE_SECONDS = 15.0
+MAX_HANDLER_THREADS = int(os.environ.get("MAX_HANDLER_THREADS", "32"))
+# 每个 SSE 订阅在连接期间一直占着一个处理线程，限制并发数，给其余请求留出线程
+MAX_SSE_STREAMS = int(os.environ.get("MAX_SSE_STREAMS", "8"))
+SSE_STREAM_SLOTS = threading.BoundedSemaphore(max(MAX_SSE_STREAMS, 1))
+# 线程全忙时最多排队的连接数，再多直接回 503
+MAX_PENDING_CONNECTIONS = int(os.environ.get("MAX_PENDING_CONNECTIONS", "64"))
+PRIORITY_HANDLER_THREADS = 2
+# 线程全忙时，请求行迟迟不到的连接最多等这么久再按普通连接排队
+TRIAGE_TIMEOUT_SECONDS = 1.0
+KEEPALIVE_TIMEOUT_SECONDS = 5.0
+MAX_KEEPALIVE_REQUESTS = 100
+PRIORITY_REQUEST_PREFIX = b"POST /stop"
+MAX_BATCH_SIZE = 20
+# 小响应压缩收益抵不过 gzip 头和 CPU 开销
+GZIP_MIN_BYTES = 512
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+_BUSY_BODY = b'{"ok": false, "error": "server_busy", "retry_after": 1}'
+BUSY_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: " + JSON_CONTENT_TYPE.encode("ascii") + b"\r\n"
+    b"Content-Length: " + str(len(_BUSY_BODY)).encode("ascii") + b"\r\n"
+    b"Retry-After: 1\r\nConnection: close\r\n\r\n" + _BUSY_BODY
+)
+JOURNAL_DIR = os.environ.get("JOURNAL_DIR")
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", "500"))
+QUEUE_MANAGER = QueueManager(
+    lanes=ACTION_LANES,
+    journal=Journal(JOURNAL_DIR) if JOURNAL_DIR else None,
+    max_queue_depth=MAX_QUEUE_DEPTH if MAX_QUEUE_DEPTH > 0 else None,
+)
+# 每个 token / 客户端地址的令牌桶；RATE_LIMIT_PER_SECOND=0 关闭限流
+RATE_LIMITER = RateLimiter(
+    float(os.environ.get("RATE_LIMIT_PER_SECOND", "10")),
+    float(os.environ.get("RATE_LIMIT_BURST", "30")),
+)
+# 过载时操作者仍需能看状态、能 STOP
+RATE_LIMIT_EXEMPT_PATHS = {"/status", "/stop"}
+MAX_NL_TEXT_LENGTH = 500
+MAX_NL_WAIT_MS = 30000
+# 服务端宏：可选从 MACROS_PATH（JSON，{name: [steps]}）加载，也可通过 POST /macros 注册
+MACROS = MacroRegistry()
+if os.environ.get("MACROS_PATH"):
+    MACROS.load(os.environ["MACROS_PATH"])
+
+
+def _stop_everything() -> Dict[str, Any]:
+    # 先取消待解析的自然语言请求，再清空队列：正在派发的解析结果也会被 stop_all 清掉
+    cancelled_parses = NL_DISPATCHER.cancel_pending()
+    result = QUEUE_MANAGER.stop_all()
+    result["cancelled_parses"] = cancelled_parses
+    return result
+
+
+def _dispatch_parsed(command: Dict[str, Any]) -> Dict[str, Any]:
+    # LLM 的输出与 /command 走同一套白名单校验
+    ok, error = validate_command(command)
+    if not ok:
+        raise ValueError(error)
+    if command["action"] == "stop":
+        return {"stop": _stop_everything()}
+    submitted = QUEUE_MANAGER.submit(command["action"], command["params"], validated=True)
+    return {"task_id": submitted["task_id"]}
+
+
+NL_DISPATCHER = ParseDispatcher(
+    parse_natural_language,
+    _dispatch_parsed,
+    fast_parse=match_phrase,
+    workers=int(os.environ.get("NL_WORKERS", "4")),
+    max_pending=int(os.environ.get("NL_MAX_PENDING", "32")),
+    max_tickets_per_job=int(os.environ.get("NL_MAX_TICKETS_PER_JOB", "64")),
+    deadline_seconds=float(os.environ.get("NL_DEADLINE_SECONDS", "30")),
+)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 路径作为 label 前先归一化，避免 /tasks/<id> 这类路径撑爆时间序列数量
+KNOWN_PATHS = {"/status", "/logs", "/events", "/metrics", "/stop", "/command", "/commands", "/nl", "/macros"}
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    "agent_http_request_seconds", "HTTP request latency", ("method", "path")
+)
+REJECTED_CONNECTIONS = METRICS.counter(
+    "agent_http_rejected_connections_total", "Connections answered with 503 because the handler queue was full"
+)
+METRICS.gauge(
+    "agent_pending_timers",
+    "Delayed and recurring tasks waiting to fire",
+    lambda: {(): QUEUE_MANAGER.pending_timers()},
+)
+METRICS.gauge(
+    "agent_queue_depth",
+    "Tasks waiting in each lane",
+    lambda: {(lane,): depth for lane, depth in QUEUE_MANAGER.queue_depths().items()},
+    ("lane",),
+)
 
 
 class SimpleHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive：每个响应都必须带准确的 Content-Length
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT_SECONDS
+    # 响应头和 body 分两次写出，keep-alive 下 Nagle 会与延迟 ACK 叠加出 40ms 停顿
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self._responses_sent = 0
+
+    def handle_one_request(self):
+        self._body_consumed = False
+        self._request_started = None
+        super().handle_one_request()
+        if self._request_started is not None:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - self._request_started,
+                (self.command, _path_label(self.path)),
+            )
+
+    def parse_request(self):
+        # 从读到请求行开始计时，不把 keep-alive 空闲等待算进去；
+        # 请求行不合法时 self.path 不会被赋值，这类请求不计入指标
+        started = time.perf_counter()
+        ok = super().parse_request()
+        if ok:
+            self._request_started = started
+        return ok
+
     def do_GET(self):
-        if self.path == "/status":
+        url = urlsplit(self.path)
+        if url.path not in RATE_LIMIT_EXEMPT_PATHS and not self._admit():
+            return
+
+        if url.path == "/status":
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            snapshot = QUEUE_MANAGER.status_snapshot()
+            self._send_cacheable(snapshot.etag, snapshot.to_json, snapshot.to_gzip)
+            return
+
+        if url.path == "/logs":
             if not self._is_authorized():
                 self._send_json(401, {"ok": False, "error": "unauthorized"})
                 return
-            self._send_json(200, {"ok": True, "data": QUEUE_MANAGER.status()})
+            query, error = _parse_logs_query(url.query)
+            if query is None:
+                self._send_json(400, {"ok": False, "error": error})
+                return
+            # 先取 last_seq 再查询：并发追加时 ETag 只会偏旧（多传一次），不会把新数据判成未变化
+            etag = f'"{QUEUE_MANAGER.boot_id}-l{QUEUE_MANAGER.last_log_seq()}"'
+            self._send_cacheable(etag, lambda: _logs_body(query))
             return
 
-        if self.path == "/logs":
+        if url.path == "/metrics":
             if not self._is_authorized():
                 self._send_json(401, {"ok": False, "error": "unauthorized"})
                 return
-            self._send_json(200, {"ok": True, "data": QUEUE_MANAGER.logs()})
+            self._send_bytes(200, METRICS.render().encode("utf-8"), METRICS_CONTENT_TYPE)
             return
 
-        self.send_response(200)
-        self.send_header("Content-Type", "text/plain; charset=utf-8")
-        self.end_headers()
-        self.wfile.write("OK".encode("utf-8"))
+        if url.path.startswith("/tasks/"):
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            task = QUEUE_MANAGER.get_task(url.path[len("/tasks/"):])
+            if task is None:
+                self._send_json(404, {"ok": False, "error": "task_not_found"})
+                return
+            self._send_json(200, {"ok": True, "data": task})
+            return
+
+        if url.path.startswith("/nl/"):
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            params = parse_qs(url.query)
+            query: Dict[str, Any] = {"wait_ms": 0}
+            error = _parse_int_params(params, query, ("wait_ms",))
+            if error:
+                self._send_json(400, {"ok": False, "error": error})
+                return
+            wait = min(query["wait_ms"], MAX_NL_WAIT_MS) / 1000.0
+            ticket = NL_DISPATCHER.get(url.path[len("/nl/"):], wait)
+            if ticket is None:
+                self._send_json(404, {"ok": False, "error": "ticket_not_found"})
+                return
+            self._send_json(200, {"ok": True, "data": ticket})
+            return
+
+        if url.path.startswith("/timers/"):
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            timer = QUEUE_MANAGER.get_timer(url.path[len("/timers/"):])
+            if timer is None:
+                self._send_json(404, {"ok": False, "error": "timer_not_found"})
+                return
+            self._send_json(200, {"ok": True, "data": timer})
+            return
+
+        if url.path == "/macros":
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            self._send_json(200, {"ok": True, "data": MACROS.names()})
+            return
+
+        if url.path == "/events":
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            query, error = _parse_events_query(url.query)
+            if query is None:
+                self._send_json(400, {"ok": False, "error": error})
+                return
+            if "text/event-stream" in self.headers.get("Accept", ""):
+                self._stream_events(query)
+            else:
+                self._long_poll_events(query)
+            return
+
+        self._send_bytes(200, "OK".encode("utf-8"), "text/plain; charset=utf-8")
 
     def do_POST(self):
         if self.path == "/stop":
             if not self._is_authorized():
                 self._send_json(401, {"ok": False, "error": "unauthorized"})
                 return
-            result = QUEUE_MANAGER.stop_all()
+            result = _stop_everything()
+            # 优先通道只服务一次请求，避免占着不受限的线程
+            self.close_connection = True
             self._send_json(200, result)
             return
 
+        if self.path == "/commands":
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            if not self._admit():
+                return
+            self._handle_batch()
+            return
+
+        if self.path == "/nl":
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            if not self._admit():
+                return
+            self._handle_nl()
+            return
+
+        if self.path.startswith("/timers/") and self.path.endswith("/cancel"):
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            timer_id = self.path[len("/timers/"):-len("/cancel")]
+            if not QUEUE_MANAGER.cancel_timer(timer_id):
+                self._send_json(404, {"ok": False, "error": "timer_not_found"})
+                return
+            self._send_json(200, {"ok": True, "timer_id": timer_id})
+            return
+
+        if self.path == "/macros" or self.path.startswith("/macro/"):
+            if not self._is_authorized():
+                self._send_json(401, {"ok": False, "error": "unauthorized"})
+                return
+            if not self._admit():
+                return
+            if self.path == "/macros":
+                self._handle_register_macro()
+            else:
+                self._handle_run_macro(self.path[len("/macro/"):])
+            return
+
         if self.path != "/command":
-            self.send_response(404)
-            self.end_headers()
+            self._send_bytes(404, b"", "text/plain; charset=utf-8")
             return
 
         # ===== 鉴权 =====
@@ -63,51 +328,648 @@ class SimpleHandler(BaseHTTPRequestHandler):
 
         # ===== 白名单校验 =====
         ok, error = validate_command(payload)
+        if ok:
+            ok, error = validate_scheduling(payload)
         if not ok:
             self._send_json(400, {"ok": False, "error": error})
             return
 
-        action = payload["action"]
-        params = payload["params"]
-        return self._handle_action(action, params)
-
-        task_id = QUEUE_MANAGER.enqueue(action, params)
+        idempotency_key = self.headers.get("Idempotency-Key")
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+            self._send_json(400, {"ok": False, "error": "idempotency_key_invalid"})
+            return
 
-        self._send_json(200, {"ok": True, "task_id": task_id})
+        return self._handle_action(payload, idempotency_key)
 
     def _is_authorized(self) -> bool:
         auth_header = self.headers.get("Authorization", "")
         return bool(AUTH_TOKEN) and auth_header == f"Bearer {AUTH_TOKEN}"
 
-    def _handle_action(self, action: str, params: dict) -> None:
-        if action == "stop":
-            result = QUEUE_MANAGER.stop_all()
+    def _admit(self) -> bool:
+        # 已鉴权的请求按 token 计，其余按客户端地址计，伪造 token 绕不过限流
+        if self._is_authorized():
+            key = "token:" + self.headers.get("Authorization", "")
+        else:
+            key = "addr:" + self.client_address[0]
+        wait = RATE_LIMITER.acquire(key)
+        if wait <= 0:
+            return True
+        self._send_too_many("rate_limited", math.ceil(wait))
+        return False
+
+    def _send_too_many(self, error: str, retry_after: int) -> None:
+        self._send_json(
+            429,
+            {"ok": False, "error": error, "retry_after": retry_after},
+            {"Retry-After": str(retry_after)},
+        )
+
+    def _handle_action(self, payload: dict, idempotency_key: Optional[str] = None) -> None:
+        if payload["action"] == "stop":
+            result = _stop_everything()
             self._send_json(200, {"ok": True, "action": "stop", "result": result})
             return
-        task_id = QUEUE_MANAGER.enqueue(action, params)
-        self._send_json(200, {"ok": True, "task_id": task_id})
+        if not self._admit():
+            return
+        self._submit(payload["action"], payload["params"], payload, idempotency_key)
+
+    def _submit(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        payload: Dict[str, Any],
+        idempotency_key: Optional[str],
+    ) -> None:
+        # 客户端重试时用同一个 Idempotency-Key，窗口内返回同一个 task_id / timer_id；
+        # 调用方都已做过入口校验，执行前不再重复
+        options = {
+            "validated": True,
+            "priority": payload.get("priority", 0),
+            "deadline_ms": payload.get("deadline_ms"),
+            "idempotency_key": idempotency_key,
+            "coalesce": payload.get("coalesce", False),
+        }
+        if has_timer(payload):
+            # 定时任务只登记，到期时由定时线程入队；不占用 worker
+            result = QUEUE_MANAGER.schedule(
+                action,
+                params,
+                run_at=payload.get("run_at"),
+                delay_ms=payload.get("delay_ms"),
+                repeat_ms=payload.get("repeat_ms"),
+                **options,
+            )
+            self._send_json(200, {"ok": True, **result})
+            return
+        try:
+            result = QUEUE_MANAGER.submit(action, params, **options)
+        except QueueFullError as exc:
+            self._send_too_many("queue_full", exc.retry_after)
+            return
+        self._send_json(
+            200,
+            {"ok": True, "task_id": result["task_id"], "deduplicated": result["deduplicated"]},
+        )
+
+    def _handle_batch(self) -> None:
+        try:
+            payload = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json(400, {"ok": False, "error": "invalid_json"})
+            return
+
+        if not isinstance(payload, list):
+            self._send_json(400, {"ok": False, "error": "body_must_be_array"})
+            return
+        if not payload:
+            self._send_json(400, {"ok": False, "error": "batch_empty"})
+            return
+        if len(payload) > MAX_BATCH_SIZE:
+            self._send_json(400, {"ok": False, "error": "batch_too_large"})
+            return
+
+        # 先全部校验，任何一条失败则整批拒绝，不入队
+        for index, item in enumerate(payload):
+            ok, error = validate_command(item)
+            if ok:
+                ok, error = validate_scheduling(item)
+            if not ok:
+                self._send_json(400, {"ok": False, "error": error, "index": index})
+                return
+            if has_timer(item):
+                self._send_json(
+                    400, {"ok": False, "error": "timer_not_allowed_in_batch", "index": index}
+                )
+                return
+            # stop 只能放在第一条：先清空队列并中断当前任务，再原子地入队其余指令
+            if item["action"] == "stop" and index != 0:
+                self._send_json(
+                    400, {"ok": False, "error": "stop_must_be_first", "index": index}
+                )
+                return
+
+        stop_first = payload[0]["action"] == "stop"
+        if stop_first:
+            NL_DISPATCHER.cancel_pending()
+        try:
+            result = QUEUE_MANAGER.enqueue_many(
+                payload[int(stop_first):], stop_first=stop_first, validated=True
+            )
+        except QueueFullError as exc:
+            self._send_too_many("queue_full", exc.retry_after)
+            return
+        self._send_json(200, {"ok": True, "task_ids": result["task_ids"], "stop": result["stop"]})
+
+    def _handle_register_macro(self) -> None:
+        try:
+            payload = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json(400, {"ok": False, "error": "invalid_json"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"ok": False, "error": "body_must_be_object"})
+            return
+        # 注册时一次性完成白名单与 skill 参数校验，运行时不再逐步校验
+        try:
+            steps = MACROS.register(payload.get("name"), payload.get("steps"))
+        except MacroError as exc:
+            self._send_json(400, {"ok": False, "error": exc.code, "index": exc.index})
+            return
+        self._send_json(
+            200, {"ok": True, "name": payload["name"], "steps": [step["action"] for step in steps]}
+        )
+
+    def _handle_run_macro(self, name: str) -> None:
+        raw_body = self._read_body()
+        try:
+            payload = json.loads(raw_body) if raw_body.strip() else {}
+        except json.JSONDecodeError:
+            self._send_json(400, {"ok": False, "error": "invalid_json"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"ok": False, "error": "body_must_be_object"})
+            return
+        ok, error = validate_scheduling(payload)
+        if not ok:
+            self._send_json(400, {"ok": False, "error": error})
+            return
+        idempotency_key = self.headers.get("Idempotency-Key")
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+            self._send_json(400, {"ok": False, "error": "idempotency_key_invalid"})
+            return
+
+        steps = MACROS.get(name)
+        if steps is None:
+            self._send_json(404, {"ok": False, "error": "macro_not_found"})
+            return
+        # 整个宏作为一个任务入队；步骤随任务写入 journal，重启后按入队时的定义执行
+        self._submit("macro", {"name": name, "steps": steps}, payload, idempotency_key)
+
+    def _handle_nl(self) -> None:
+        try:
+            payload = json.loads(self._read_body())
+        except json.JSONDecodeError:
+            self._send_json(400, {"ok": False, "error": "invalid_json"})
+            return
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            self._send_json(400, {"ok": False, "error": "text_required"})
+            return
+        if len(text) > MAX_NL_TEXT_LENGTH:
+            self._send_json(400, {"ok": False, "error": "text_too_long"})
+            return
+
+        # 立即返回票据；LLM 调用在解析线程池里进行，不占用 HTTP 处理线程
+        try:
+            ticket = NL_DISPATCHER.submit(text)
+        except ParseBusyError:
+            self._send_too_many("nl_queue_full", 1)
+            return
+        status = 200 if ticket["status"] in ("done", "rejected", "failed") else 202
+        self._send_json(status, {"ok": True, "data": ticket})
+
+    def _long_poll_events(self, query: Dict[str, Any]) -> None:
+        since_seq = query["since"]
+        deadline = time.monotonic() + query["timeout_ms"] / 1000.0
+        while True:
+            entries = QUEUE_MANAGER.logs(since_seq=since_seq, limit=query["limit"])
+            remaining = deadline - time.monotonic()
+            if entries or remaining <= 0:
+                break
+            QUEUE_MANAGER.wait_for_logs(since_seq, remaining)
+
+        next_seq = entries[-1]["seq"] if entries else since_seq
+        self._send_json(200, {"ok": True, "data": entries, "next_seq": next_seq})
+
+    def _stream_events(self, query: Dict[str, Any]) -> None:
+        # SSE：断线重连时浏览器/客户端会带 Last-Event-ID
+        since_seq = query["since"]
+        last_event_id = self.headers.get("Last-Event-ID")
+        if last_event_id and last_event_id.isdigit():
+            since_seq = int(last_event_id)
+
+        slots = SSE_STREAM_SLOTS
+        if not slots.acquire(blocking=False):
+            self._send_json(
+                503,
+                {"ok": False, "error": "sse_streams_exhausted", "retry_after": 1},
+                {"Retry-After": "1"},
+            )
+            return
+        try:
+            self._serve_stream(since_seq, query["limit"])
+        finally:
+            slots.release()
+
+    def _serve_stream(self, since_seq: int, limit: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            while True:
+                entries = QUEUE_MANAGER.logs(since_seq=since_seq, limit=limit)
+                if not entries:
+                    if not QUEUE_MANAGER.wait_for_logs(since_seq, SSE_KEEPALIVE_SECONDS):
+                        self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                    continue
+                for entry in entries:
+                    chunk = (
+                        f"id: {entry['seq']}\n"
+                        f"event: {entry['event']}\n"
+                        f"data: {json.dumps(entry)}\n\n"
+                    )
+                    self.wfile.write(chunk.encode("utf-8"))
+                self.wfile.flush()
+                since_seq = entries[-1]["seq"]
+        except OSError:
+            return
 
     def _read_body(self) -> str:
         content_length = int(self.headers.get("Content-Length", "0"))
+        self._body_consumed = True
         return self.rfile.read(content_length).decode("utf-8")
 
-    def _send_json(self, status: int, payload: dict) -> None:
+    def _send_json(
+        self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self._send_bytes(status, body, JSON_CONTENT_TYPE, headers)
+
+    def _send_cacheable(
+        self,
+        etag: str,
+        render: Callable[[], bytes],
+        render_gzip: Optional[Callable[[], bytes]] = None,
+    ) -> None:
+        # ETag 命中时只回 304，不生成也不传输 body
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self._send_bytes(304, b"", JSON_CONTENT_TYPE, {"ETag": etag})
+            return
+
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        body = render()
+        if len(body) >= GZIP_MIN_BYTES and _accepts_gzip(self.headers.get("Accept-Encoding")):
+            body = render_gzip() if render_gzip is not None else gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+        self._send_bytes(200, body, JSON_CONTENT_TYPE, headers)
+
+    def _send_bytes(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self._responses_sent += 1
+        # 未读取的请求体会污染下一个请求；单连接请求数也有上限，让出线程
+        if not self._body_consumed and self.headers.get("Content-Length", "0") != "0":
+            self.close_connection = True
+        if self._responses_sent >= MAX_KEEPALIVE_REQUESTS:
+            self.close_connection = True
+        # 普通 HTTPServer（如压测里的对照组）没有线程池，总是允许 keep-alive
+        keepalive_allowed = getattr(self.server, "keepalive_allowed", None)
+        if keepalive_allowed is not None and not keepalive_allowed(self.request):
+            self.close_connection = True
+
         self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
+        # 304 不带 body，也不能声明 body 长度
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
-        self.wfile.write(json.dumps(payload).encode("utf-8"))
+        if body:
+            self.wfile.write(body)
 
     def _is_authorized(self) -> bool:
         auth_header = self.headers.get("Authorization", "")
         return bool(AUTH_TOKEN) and auth_header == f"Bearer {AUTH_TOKEN}"
 
 
+class AgentHTTPServer(ThreadingHTTPServer):
+    """固定线程池的 HTTP 服务器：连接先进有界队列，由池内线程处理，不为等待中的连接开线程。
+
+    没有空闲线程时按请求行分拣：POST /stop 交给少量优先线程，不排队；请求行还没到的连接
+    交给分拣线程统一等待，accept 线程从不阻塞。队列也满时直接回 503 并关闭连接。
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        max_threads: int = MAX_HANDLER_THREADS,
+        max_pending: int = MAX_PENDING_CONNECTIONS,
+    ):
+        super().__init__(server_address, handler_class)
+        self._pending: "queue.Queue[Optional[Tuple[socket.socket, Any]]]" = queue.Queue(max_pending)
+        self._state_lock = threading.Lock()
+        self._idle_workers = 0
+        self._priority_slots = threading.BoundedSemaphore(PRIORITY_HANDLER_THREADS)
+        self._priority_requests = set()
+        self._triage = _ConnectionTriage(self._route, max_pending)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"http-{index}", daemon=True)
+            for index in range(max_threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        # 有空闲线程时直接入队；池满时才看请求行，只做非阻塞窥探
+        with self._state_lock:
+            saturated = self._idle_workers == 0
+        if not saturated:
+            self._enqueue(request, client_address)
+            return
+        prefix = _peek_request_prefix(request)
+        if prefix is None and self._triage.add(request, client_address):
+            return
+        self._route(request, client_address, prefix or b"")
+
+    def keepalive_allowed(self, request) -> bool:
+        """没有空闲线程或有连接在排队时不保持 keep-alive，空闲连接不再占住线程；优先通道只处理一个请求。"""
+        with self._state_lock:
+            if request in self._priority_requests:
+                return False
+            return self._idle_workers > 0 and self._pending.empty()
+
+    def server_close(self):
+        super().server_close()
+        for request in self._triage.close():
+            self.shutdown_request(request)
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in self._workers:
+            self._pending.put(None)
+
+    def _route(self, request, client_address, prefix: bytes) -> None:
+        if prefix == PRIORITY_REQUEST_PREFIX and self._priority_slots.acquire(blocking=False):
+            threading.Thread(
+                target=self._process_priority, args=(request, client_address), daemon=True
+            ).start()
+            return
+        self._enqueue(request, client_address)
+
+    def _enqueue(self, request, client_address) -> None:
+        try:
+            self._pending.put_nowait((request, client_address))
+        except queue.Full:
+            self._reject_busy(request)
+
+    def _work(self) -> None:
+        while True:
+            with self._state_lock:
+                self._idle_workers += 1
+            item = self._pending.get()
+            with self._state_lock:
+                self._idle_workers -= 1
+            if item is None:
+                return
+            self.process_request_thread(*item)
+
+    def _process_priority(self, request, client_address) -> None:
+        with self._state_lock:
+            self._priority_requests.add(request)
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            with self._state_lock:
+                self._priority_requests.discard(request)
+            self._priority_slots.release()
+
+    def _reject_busy(self, request) -> None:
+        REJECTED_CONNECTIONS.inc()
+        # 新连接的发送缓冲区是空的，非阻塞写一次即可，不会卡住 accept 线程
+        request.setblocking(False)
+        try:
+            request.sendall(BUSY_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+
+class _ConnectionTriage:
+    """池满时请求行尚未到达的连接：一个线程用 selector 等它们可读，再按请求行交回 route。
+
+    等待超过 TRIAGE_TIMEOUT_SECONDS 仍没有数据的连接按普通连接入队；同时等待的连接数有上限。
+    """
+
+    def __init__(self, route: Callable[[socket.socket, Any, bytes], None], limit: int) -> None:
+        self._route = route
+        self._limit = limit
+        self._selector = selectors.DefaultSelector()
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+        self._lock = threading.Lock()
+        self._incoming: List[Tuple[socket.socket, Any]] = []
+        self._waiting = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="http-triage", daemon=True)
+        self._thread.start()
+
+    def add(self, request: socket.socket, client_address: Any) -> bool:
+        with self._lock:
+            if self._closed or self._waiting >= self._limit:
+                return False
+            self._waiting += 1
+            self._incoming.append((request, client_address))
+        self._wake()
+        return True
+
+    def close(self) -> List[socket.socket]:
+        """停止分拣线程，返回还没交出去的连接，由调用方关闭。"""
+        with self._lock:
+            self._closed = True
+        self._wake()
+        self._thread.join()
+        left = [request for request, _ in self._incoming]
+        left.extend(
+            key.fileobj for key in self._selector.get_map().values() if key.data is not None
+        )
+        self._selector.close()
+        self._wake_reader.close()
+        self._wake_writer.close()
+        return left
+
+    def _wake(self) -> None:
+        try:
+            self._wake_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        while True:
+            deadlines = [
+                key.data[1] for key in self._selector.get_map().values() if key.data is not None
+            ]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            events = self._selector.select(timeout)
+            with self._lock:
+                if self._closed:
+                    return
+                incoming, self._incoming = self._incoming, []
+            now = time.monotonic()
+            for request, client_address in incoming:
+                self._selector.register(
+                    request, selectors.EVENT_READ, (client_address, now + TRIAGE_TIMEOUT_SECONDS)
+                )
+            for key, _ in events:
+                if key.data is None:
+                    try:
+                        self._wake_reader.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                self._hand_off(key, _peek_request_prefix(key.fileobj) or b"")
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None and key.data[1] <= now:
+                    self._hand_off(key, b"")
+
+    def _hand_off(self, key: selectors.SelectorKey, prefix: bytes) -> None:
+        self._selector.unregister(key.fileobj)
+        with self._lock:
+            self._waiting -= 1
+        self._route(key.fileobj, key.data[0], prefix)
+
+
+def _peek_request_prefix(request: socket.socket) -> Optional[bytes]:
+    """非阻塞窥探请求行开头；还没有数据可读时返回 None。"""
+    try:
+        return request.recv(len(PRIORITY_REQUEST_PREFIX), socket.MSG_PEEK | socket.MSG_DONTWAIT)
+    except BlockingIOError:
+        return None
+    except OSError:
+        return b""
+
+
+def _path_label(path: str) -> str:
+    path = urlsplit(path).path
+    if path in KNOWN_PATHS:
+        return path
+    if path.startswith("/tasks/"):
+        return "/tasks/{id}"
+    if path.startswith("/nl/"):
+        return "/nl/{id}"
+    if path.startswith("/macro/"):
+        return "/macro/{name}"
+    if path.startswith("/timers/"):
+        return "/timers/{id}/cancel" if path.endswith("/cancel") else "/timers/{id}"
+    return "other"
+
+
+def _logs_body(query: Dict[str, Any]) -> bytes:
+    entries = QUEUE_MANAGER.logs(**query)
+    next_seq = entries[-1]["seq"] if entries else query["since_seq"]
+    return json.dumps({"ok": True, "data": entries, "next_seq": next_seq}).encode("utf-8")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀（代理压缩后可能把强 ETag 改成弱 ETag）
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() != "gzip":
+            continue
+        quality = params.strip().lower()
+        return not quality.startswith("q=") or _parse_quality(quality[2:]) > 0
+    return False
+
+
+def _parse_quality(raw: str) -> float:
+    try:
+        return float(raw)
+    except ValueError:
+        return 0.0
+
+
+def _parse_int_params(
+    params: Dict[str, Any], query: Dict[str, Any], keys: Tuple[str, ...]
+) -> str:
+    for key in keys:
+        if key not in params:
+            continue
+        try:
+            value = int(params[key][0])
+        except ValueError:
+            return f"{key}_must_be_integer"
+        if value < 0 or (key == "limit" and value == 0):
+            return f"{key}_out_of_range"
+        query[key] = value
+    return ""
+
+
+def _parse_logs_query(raw_query: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    params = parse_qs(raw_query)
+    query: Dict[str, Any] = {
+        "since_seq": 0,
+        "task_id": None,
+        "event": None,
+        # 未指定时也按上限分页，避免一次序列化整个日志缓冲区
+        "limit": MAX_LOGS_LIMIT,
+    }
+
+    error = _parse_int_params(params, query, ("since_seq", "limit"))
+    if error:
+        return None, error
+
+    query["limit"] = min(query["limit"], MAX_LOGS_LIMIT)
+
+    for key in ("task_id", "event"):
+        if key in params:
+            query[key] = params[key][0]
+
+    return query, ""
+
+
+def _parse_events_query(raw_query: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    params = parse_qs(raw_query)
+    query: Dict[str, Any] = {
+        "since": 0,
+        "timeout_ms": DEFAULT_EVENTS_WAIT_MS,
+        "limit": MAX_LOGS_LIMIT,
+    }
+
+    error = _parse_int_params(params, query, ("since", "timeout_ms", "limit"))
+    if error:
+        return None, error
+
+    query["timeout_ms"] = min(query["timeout_ms"], MAX_EVENTS_WAIT_MS)
+    query["limit"] = min(query["limit"], MAX_LOGS_LIMIT)
+    return query, ""
+
+
 def run_server():
     if not AUTH_TOKEN:
         print("ERROR: AUTH_TOKEN is not set")
         return
 
-    server = HTTPServer((HOST, PORT), SimpleHandler)
+    # /events 会长时间占用连接，需要多线程服务器，避免挡住 /stop
+    server = AgentHTTPServer((HOST, PORT), SimpleHandler)
     print(f"Server running at http://{HOST}:{PORT}")
     print("POST /command requires Authorization and action/params")
     try:
@@ -0,0 +1,232 @@
+import importlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+ALLOWED_APPS = {
+    "Notes",
+    "Safari",
+    "Google Chrome",
+    "Terminal",
+    "Visual Studio Code",
+}
+
+MAX_TEXT_LENGTH = 200
+MAX_TITLE_LENGTH = 80
+MAX_URL_LENGTH = 2048
+MAX_SLEEP_MS = 5000
+
+# 声明式的 skill 表：每个 action 一项，API、LLM、宏和执行器都从这里取校验与分发信息。
+#   handler   "模块:函数"，第一次执行时才导入，依赖较重的 skill 不拖慢启动
+#   lane      执行通道；None 表示不入队（stop 由服务端直接处理）
+#   timeout   外部命令超时（秒）
+#   llm       是否允许由自然语言解析产生
+#   params    字段 -> 规则；required 为缺失或类型不符时的错误码，其余规则为 (参数, 错误码)
+#   closed    非 None 时不允许出现 params 以外的键，值为错误码
+#   redact    写入任务结果的脱敏字段 -> 截断长度（None 不截断）；缺省为原样复制
+SKILL_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "ping": {"handler": "skills:ping", "lane": "background", "llm": True},
+    "noop": {"handler": "skills:noop", "lane": "background", "llm": True},
+    "stop": {"handler": None, "lane": None, "llm": True},
+    "open_app": {
+        "handler": "skills:open_app",
+        "lane": "ui",
+        "timeout": 10.0,
+        "params": {
+            "app_name": {
+                "type": str,
+                "required": "open_app_requires_app_name",
+                "choices": (ALLOWED_APPS, "app_not_allowed"),
+            },
+        },
+        "redact": {"app_name": None},
+    },
+    "open_url": {
+        "handler": "skills:open_url",
+        "lane": "ui",
+        "timeout": 10.0,
+        "params": {
+            "url": {
+                "type": str,
+                "required": "open_url_requires_url",
+                "max_length": (MAX_URL_LENGTH, "url_too_long"),
+                "pattern": (r"^https?://", "url_not_allowed"),
+            },
+        },
+        "redact": {"url": 120},
+    },
+    "notify": {
+        "handler": "skills:notify",
+        "lane": "background",
+        "timeout": 5.0,
+        "params": {
+            "title": {
+                "type": str,
+                "required": "notify_requires_title",
+                "max_length": (MAX_TITLE_LENGTH, "title_too_long"),
+            },
+            "message": {
+                "type": str,
+                "required": "notify_requires_message",
+                "max_length": (MAX_TEXT_LENGTH, "message_too_long"),
+            },
+        },
+        "redact": {"title": MAX_TITLE_LENGTH, "message": MAX_TEXT_LENGTH},
+    },
+    "screenshot": {
+        "handler": "skills:screenshot",
+        "lane": "ui",
+        "timeout": 15.0,
+        "closed": "screenshot_params_must_be_empty",
+        "redact": {},
+    },
+    "sleep": {
+        "handler": "skills:sleep",
+        "lane": "background",
+        "llm": True,
+        "params": {
+            "ms": {
+                "type": int,
+                "required": "sleep_requires_ms",
+                "range": ((0, MAX_SLEEP_MS), "ms_out_of_range"),
+            },
+        },
+        "redact": {"ms": None},
+    },
+}
+
+
+class SkillError(Exception):
+    def __init__(self, code: str, message: str, terminate_ms: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.terminate_ms = terminate_ms
+
+
+@dataclass
+class SkillResult:
+    ok: bool
+    message: str
+    artifact_path: Optional[str] = None
+    terminate_ms: Optional[int] = None
+
+
+Validator = Callable[..., Optional[str]]
+
+
+@dataclass
+class SkillSpec:
+    action: str
+    validate: Validator
+    handler_path: Optional[str]
+    lane: Optional[str]
+    timeout: Optional[float] = None
+    llm: bool = False
+    redact: Optional[Dict[str, Optional[int]]] = None
+    _handler: Optional[Callable[..., SkillResult]] = field(default=None, repr=False)
+
+    def handler(self) -> Callable[..., SkillResult]:
+        # 并发首次调用时可能重复导入一次，import_module 自身是线程安全的
+        if self._handler is None:
+            module_name, function_name = self.handler_path.split(":")
+            self._handler = getattr(importlib.import_module(module_name), function_name)
+        return self._handler
+
+    def redact_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        if self.redact is None:
+            return dict(params)
+        return {name: _truncate(params.get(name), limit) for name, limit in self.redact.items()}
+
+
+def compile_validator(params_schema: Dict[str, Dict[str, Any]], closed: Optional[str]) -> Validator:
+    """把字段规则在导入时整理成一张平铺的检查表，校验时只按表比较，不再逐条解析 schema。
+
+    validate(params, strict=False) 返回第一个错误码，合法时返回 None；
+    strict=True 时额外拒绝 schema 以外的键（LLM 输出用）。
+    """
+    known = frozenset(params_schema)
+    extra_error = closed or "unexpected_params"
+    # 每个字段一行，未声明的规则为 None：
+    # (字段, 类型, 缺失错误码, 允许集合, 错误码, 最大长度, 错误码, 正则 match, 错误码, 下限, 上限, 错误码)
+    table = []
+    for name, rule in params_schema.items():
+        choices, choices_error = rule.get("choices", (None, None))
+        max_length, length_error = rule.get("max_length", (None, None))
+        pattern, pattern_error = rule.get("pattern", (None, None))
+        (low, high), range_error = rule.get("range", ((None, None), None))
+        table.append((
+            name,
+            rule["type"],
+            rule["required"],
+            None if choices is None else frozenset(choices),
+            choices_error,
+            max_length,
+            length_error,
+            None if pattern is None else re.compile(pattern, re.IGNORECASE).match,
+            pattern_error,
+            low,
+            high,
+            range_error,
+        ))
+    table = tuple(table)
+
+    if not table:
+        # ping / screenshot 这类无参数的 skill 只需检查有没有多余的键
+        def validate_empty(params: Dict[str, Any], strict: bool = False) -> Optional[str]:
+            if params and (closed is not None or strict):
+                return extra_error
+            return None
+
+        return validate_empty
+
+    def validate(params: Dict[str, Any], strict: bool = False) -> Optional[str]:
+        if (closed is not None or strict) and not known.issuperset(params):
+            return extra_error
+        for (
+            name, kind, required, choices, choices_error, max_length, length_error,
+            match, pattern_error, low, high, range_error,
+        ) in table:
+            value = params.get(name)
+            # 精确匹配类型：bool 不算 int；字符串还要求非空白
+            if type(value) is not kind or (kind is str and not value.strip()):
+                return required
+            if choices is not None and value not in choices:
+                return choices_error
+            if max_length is not None and len(value) > max_length:
+                return length_error
+            if match is not None and match(value) is None:
+                return pattern_error
+            if low is not None and not low <= value <= high:
+                return range_error
+        return None
+
+    return validate
+
+
+def _compile_spec(action: str, schema: Dict[str, Any]) -> SkillSpec:
+    return SkillSpec(
+        action=action,
+        validate=compile_validator(schema.get("params", {}), schema.get("closed")),
+        handler_path=schema["handler"],
+        lane=schema["lane"],
+        timeout=schema.get("timeout"),
+        llm=schema.get("llm", False),
+        redact=schema.get("redact"),
+    )
+
+
+def _truncate(value: Any, length: Optional[int]) -> Any:
+    if length is None or not isinstance(value, str) or len(value) <= length:
+        return value
+    return value[: length - 3] + "..."
+
+
+SKILLS: Dict[str, SkillSpec] = {
+    action: _compile_spec(action, schema) for action, schema in SKILL_SCHEMAS.items()
+}
+
+# 每个外部命令的超时（秒），超时后按 SIGTERM → SIGKILL 终止；执行时按 action 查表，可在运行时调整
+ACTION_TIMEOUTS: Dict[str, float] = {
+    action: spec.timeout for action, spec in SKILLS.items() if spec.timeout is not None
+}
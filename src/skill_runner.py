@@ -0,0 +1,102 @@
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from cancellation import CancelEvent
+
+DEFAULT_BINARIES = {
+    "open": "/usr/bin/open",
+    "osascript": "/usr/bin/osascript",
+    "screencapture": "/usr/bin/screencapture",
+}
+DEFAULT_TERM_GRACE_SECONDS = 1.0
+
+
+@dataclass
+class RunOutcome:
+    returncode: Optional[int]
+    cancelled: bool = False
+    timed_out: bool = False
+    terminate_ms: Optional[int] = None
+
+
+class _Child:
+    def __init__(self, process: subprocess.Popen, grace: float) -> None:
+        self.process = process
+        self.terminated_at: Optional[float] = None
+        self._grace = grace
+        self._lock = threading.Lock()
+        self._kill_timer: Optional[threading.Timer] = None
+
+    def terminate(self) -> None:
+        # 先 SIGTERM，超过 grace 仍未退出再 SIGKILL
+        with self._lock:
+            if self.terminated_at is not None or self.process.poll() is not None:
+                return
+            self.terminated_at = time.monotonic()
+            self.process.terminate()
+            self._kill_timer = threading.Timer(self._grace, self._kill)
+            self._kill_timer.daemon = True
+            self._kill_timer.start()
+
+    def cancel_timer(self) -> None:
+        with self._lock:
+            if self._kill_timer is not None:
+                self._kill_timer.cancel()
+
+    def _kill(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+
+
+class SkillRunner:
+    """基于 Popen 的子进程执行器：子进程挂在任务的取消事件上，STOP 或超时即终止。"""
+
+    def __init__(
+        self,
+        *,
+        binaries: Optional[Dict[str, str]] = None,
+        term_grace: float = DEFAULT_TERM_GRACE_SECONDS,
+    ) -> None:
+        self._binaries = dict(DEFAULT_BINARIES)
+        self._binaries.update(binaries or {})
+        self._term_grace = term_grace
+
+    def binary(self, name: str) -> str:
+        return self._binaries[name]
+
+    def run(self, argv: List[str], cancel_event: CancelEvent, timeout: float) -> RunOutcome:
+        if cancel_event.is_set():
+            return RunOutcome(returncode=None, cancelled=True)
+
+        process = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        child = _Child(process, self._term_grace)
+        remove_callback = cancel_event.add_callback(child.terminate)
+        timed_out = False
+        try:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                child.terminate()
+                process.wait()
+        finally:
+            remove_callback()
+            child.cancel_timer()
+
+        terminate_ms = None
+        if child.terminated_at is not None:
+            terminate_ms = int((time.monotonic() - child.terminated_at) * 1000)
+        return RunOutcome(
+            returncode=process.returncode,
+            cancelled=cancel_event.is_set() and not timed_out,
+            timed_out=timed_out,
+            terminate_ms=terminate_ms,
+        )
@@ -0,0 +1,79 @@
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+
+class Task:
+    """队列中的任务记录。
+
+    用 __slots__ 而不是 dict：几万个任务常驻时内存和 GC 扫描开销都小得多。
+    action / lane 等重复出现的字符串做 intern，所有任务共享同一个对象。
+    只在 HTTP / journal 边界通过 to_dict() 转成 JSON 字典。
+    """
+
+    __slots__ = (
+        "id",
+        "action",
+        "params",
+        "status",
+        "lane",
+        "priority",
+        "deadline_at",
+        "enqueued_at",
+        "result",
+        "validated",
+        "fingerprint",
+    )
+
+    def __init__(
+        self,
+        task_id: str,
+        action: str,
+        params: Dict[str, Any],
+        *,
+        lane: str,
+        priority: int = 0,
+        deadline_at: Optional[float] = None,
+        enqueued_at: Optional[float] = None,
+        status: str = "queued",
+    ) -> None:
+        self.id = task_id
+        self.action = sys.intern(action)
+        self.params = params
+        self.status = status
+        self.lane = sys.intern(lane)
+        self.priority = priority
+        self.deadline_at = deadline_at
+        self.enqueued_at = enqueued_at
+        self.result: Optional[Dict[str, Any]] = None
+        # 入队前已通过 HTTP 入口校验；不写入 journal，回放出来的任务执行前会重新校验
+        self.validated = False
+        # 只有请求合并（coalesce）的任务才有：(action, 规范化 params)，入队时在锁外算好
+        self.fingerprint: Optional[Tuple[str, str]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], lane: str) -> "Task":
+        return cls(
+            data["id"],
+            data["action"],
+            data["params"],
+            lane=lane,
+            priority=data.get("priority", 0),
+            deadline_at=data.get("deadline_at"),
+            enqueued_at=data.get("enqueued_at"),
+            status=data.get("status", "queued"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "action": self.action,
+            "params": self.params,
+            "status": self.status,
+            "lane": self.lane,
+            "priority": self.priority,
+            "deadline_at": self.deadline_at,
+            "enqueued_at": self.enqueued_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        return data
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from task import Task
+
+TERMINAL_EVENTS = {"completed", "failed", "cancelled", "interrupted", "expired"}
+
+
+class _Entry:
+    __slots__ = (
+        "id",
+        "action",
+        "lane",
+        "priority",
+        "status",
+        "queued_at",
+        "started_at",
+        "finished_at",
+        "result",
+    )
+
+    def __init__(self, task: Task, queued_at: float) -> None:
+        self.id = task.id
+        self.action = task.action
+        self.lane = task.lane
+        self.priority = task.priority
+        self.status = task.status
+        self.queued_at = queued_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration_ms = None
+        if self.finished_at is not None and self.started_at is not None:
+            duration_ms = int((self.finished_at - self.started_at) * 1000)
+        return {
+            "id": self.id,
+            "action": self.action,
+            "lane": self.lane,
+            "priority": self.priority,
+            "status": self.status,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_ms": duration_ms,
+            "result": self.result,
+        }
+
+
+class TaskTable:
+    """按 task_id 索引的任务表：O(1) 查询；未结束任务常驻，已结束任务按 LRU 与存活时间淘汰。"""
+
+    def __init__(
+        self,
+        *,
+        max_finished: int = 1000,
+        max_age_seconds: float = 3600,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self._max_finished = max_finished
+        self._max_age = max_age_seconds
+        self._clock = clock
+        self._live: Dict[str, _Entry] = {}
+        self._finished: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_event(self, event: str, task: Task, ts: float) -> None:
+        task_id = task.id
+        with self._lock:
+            entry = self._live.get(task_id) or self._finished.get(task_id)
+            if entry is None:
+                entry = _Entry(task, ts)
+                self._live[task_id] = entry
+            entry.status = task.status
+
+            if event == "running":
+                entry.started_at = ts
+            elif event in TERMINAL_EVENTS:
+                entry.finished_at = ts
+                entry.result = task.result
+                self._live.pop(task_id, None)
+                self._finished[task_id] = entry
+                self._finished.move_to_end(task_id)
+                self._evict()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._live.get(task_id)
+            if entry is None:
+                entry = self._finished.get(task_id)
+                if entry is None:
+                    return None
+                if entry.finished_at + self._max_age < self._clock():
+                    del self._finished[task_id]
+                    return None
+                self._finished.move_to_end(task_id)
+            return entry.to_dict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._live) + len(self._finished)
+
+    def _evict(self) -> None:
+        while len(self._finished) > self._max_finished:
+            self._finished.popitem(last=False)
+        # 最久未访问的在前面；只清理头部已过期的，保持均摊 O(1)
+        cutoff = self._clock() - self._max_age
+        while self._finished:
+            oldest = next(iter(self._finished.values()))
+            if oldest.finished_at >= cutoff:
+                break
+            self._finished.popitem(last=False)
@@ -0,0 +1,196 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 墙上时钟可能被调整，等待最多这么久就重新计算最早到期时间
+MAX_WAIT_SECONDS = 60.0
+# 一次持锁最多触发的定时器数，避免大量同时到期时长时间占住队列锁
+MAX_FIRE_BATCH = 256
+# 堆中已取消条目超过一半（且不少于此数）时整体重建
+COMPACT_MIN_CANCELLED = 1024
+
+
+class Timer:
+    """一个延时或周期任务；repeat_ms 为 None 时只触发一次。"""
+
+    __slots__ = (
+        "id",
+        "action",
+        "params",
+        "due_at",
+        "repeat_ms",
+        "priority",
+        "deadline_ms",
+        "coalesce",
+        "runs",
+        "last_task_id",
+        "cancelled",
+        "validated",
+        "fingerprint",
+    )
+
+    def __init__(
+        self,
+        timer_id: str,
+        action: str,
+        params: Dict[str, Any],
+        due_at: float,
+        *,
+        repeat_ms: Optional[int] = None,
+        priority: int = 0,
+        deadline_ms: Optional[int] = None,
+        coalesce: bool = False,
+        validated: bool = False,
+    ) -> None:
+        self.id = timer_id
+        self.action = action
+        self.params = params
+        self.due_at = due_at
+        self.repeat_ms = repeat_ms
+        self.priority = priority
+        self.deadline_ms = deadline_ms
+        self.coalesce = coalesce
+        self.runs = 0
+        self.last_task_id: Optional[str] = None
+        self.cancelled = False
+        # 登记时参数已通过入口校验，触发出的任务不必在执行前再查一次
+        self.validated = validated
+        # coalesce 时由 QueueManager 在登记时算好，每次触发直接复用
+        self.fingerprint: Optional[Tuple[str, str]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "action": self.action,
+            "run_at": self.due_at,
+            "repeat_ms": self.repeat_ms,
+            "priority": self.priority,
+            "runs": self.runs,
+            "last_task_id": self.last_task_id,
+        }
+
+
+class TimerQueue:
+    """延时 / 周期任务：一个按到期时间排序的小顶堆，由一个定时线程驱动。
+
+    与 QueueManager 共用同一把锁，方法名带 _locked 的需在持锁时调用：
+    到期入队与 STOP 清空互斥，清空之后不会再有定时任务溜进队列。
+    取消只做标记（惰性删除），调度 O(log n)、取消 O(1)，十万级定时器也不需要逐个线程或轮询。
+    """
+
+    def __init__(
+        self,
+        lock: Any,
+        fire: Callable[[Timer], None],
+        *,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        # fire 在持锁时被调用，负责把到期的定时器转成队列任务
+        self._fire = fire
+        self._clock = clock
+        self._heap: List[Tuple[float, int, Timer]] = []
+        self._timers: Dict[str, Timer] = {}
+        self._cancelled = 0
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition(lock)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="timers", daemon=True)
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def schedule_locked(self, timer: Timer) -> None:
+        # 非有限的到期时间会让定时线程持锁空转，在入口拒绝
+        if not math.isfinite(timer.due_at):
+            raise ValueError("due_at must be finite")
+        self._timers[timer.id] = timer
+        self._push(timer)
+        # 只有最早到期时间提前时才需要叫醒定时线程
+        if self._heap[0][2] is timer:
+            self._wakeup.notify()
+
+    def get_locked(self, timer_id: str) -> Optional[Timer]:
+        return self._timers.get(timer_id)
+
+    def cancel_locked(self, timer_id: str) -> bool:
+        timer = self._timers.pop(timer_id, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        self._cancelled += 1
+        if self._cancelled >= COMPACT_MIN_CANCELLED and self._cancelled * 2 > len(self._heap):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+        return True
+
+    def clear_locked(self) -> int:
+        count = len(self._timers)
+        for timer in self._timers.values():
+            timer.cancelled = True
+        self._timers.clear()
+        self._heap.clear()
+        self._cancelled = 0
+        return count
+
+    def close_locked(self) -> None:
+        """让定时线程退出；未触发的定时器留在原处，之后不再触发。"""
+        self._closed = True
+        self._wakeup.notify()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """不持锁时使用：通知定时线程退出并等待它结束。"""
+        with self._wakeup:
+            self.close_locked()
+        self.join(timeout)
+
+    def _push(self, timer: Timer) -> None:
+        heapq.heappush(self._heap, (timer.due_at, next(self._sequence), timer))
+
+    def _run(self) -> None:
+        with self._wakeup:
+            while not self._closed:
+                heap = self._heap
+                while heap and heap[0][2].cancelled:
+                    heapq.heappop(heap)
+                    self._cancelled -= 1
+                if not heap:
+                    self._wakeup.wait()
+                    continue
+                now = self._clock()
+                delay = heap[0][0] - now
+                if delay > 0:
+                    self._wakeup.wait(min(delay, MAX_WAIT_SECONDS))
+                    continue
+
+                fired = 0
+                while heap and heap[0][0] <= now and fired < MAX_FIRE_BATCH:
+                    _, _, timer = heapq.heappop(heap)
+                    if timer.cancelled:
+                        self._cancelled -= 1
+                        continue
+                    fired += 1
+                    try:
+                        self._fire(timer)
+                    except Exception:
+                        # 单个定时器出错不能让定时线程退出；周期任务照常排下一次
+                        pass
+                    timer.runs += 1
+                    if timer.repeat_ms is None:
+                        del self._timers[timer.id]
+                        continue
+                    # 错过的周期直接跳过，不补跑，避免积压后一次性涌入
+                    timer.due_at += timer.repeat_ms / 1000.0
+                    if timer.due_at <= now:
+                        timer.due_at = now + timer.repeat_ms / 1000.0
+                    self._push(timer)
+                if fired >= MAX_FIRE_BATCH:
+                    # 短暂放锁，让 STOP 和入队请求插进来
+                    self._wakeup.wait(0)
@@ -0,0 +1,78 @@
+"""OpenAI 兼容的本地桩服务：可模拟延迟、错误状态码和断连，用于测试与压测。"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Union
+
+
+class StubLLMServer:
+    def __init__(self, *, latency: float = 0.0, content: str = '{"action":"ping","params":{}}') -> None:
+        self.latency = latency
+        self.content = content
+        # 依次消费：整数为返回的错误状态码，"drop" 为不响应直接断开
+        self.failures: List[Union[int, str]] = []
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _next_failure(self):
+        with self._lock:
+            self.requests += 1
+            return self.failures.pop(0) if self.failures else None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", "0"))
+                self.rfile.read(length)
+                failure = stub._next_failure()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failure == "drop":
+                    self.close_connection = True
+                    return
+                if failure is not None:
+                    self._send(failure, {"error": {"message": "stub failure"}})
+                    return
+                self._send(200, {"choices": [{"message": {"content": stub.content}}]})
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                return
+
+        return Handler
@@ -0,0 +1,152 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from journal import Journal  # noqa: E402
+from queue_manager import QueueManager  # noqa: E402
+
+
+class BlockingExecutor:
+    def __init__(self, duration: float) -> None:
+        self._duration = duration
+
+    def execute(self, action, params, cancel_event: threading.Event, validated=False):
+        if cancel_event.wait(self._duration):
+            return {"status": "stopped", "error_code": "stopped"}
+        return {"status": "ok", "error_code": None}
+
+
+def _queued(task_id: str, action: str = "ping") -> dict:
+    return {"event": "queued", "task_id": task_id, "action": action, "status": "queued",
+            "params": {}, "lane": "default"}
+
+
+def _event(task_id: str, event: str) -> dict:
+    return {"event": event, "task_id": task_id, "action": "ping", "status": event}
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+        self.directory = self._tmpdir.name
+
+    def test_replay_after_reopen(self) -> None:
+        journal = Journal(self.directory)
+        journal.append(_queued("done"))
+        journal.append(_event("done", "running"))
+        journal.append(_event("done", "completed"))
+        journal.append(_queued("was-running"))
+        journal.append(_event("was-running", "running"))
+        journal.append(_queued("waiting"))
+        self.assertTrue(journal.flush(timeout=2))
+        journal.close()
+
+        state = Journal(self.directory).recovered()
+        self.assertEqual(state.records, 6)
+        self.assertEqual([task["id"] for task in state.pending], ["waiting"])
+        self.assertEqual([task["id"] for task in state.interrupted], ["was-running"])
+        self.assertNotIn("record", state.pending[0])
+
+    def test_torn_last_line_is_ignored(self) -> None:
+        journal = Journal(self.directory)
+        journal.append(_queued("a"))
+        journal.close()
+        path = os.path.join(self.directory, sorted(os.listdir(self.directory))[-1])
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write('{"event": "queued", "task_')
+
+        state = Journal(self.directory).recovered()
+        self.assertEqual([task["id"] for task in state.pending], ["a"])
+
+    def test_rotation_and_compaction_keep_live_tasks(self) -> None:
+        journal = Journal(self.directory, segment_bytes=2000, max_segments=3, history_limit=20)
+        journal.append(_queued("long-lived"))
+        for index in range(300):
+            task_id = f"t{index}"
+            journal.append(_queued(task_id))
+            journal.append(_event(task_id, "completed"))
+            if index % 10 == 0:
+                journal.flush(timeout=2)
+        journal.close()
+
+        segments = [name for name in os.listdir(self.directory) if name.endswith(".jsonl")]
+        self.assertLessEqual(len(segments), 4)
+        state = Journal(self.directory, history_limit=20).recovered()
+        self.assertEqual([task["id"] for task in state.pending], ["long-lived"])
+        self.assertEqual(state.history[-1]["task_id"], "t299")
+
+    def test_compaction_keeps_running_state_of_old_tasks(self) -> None:
+        journal = Journal(self.directory, segment_bytes=2000, max_segments=3, history_limit=20)
+        journal.append(_queued("long-running"))
+        journal.append(_event("long-running", "running"))
+        for index in range(300):
+            task_id = f"t{index}"
+            journal.append(_queued(task_id))
+            journal.append(_event(task_id, "completed"))
+            if index % 10 == 0:
+                journal.flush(timeout=2)
+        journal.close()
+
+        # running 记录早已滑出历史窗口，回放时仍应标记为中断而不是重新排队
+        state = Journal(self.directory, history_limit=20).recovered()
+        self.assertEqual([task["id"] for task in state.interrupted], ["long-running"])
+        self.assertEqual(state.pending, [])
+
+    def test_queue_manager_restores_after_restart(self) -> None:
+        journal = Journal(self.directory)
+        manager = QueueManager(executor=BlockingExecutor(5.0), journal=journal)
+        self.addCleanup(manager.close)
+        running_id = manager.enqueue("sleep", {"ms": 5000})
+        waiting_id = manager.enqueue("ping", {})
+        deadline = time.time() + 1.0
+        while manager.status()["current"] is None and time.time() < deadline:
+            time.sleep(0.005)
+        journal.flush(timeout=2)
+        # 模拟崩溃：不再写 journal，也不做 STOP
+        journal.close()
+
+        restored = QueueManager(executor=BlockingExecutor(0.0), journal=Journal(self.directory))
+        self.addCleanup(restored.close)
+        interrupted = restored.logs(task_id=running_id, event="interrupted")
+        self.assertEqual(interrupted[0]["detail"], "process_restarted")
+
+        deadline = time.time() + 1.0
+        while not restored.logs(task_id=waiting_id, event="completed"):
+            if time.time() > deadline:
+                self.fail("restored task did not run")
+            time.sleep(0.005)
+        self.assertEqual(restored.logs(task_id=running_id, event="running")[0]["action"], "sleep")
+        manager.stop_all()
+
+    def test_log_seq_continues_after_restart(self) -> None:
+        journal = Journal(self.directory)
+        manager = QueueManager(executor=BlockingExecutor(0.0), journal=journal)
+        self.addCleanup(manager.close)
+        last_id = [manager.enqueue("ping", {}) for _ in range(10)][-1]
+        deadline = time.time() + 1.0
+        while not manager.logs(task_id=last_id, event="completed"):
+            if time.time() > deadline:
+                self.fail("tasks did not finish")
+            time.sleep(0.005)
+        last_seq = manager.last_log_seq()
+        manager.close()
+        journal.close()
+
+        # 只回放最近 5 条历史，编号仍接着重启前的最大 seq
+        restored = QueueManager(
+            executor=BlockingExecutor(0.0), journal=Journal(self.directory, history_limit=5)
+        )
+        self.addCleanup(restored.close)
+        self.assertEqual(restored.last_log_seq(), last_seq)
+        self.assertEqual(restored.logs()[-1]["seq"], last_seq)
+        self.assertEqual(restored.logs(since_seq=last_seq), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import LLMClient, LLMClientError  # noqa: E402
+from llm_stub import StubLLMServer  # noqa: E402
+
+PAYLOAD = {"model": "m", "messages": []}
+
+
+class LLMClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = StubLLMServer().start()
+        self.addCleanup(self.stub.stop)
+
+    def _client(self, **kwargs) -> LLMClient:
+        kwargs.setdefault("backoff", 0.01)
+        client = LLMClient(self.stub.base_url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_reuses_keep_alive_connection(self) -> None:
+        client = self._client()
+        for _ in range(5):
+            data = client.post_json("/chat/completions", PAYLOAD)
+            self.assertIn("choices", data)
+        self.assertEqual(self.stub.requests, 5)
+        self.assertEqual(self.stub.connections, 1)
+
+    def test_retries_retryable_status(self) -> None:
+        self.stub.failures = [503, 429]
+        data = self._client(max_retries=2).post_json("/chat/completions", PAYLOAD)
+        self.assertIn("choices", data)
+        self.assertEqual(self.stub.requests, 3)
+
+    def test_retries_dropped_connection(self) -> None:
+        self.stub.failures = ["drop"]
+        data = self._client(max_retries=1).post_json("/chat/completions", PAYLOAD)
+        self.assertIn("choices", data)
+
+    def test_gives_up_after_max_retries(self) -> None:
+        self.stub.failures = [500, 500, 500]
+        with self.assertRaises(LLMClientError):
+            self._client(max_retries=1).post_json("/chat/completions", PAYLOAD)
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_non_retryable_status_fails_fast(self) -> None:
+        self.stub.failures = [401]
+        with self.assertRaises(LLMClientError):
+            self._client(max_retries=3).post_json("/chat/completions", PAYLOAD)
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_total_deadline_bounds_retries(self) -> None:
+        self.stub.latency = 0.3
+        client = self._client(attempt_timeout=0.1, total_timeout=0.25, max_retries=5)
+        started = time.monotonic()
+        with self.assertRaises(LLMClientError):
+            client.post_json("/chat/completions", PAYLOAD)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_parser  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from llm_stub import StubLLMServer  # noqa: E402
+from parse_cache import ParseCache, normalize_text  # noqa: E402
+from phrase_matcher import match_phrase  # noqa: E402
+
+
+class ParseCacheTest(unittest.TestCase):
+    def test_normalize_text(self) -> None:
+        self.assertEqual(normalize_text("  １秒　 待って "), "1秒 待って")
+
+    def test_lru_eviction_and_counters(self) -> None:
+        cache = ParseCache(max_entries=2)
+        cache.put("a", "m", {"action": "ping", "params": {}})
+        cache.put("b", "m", {"action": "noop", "params": {}})
+        self.assertIsNotNone(cache.get("a", "m"))
+        cache.put("c", "m", {"action": "stop", "params": {}})
+
+        self.assertIsNone(cache.get("b", "m"))
+        self.assertIsNotNone(cache.get("a", "m"))
+        self.assertIsNone(cache.get("a", "other-model"))
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 2, "size": 2})
+
+    def test_ttl_expiry(self) -> None:
+        now = [1000.0]
+        cache = ParseCache(ttl_seconds=10, clock=lambda: now[0])
+        cache.put("a", "m", {"action": "ping", "params": {}})
+        now[0] += 9
+        self.assertIsNotNone(cache.get("a", "m"))
+        now[0] += 2
+        self.assertIsNone(cache.get("a", "m"))
+
+    def test_persistence_across_instances(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cache.json")
+            ParseCache(path=path).put("等一秒", "m", {"action": "sleep", "params": {"ms": 1000}})
+            reloaded = ParseCache(path=path)
+            self.assertEqual(
+                reloaded.get("等一秒", "m"), {"action": "sleep", "params": {"ms": 1000}}
+            )
+
+
+class ParseNaturalLanguageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        llm_parser.PARSE_CACHE.clear()
+        patcher = mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test", "OPENAI_MODEL": "m"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.stub = StubLLMServer().start()
+        self.addCleanup(self.stub.stop)
+        client = LLMClient(self.stub.base_url, backoff=0.01)
+        self.addCleanup(client.close)
+        client_patcher = mock.patch.object(llm_parser, "LLM_CLIENT", client)
+        client_patcher.start()
+        self.addCleanup(client_patcher.stop)
+
+    def test_repeat_phrase_hits_cache(self) -> None:
+        self.stub.content = '{"action":"stop","params":{}}'
+        first = llm_parser.parse_natural_language("帮我把现在的任务停掉")
+        second = llm_parser.parse_natural_language(" 帮我把现在的任务停掉 ")
+
+        self.assertEqual(first, {"action": "stop", "params": {}})
+        self.assertEqual(second, first)
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(llm_parser.PARSE_CACHE.stats()["hits"], 1)
+
+    def test_invalid_output_not_cached(self) -> None:
+        self.stub.content = '{"error":"unsupported_or_ambiguous_request"}'
+        llm_parser.parse_natural_language("支付")
+        llm_parser.parse_natural_language("支付")
+
+        self.assertEqual(self.stub.requests, 2)
+        self.assertEqual(llm_parser.PARSE_CACHE.stats()["size"], 0)
+
+    def test_upstream_failure_raises_parse_error(self) -> None:
+        self.stub.failures = [500, 500, 500]
+        with self.assertRaises(llm_parser.LLMParseError):
+            llm_parser.parse_natural_language("帮我看看现在几点")
+
+
+class PhraseMatcherTest(unittest.TestCase):
+    def test_documented_phrases(self) -> None:
+        cases = {
+            "暂停一下": {"action": "stop", "params": {}},
+            "ちょっと止めて": {"action": "stop", "params": {}},
+            "等一秒": {"action": "sleep", "params": {"ms": 1000}},
+            "1秒待って": {"action": "sleep", "params": {"ms": 1000}},
+            "测试一下": {"action": "ping", "params": {}},
+            "テストして": {"action": "ping", "params": {}},
+            "什么都别做": {"action": "noop", "params": {}},
+            "何もしないで": {"action": "noop", "params": {}},
+        }
+        for text, expected in cases.items():
+            self.assertEqual(match_phrase(text), expected, text)
+
+    def test_near_exact_and_durations(self) -> None:
+        self.assertEqual(match_phrase(" STOP! "), {"action": "stop", "params": {}})
+        self.assertEqual(match_phrase("请暂停。"), {"action": "stop", "params": {}})
+        self.assertEqual(match_phrase("等3秒"), {"action": "sleep", "params": {"ms": 3000}})
+        self.assertEqual(match_phrase("等待五秒"), {"action": "sleep", "params": {"ms": 5000}})
+        self.assertEqual(match_phrase("等0.3秒"), {"action": "sleep", "params": {"ms": 300}})
+        self.assertEqual(
+            match_phrase("500ミリ秒待って"), {"action": "sleep", "params": {"ms": 500}}
+        )
+        self.assertEqual(
+            match_phrase("２秒待ってください"), {"action": "sleep", "params": {"ms": 2000}}
+        )
+
+    def test_unmatched_falls_through(self) -> None:
+        # 超出 sleep 上限的时长也不在本地放行
+        cases = ("打开网页", "ブラウザを開いて", "等一下", "等十十秒", "等0.0001秒", "等10秒", "等1分钟", "")
+        for text in cases:
+            self.assertIsNone(match_phrase(text), text)
+
+    def test_stop_skips_network_and_api_key(self) -> None:
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}), mock.patch.object(
+            llm_parser.LLM_CLIENT, "post_json"
+        ) as post_json:
+            result = llm_parser.parse_natural_language("暂停一下")
+        self.assertEqual(result, {"action": "stop", "params": {}})
+        post_json.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from log_store import LogStore  # noqa: E402
+
+
+def _entry(task_id: str, event: str) -> dict:
+    return {"event": event, "task_id": task_id}
+
+
+class LogStoreTest(unittest.TestCase):
+    def test_seq_is_monotonic_and_capacity_bounded(self) -> None:
+        store = LogStore(capacity=3)
+        for index in range(5):
+            store.append(_entry(f"t{index}", "queued"))
+
+        entries = store.query()
+        self.assertEqual([entry["seq"] for entry in entries], [3, 4, 5])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.last_seq, 5)
+
+    def test_since_seq_and_limit(self) -> None:
+        store = LogStore(capacity=10)
+        for index in range(6):
+            store.append(_entry("t", f"e{index}"))
+
+        entries = store.query(since_seq=2, limit=2)
+        self.assertEqual([entry["seq"] for entry in entries], [3, 4])
+        self.assertEqual(store.query(since_seq=6), [])
+
+    def test_start_at_continues_numbering(self) -> None:
+        store = LogStore(capacity=10)
+        store.start_at(500)
+        store.append(_entry("t", "e0"))
+        store.append(_entry("t", "e1"))
+        self.assertEqual([entry["seq"] for entry in store.query()], [500, 501])
+        self.assertEqual([entry["seq"] for entry in store.query(task_id="t")], [500, 501])
+        self.assertEqual(len(store), 2)
+        with self.assertRaises(ValueError):
+            store.start_at(1000)
+
+    def test_task_index_drops_evicted_entries(self) -> None:
+        store = LogStore(capacity=4)
+        store.append(_entry("a", "queued"))
+        store.append(_entry("b", "queued"))
+        store.append(_entry("a", "running"))
+        store.append(_entry("a", "completed"))
+        store.append(_entry("b", "running"))
+
+        a_entries = store.query(task_id="a")
+        self.assertEqual([entry["event"] for entry in a_entries], ["running", "completed"])
+        self.assertEqual(store.query(task_id="a", event="completed")[0]["seq"], 4)
+        self.assertEqual(store.query(task_id="missing"), [])
+
+        for _ in range(4):
+            store.append(_entry("c", "queued"))
+        self.assertEqual(store.query(task_id="a"), [])
+        self.assertEqual(store.query(task_id="b"), [])
+
+    def test_record_returns_json_dicts_with_original_fields(self) -> None:
+        store = LogStore(capacity=4)
+        seq = store.record(1.5, "failed", "t", "notify", "failed", "tool_failed")
+
+        self.assertEqual(
+            store.query(),
+            [
+                {
+                    "ts": 1.5,
+                    "event": "failed",
+                    "task_id": "t",
+                    "action": "notify",
+                    "status": "failed",
+                    "detail": "tool_failed",
+                    "seq": seq,
+                }
+            ],
+        )
+        self.assertEqual(store.query(event="never-recorded"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from cancellation import CancelEvent  # noqa: E402
+from executor import Executor  # noqa: E402
+from macros import MacroError, MacroRegistry  # noqa: E402
+from skill_registry import SKILLS  # noqa: E402
+
+
+class MacroRegistryTest(unittest.TestCase):
+    def test_register_validates_every_step_once(self) -> None:
+        registry = MacroRegistry()
+        steps = [
+            {"action": "ping", "params": {}, "priority": 5},
+            {"action": "sleep", "params": {"ms": 10}},
+        ]
+        compiled = registry.register("warmup", steps)
+        steps[1]["params"]["ms"] = 999999
+        # 注册后的定义与调用方的对象无关，也不带调度字段
+        self.assertEqual(compiled[1], {"action": "sleep", "params": {"ms": 10}})
+        self.assertNotIn("priority", compiled[0])
+        self.assertEqual(registry.names(), {"warmup": ["ping", "sleep"]})
+
+        cases = [
+            ("bad name!", [{"action": "ping", "params": {}}], "macro_name_invalid", None),
+            ("empty", [], "macro_steps_required", None),
+            ("unknown", [{"action": "ping", "params": {}}, {"action": "rm", "params": {}}],
+             "action_not_allowed", 1),
+            ("stop", [{"action": "stop", "params": {}}], "stop_not_allowed_in_macro", 0),
+            # 白名单只查类型，skill 层的范围 / 允许列表检查也在注册时完成
+            ("long_sleep", [{"action": "sleep", "params": {"ms": 60000}}], "ms_out_of_range", 0),
+            ("bad_app", [{"action": "open_app", "params": {"app_name": "Mail"}}],
+             "app_not_allowed", 0),
+        ]
+        for name, bad_steps, code, index in cases:
+            with self.assertRaises(MacroError) as ctx:
+                registry.register(name, bad_steps)
+            self.assertEqual((ctx.exception.code, ctx.exception.index), (code, index))
+        self.assertIsNone(registry.get("unknown"))
+
+
+class MacroExecutionTest(unittest.TestCase):
+    def test_runs_steps_in_order_with_durations(self) -> None:
+        steps = MacroRegistry().register(
+            "m", [{"action": "ping", "params": {}}, {"action": "sleep", "params": {"ms": 20}}]
+        )
+        result = Executor().execute("macro", {"name": "m", "steps": steps}, CancelEvent())
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual([step["action"] for step in result["steps"]], ["ping", "sleep"])
+        self.assertGreaterEqual(result["steps"][1]["duration_ms"], 15)
+        self.assertEqual(result["params_redacted"], {"name": "m", "steps": ["ping", "sleep"]})
+
+    def test_registered_steps_skip_runtime_validation(self) -> None:
+        steps = MacroRegistry().register("m", [{"action": "ping", "params": {}}])
+        spec = SKILLS["ping"]
+        with mock.patch.object(spec, "validate", wraps=spec.validate) as validate:
+            result = Executor().execute("macro", {"name": "m", "steps": steps}, CancelEvent())
+        self.assertEqual(result["status"], "ok")
+        validate.assert_not_called()
+
+    def test_replayed_steps_are_validated(self) -> None:
+        # journal 回放出来的步骤是普通 dict，没有经过注册
+        registered = MacroRegistry().register("m", [{"action": "sleep", "params": {"ms": 10}}])
+        steps = json.loads(json.dumps(registered))
+        steps[0]["params"]["ms"] = 60000
+        result = Executor().execute("macro", {"name": "m", "steps": steps}, CancelEvent())
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["error_code"], "ms_out_of_range")
+
+    def test_stop_cancels_remaining_steps(self) -> None:
+        steps = MacroRegistry().register(
+            "m",
+            [
+                {"action": "sleep", "params": {"ms": 5000}},
+                {"action": "ping", "params": {}},
+            ],
+        )
+        cancel_event = CancelEvent()
+        threading.Timer(0.05, cancel_event.set).start()
+        result = Executor().execute("macro", {"name": "m", "steps": steps}, cancel_event)
+        self.assertEqual(result["status"], "stopped")
+        # 被中断的步骤之后不再执行
+        self.assertEqual([step["action"] for step in result["steps"]], ["sleep"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from metrics import MetricsRegistry  # noqa: E402
+
+
+class MetricsTest(unittest.TestCase):
+    def test_histogram_renders_cumulative_buckets(self) -> None:
+        registry = MetricsRegistry()
+        histogram = registry.histogram("t_seconds", "test", ("action",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, ("ping",))
+
+        text = registry.render()
+        self.assertIn("# TYPE t_seconds histogram", text)
+        self.assertIn('t_seconds_bucket{action="ping",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{action="ping",le="1"} 3', text)
+        self.assertIn('t_seconds_bucket{action="ping",le="+Inf"} 4', text)
+        self.assertIn('t_seconds_count{action="ping"} 4', text)
+
+    def test_counter_sums_thread_shards(self) -> None:
+        registry = MetricsRegistry()
+        counter = registry.counter("t_total", "test")
+
+        def work() -> None:
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.value(), 8000)
+
+    def test_disabled_registry_records_nothing(self) -> None:
+        registry = MetricsRegistry(enabled=False)
+        histogram = registry.histogram("t_seconds", "test")
+        histogram.observe(1.0)
+        self.assertEqual(histogram.count(), 0)
+        self.assertIsInstance(registry.lock("queue"), type(threading.Lock()))
+
+    def test_instrumented_lock_works_with_condition(self) -> None:
+        registry = MetricsRegistry()
+        lock = registry.lock("queue")
+        condition = threading.Condition(lock)
+        ready = []
+
+        def producer() -> None:
+            with condition:
+                ready.append(True)
+                condition.notify()
+
+        with condition:
+            threading.Thread(target=producer).start()
+            self.assertTrue(condition.wait_for(lambda: ready, timeout=1.0))
+
+        wait = registry.histogram("agent_lock_wait_seconds", "", ("lock",))
+        hold = registry.histogram("agent_lock_hold_seconds", "", ("lock",))
+        self.assertGreaterEqual(wait.count(("queue",)), 2)
+        self.assertEqual(wait.count(("queue",)), hold.count(("queue",)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from nl_dispatcher import ParseBusyError, ParseDispatcher  # noqa: E402
+
+
+class _BlockingParse:
+    """阻塞到 release() 的假 LLM，记录上游调用次数。"""
+
+    def __init__(self, result) -> None:
+        self.result = result
+        self.calls = []
+        self.started = threading.Event()
+        self._release = threading.Event()
+
+    def __call__(self, text):
+        self.calls.append(text)
+        self.started.set()
+        self._release.wait(5)
+        return self.result
+
+    def release(self) -> None:
+        self._release.set()
+
+
+class ParseDispatcherTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dispatched = []
+
+    def _dispatch(self, command):
+        self.dispatched.append(command)
+        return {"task_id": f"t{len(self.dispatched)}"}
+
+    def test_identical_texts_share_one_upstream_call(self) -> None:
+        parse = _BlockingParse({"action": "ping", "params": {}})
+        dispatcher = ParseDispatcher(parse, self._dispatch, workers=1)
+
+        first = dispatcher.submit("帮我 ping 一下")
+        second = dispatcher.submit("帮我  ｐｉｎｇ 一下")
+        self.assertEqual(first["status"], "pending")
+        self.assertTrue(second["coalesced"])
+        parse.release()
+
+        done = [dispatcher.get(t["ticket_id"], wait=2) for t in (first, second)]
+        self.assertEqual(len(parse.calls), 1)
+        # 每张票据各自派发一次
+        self.assertEqual([t["status"] for t in done], ["done", "done"])
+        self.assertEqual([t["outcome"]["task_id"] for t in done], ["t1", "t2"])
+        self.assertNotIn("_deadline", done[0])
+
+    def test_fast_path_completes_inline_and_errors_are_rejected(self) -> None:
+        dispatcher = ParseDispatcher(
+            lambda text: {"error": "unsupported_action"},
+            self._dispatch,
+            fast_parse=lambda text: {"action": "stop", "params": {}} if text == "停止" else None,
+            workers=1,
+        )
+        ticket = dispatcher.submit("停止")
+        self.assertEqual(ticket["status"], "done")
+        self.assertEqual(self.dispatched, [{"action": "stop", "params": {}}])
+
+        ticket = dispatcher.get(dispatcher.submit("做点别的")["ticket_id"], wait=2)
+        self.assertEqual(ticket["status"], "rejected")
+        self.assertEqual(ticket["error"], "unsupported_action")
+        self.assertIsNone(dispatcher.get("missing"))
+
+    def test_deadline_and_cancel_pending(self) -> None:
+        now = [0.0]
+        parse = _BlockingParse({"action": "ping", "params": {}})
+        dispatcher = ParseDispatcher(
+            parse, self._dispatch, workers=1, max_pending=1, deadline_seconds=5, clock=lambda: now[0]
+        )
+        running = dispatcher.submit("a")
+        self.assertTrue(parse.started.wait(2))
+        queued = dispatcher.submit("b")
+        with self.assertRaises(ParseBusyError):
+            dispatcher.submit("c")
+
+        now[0] = 10.0
+        self.assertEqual(dispatcher.get(running["ticket_id"])["status"], "expired")
+
+        now[0] = 0.0
+        self.assertEqual(dispatcher.cancel_pending(), [queued["ticket_id"]])
+        parse.release()
+        self.assertEqual(dispatcher.get(queued["ticket_id"], wait=0.2)["status"], "cancelled")
+        # 过期与取消的票据都不会派发
+        self.assertEqual(self.dispatched, [])
+
+    def test_coalesced_tickets_per_job_are_capped(self) -> None:
+        parse = _BlockingParse({"action": "ping", "params": {}})
+        dispatcher = ParseDispatcher(parse, self._dispatch, workers=1, max_tickets_per_job=3)
+        first = dispatcher.submit("a")
+        self.assertTrue(parse.started.wait(2))
+        dispatcher.submit("a")
+        dispatcher.submit("a")
+        with self.assertRaises(ParseBusyError):
+            dispatcher.submit("a")
+        parse.release()
+        self.assertEqual(dispatcher.get(first["ticket_id"], wait=2)["status"], "done")
+        self.assertEqual(len(parse.calls), 1)
+
+    def test_unfinished_ticket_does_not_block_eviction(self) -> None:
+        parse = _BlockingParse({"action": "ping", "params": {}})
+        dispatcher = ParseDispatcher(
+            parse,
+            self._dispatch,
+            fast_parse=lambda text: {"action": "noop", "params": {}} if text == "fast" else None,
+            workers=1,
+            max_tickets=2,
+        )
+        slow = dispatcher.submit("slow")
+        fast = [dispatcher.submit("fast") for _ in range(5)]
+        # 最早的票据还在解析中，之后已结束的票据照常淘汰
+        self.assertIsNone(dispatcher.get(fast[0]["ticket_id"]))
+        self.assertIsNotNone(dispatcher.get(fast[-1]["ticket_id"]))
+        self.assertIsNotNone(dispatcher.get(slow["ticket_id"]))
+        parse.release()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,51 @@
+import json
+import os
+import sys
+import threading
 import time
 import unittest
+from unittest import mock
 
-from src.queue_manager import QueueManager
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from executor import Executor  # noqa: E402
+from queue_manager import QueueFullError, QueueManager  # noqa: E402
+from skill_registry import SKILLS  # noqa: E402
+from task import Task  # noqa: E402
+
+
+class FakeExecutor:
+    """不调用 macOS 工具：每个任务等待 duration 秒或被取消。"""
+
+    def __init__(self, duration: float) -> None:
+        self._duration = duration
+
+    def execute(self, action, params, cancel_event: threading.Event, validated=False):
+        if cancel_event.wait(self._duration):
+            return {"status": "stopped", "error_code": "stopped"}
+        return {"status": "ok", "error_code": None}
+
+
+class RecordingExecutor:
+    """记录最近一次开始执行的 perf_counter 时间。"""
+
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.started_at = 0.0
+
+    def execute(self, action, params, cancel_event: threading.Event, validated=False):
+        self.started_at = time.perf_counter()
+        self.started.set()
+        return {"status": "ok", "error_code": None}
 
 
 class QueueManagerTest(unittest.TestCase):
     def test_stop_cancels_running_and_queued(self) -> None:
-        manager = QueueManager(step_delay=0.01, steps=50)
+        manager = QueueManager()
+        self.addCleanup(manager.close)
 
-        first_id = manager.enqueue("ping", {})
-        second_id = manager.enqueue("ping", {})
+        first_id = manager.enqueue("sleep", {"ms": 500})
+        second_id = manager.enqueue("sleep", {"ms": 500})
 
         self._wait_for_running(manager)
         result = manager.stop_all()
@@ -23,6 +59,278 @@ class QueueManagerTest(unittest.TestCase):
         self.assertIsNone(status["current"])
         self.assertEqual(status["queued"], [])
 
+    def test_pickup_latency_p99_under_5ms(self) -> None:
+        # 在执行器里用 perf_counter 打点：只量入队到 worker 开始执行，不受日志时间戳精度影响
+        executor = RecordingExecutor()
+        manager = QueueManager(executor=executor)
+        self.addCleanup(manager.close)
+
+        latencies = []
+        for _ in range(200):
+            executor.started.clear()
+            enqueued = time.perf_counter()
+            manager.enqueue("ping", {})
+            self.assertTrue(executor.started.wait(1.0))
+            latencies.append(executor.started_at - enqueued)
+
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        self.assertLess(p99, 0.005)
+
+    def test_admitted_tasks_skip_runtime_validation(self) -> None:
+        manager = QueueManager(executor=Executor())
+        self.addCleanup(manager.close)
+        spec = SKILLS["ping"]
+        with mock.patch.object(spec, "validate", wraps=spec.validate) as validate:
+            admitted = manager.submit("ping", {}, validated=True)["task_id"]
+            self._wait_for_event(manager, admitted, "completed")
+            validate.assert_not_called()
+            # 没有经过入口校验的任务（直接入队、journal 回放）执行前仍会校验
+            direct = manager.enqueue("ping", {})
+            self._wait_for_event(manager, direct, "completed")
+            validate.assert_called_once_with({})
+
+    def test_close_stops_workers_and_timer_thread(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0))
+        manager.enqueue("sleep", {"ms": 5000})
+        self._wait_for_running(manager)
+        threads = list(manager._workers) + [manager._timers._thread]
+
+        started = time.monotonic()
+        manager.close()
+        self.assertLess(time.monotonic() - started, 1.0)
+        # worker 与定时线程都已退出
+        for thread in threads:
+            self.assertFalse(thread.is_alive(), thread.name)
+
+    def test_status_snapshot_is_built_outside_queue_lock(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0))
+        self.addCleanup(manager.close)
+        manager.enqueue("sleep", {"ms": 5000})
+        self._wait_for_running(manager)
+        manager.enqueue("ping", {})
+        manager.enqueue("noop", {})
+
+        held = []
+        to_dict = Task.to_dict
+
+        def recording_to_dict(task):
+            held.append(manager._lock.locked())
+            return to_dict(task)
+
+        with mock.patch.object(Task, "to_dict", recording_to_dict):
+            status = manager.status()
+        self.assertEqual([task["action"] for task in status["queued"]], ["ping", "noop"])
+        self.assertEqual(held, [False, False, False])
+
+    def test_lanes_run_independently_and_fifo_within_lane(self) -> None:
+        manager = QueueManager(
+            executor=FakeExecutor(0.1),
+            lanes={
+                "ui": {"limit": 1, "actions": {"open_app"}},
+                "background": {"limit": 2, "actions": {"notify"}},
+            },
+        )
+        self.addCleanup(manager.close)
+
+        first_ui = manager.enqueue("open_app", {"app_name": "Notes"})
+        second_ui = manager.enqueue("open_app", {"app_name": "Safari"})
+        notify_id = manager.enqueue("notify", {"title": "t", "message": "m"})
+
+        self._wait_for_event(manager, second_ui, "completed")
+        completed = [entry["task_id"] for entry in manager.logs(event="completed")]
+        # notify 排在两个 UI 任务之后入队，却不必等 UI 通道
+        self.assertLess(completed.index(notify_id), completed.index(second_ui))
+        self.assertLess(completed.index(first_ui), completed.index(second_ui))
+
+    def test_parallel_lane_scales_throughput(self) -> None:
+        manager = QueueManager(lanes={"background": {"limit": 4, "actions": {"sleep"}}})
+        self.addCleanup(manager.close)
+
+        started = time.monotonic()
+        task_ids = [manager.enqueue("sleep", {"ms": 100}) for _ in range(4)]
+        for task_id in task_ids:
+            self._wait_for_event(manager, task_id, "completed")
+        elapsed = time.monotonic() - started
+
+        # 串行需要 4 * 0.1s，四个 worker 并行应接近 0.1s
+        self.assertLess(elapsed, 0.3)
+
+    def test_stop_cancels_every_lane(self) -> None:
+        manager = QueueManager(
+            executor=FakeExecutor(5.0),
+            lanes={
+                "ui": {"limit": 1, "actions": {"open_app"}},
+                "background": {"limit": 1, "actions": {"ping"}},
+            },
+        )
+        self.addCleanup(manager.close)
+
+        ui_running = manager.enqueue("open_app", {"app_name": "Notes"})
+        ui_queued = manager.enqueue("open_app", {"app_name": "Safari"})
+        bg_running = manager.enqueue("ping", {})
+        bg_queued = manager.enqueue("ping", {})
+        self._wait_for_event(manager, ui_running, "running")
+        self._wait_for_event(manager, bg_running, "running")
+
+        result = manager.stop_all()
+        self.assertEqual(sorted(result["cancelled_queue"]), sorted([ui_queued, bg_queued]))
+        self.assertEqual(sorted(result["running"]), sorted([ui_running, bg_running]))
+
+        self._wait_for_idle(manager)
+
+    def test_stop_interrupts_sleep_immediately(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+
+        task_id = manager.enqueue("sleep", {"ms": 5000})
+        self._wait_for_event(manager, task_id, "running")
+        stopped_at = time.time()
+        manager.stop_all()
+
+        self._wait_for_idle(manager)
+        entries = manager.logs(task_id=task_id, event="cancelled")
+        self.assertEqual(entries[-1]["detail"], "stop_requested")
+        self.assertEqual(manager.logs(task_id=task_id, event="completed"), [])
+        # 最后一条 cancelled 由 worker 在 sleep 返回后写入
+        self.assertLess(entries[-1]["ts"] - stopped_at, 0.02)
+
+    def test_failed_skill_logs_failed_event(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+
+        task_id = manager.enqueue("sleep", {"ms": -1})
+        self._wait_for_event(manager, task_id, "failed")
+        entry = manager.logs(task_id=task_id, event="failed")[0]
+        self.assertEqual(entry["detail"], "ms_out_of_range")
+
+    def test_priority_order_is_stable_within_level(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(0.05))
+        self.addCleanup(manager.close)
+
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+        low_a = manager.enqueue("ping", {})
+        low_b = manager.enqueue("ping", {})
+        high = manager.enqueue("notify", {"title": "t", "message": "m"}, priority=5)
+        self.assertEqual([task["id"] for task in manager.status()["queued"]], [high, low_a, low_b])
+
+        self._wait_for_event(manager, low_b, "completed")
+        started = [entry["task_id"] for entry in manager.logs(event="running")]
+        self.assertEqual(started, [blocker, high, low_a, low_b])
+
+    def test_expired_task_is_dropped(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(0.2))
+        self.addCleanup(manager.close)
+
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+        late = manager.enqueue("notify", {"title": "t", "message": "m"}, deadline_ms=50)
+        on_time = manager.enqueue("ping", {}, deadline_ms=5000)
+
+        self._wait_for_event(manager, on_time, "completed")
+        expired = manager.logs(task_id=late, event="expired")
+        self.assertEqual(expired[0]["detail"], "deadline_passed")
+        self.assertEqual(manager.logs(task_id=late, event="running"), [])
+
+    def test_status_snapshot_is_reused_until_state_changes(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0))
+        self.addCleanup(manager.close)
+
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+        first = manager.status_snapshot()
+        self.assertIs(manager.status_snapshot(), first)
+        self.assertIs(first.to_json(), first.to_json())
+        self.assertEqual(first.data["current"]["id"], blocker)
+
+        queued = manager.enqueue("ping", {})
+        second = manager.status_snapshot()
+        self.assertIsNot(second, first)
+        self.assertGreater(second.version, first.version)
+        self.assertEqual([task["id"] for task in second.data["queued"]], [queued])
+        # 旧快照不受后续变化影响
+        self.assertEqual(first.data["queued"], [])
+
+        manager.stop_all()
+        self.assertEqual(second.data["current"]["status"], "running")
+
+    def test_idempotency_key_returns_existing_task_within_window(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0), idempotency_window=0.1)
+        self.addCleanup(manager.close)
+
+        first = manager.submit("ping", {}, idempotency_key="retry-1")
+        again = manager.submit("ping", {}, idempotency_key="retry-1")
+        self.assertIsNone(first["deduplicated"])
+        self.assertEqual(again, {"task_id": first["task_id"], "deduplicated": "idempotency_key"})
+
+        time.sleep(0.15)
+        later = manager.submit("ping", {}, idempotency_key="retry-1")
+        self.assertNotEqual(later["task_id"], first["task_id"])
+        manager.stop_all()
+
+    def test_coalesce_merges_identical_queued_command(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0))
+        self.addCleanup(manager.close)
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+
+        params = {"title": "t", "message": "m"}
+        first = manager.submit("notify", params, coalesce=True)
+        merged = manager.submit("notify", {"message": "m", "title": "t"}, coalesce=True)
+        different = manager.submit("notify", {"title": "t", "message": "x"}, coalesce=True)
+        plain = manager.submit("notify", params)
+        self.assertEqual(merged, {"task_id": first["task_id"], "deduplicated": "coalesced"})
+        self.assertIsNone(different["deduplicated"])
+        self.assertIsNone(plain["deduplicated"])
+        self.assertEqual(len(manager.status()["queued"]), 3)
+
+        # 排队中的任务被清空后不再参与合并
+        manager.stop_all()
+        fresh = manager.submit("notify", params, coalesce=True)
+        self.assertIsNone(fresh["deduplicated"])
+        manager.stop_all()
+
+    def test_plain_submit_skips_coalesce_index(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0))
+        self.addCleanup(manager.close)
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+
+        params = {"title": "t", "message": "m"}
+        with mock.patch("queue_manager.json.dumps", wraps=json.dumps) as dumps:
+            manager.submit("notify", params)
+            manager.enqueue_many([{"action": "notify", "params": params}])
+        dumps.assert_not_called()
+        self.assertEqual(manager._queued_index, {})
+
+        # 未请求合并的排队任务不是合并目标
+        coalesced = manager.submit("notify", params, coalesce=True)
+        self.assertIsNone(coalesced["deduplicated"])
+        self.assertEqual(len(manager._queued_index), 1)
+        manager.stop_all()
+        self.assertEqual(manager._queued_index, {})
+
+    def test_max_queue_depth_rejects_with_retry_after(self) -> None:
+        manager = QueueManager(executor=FakeExecutor(5.0), max_queue_depth=2)
+        self.addCleanup(manager.close)
+        blocker = manager.enqueue("ping", {})
+        self._wait_for_event(manager, blocker, "running")
+        manager.enqueue("ping", {})
+        manager.enqueue("ping", {})
+
+        with self.assertRaises(QueueFullError) as raised:
+            manager.enqueue("ping", {})
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        with self.assertRaises(QueueFullError):
+            manager.enqueue_many([{"action": "ping", "params": {}}])
+        self.assertEqual(len(manager.status()["queued"]), 2)
+
+        # STOP 先清空队列，同一批内的入队不受之前的深度影响
+        result = manager.enqueue_many([{"action": "ping", "params": {}}] * 2, stop_first=True)
+        self.assertEqual(len(result["task_ids"]), 2)
+        manager.stop_all()
+
     def _wait_for_running(self, manager: QueueManager) -> None:
         deadline = time.time() + 1.0
         while time.time() < deadline:
@@ -31,6 +339,15 @@ class QueueManagerTest(unittest.TestCase):
             time.sleep(0.01)
         self.fail("timeout waiting for running task")
 
+    def _wait_for_event(self, manager: QueueManager, task_id: str, event: str) -> None:
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            for entry in manager.logs():
+                if entry["task_id"] == task_id and entry["event"] == event:
+                    return
+            time.sleep(0.001)
+        self.fail(f"timeout waiting for {event}")
+
     def _wait_for_idle(self, manager: QueueManager) -> None:
         deadline = time.time() + 1.0
         while time.time() < deadline:
@@ -0,0 +1,38 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from rate_limit import RateLimiter  # noqa: E402
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_burst_then_refill(self) -> None:
+        now = [0.0]
+        limiter = RateLimiter(2.0, 3, clock=lambda: now[0])
+
+        self.assertEqual([limiter.acquire("a") for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(limiter.acquire("a"), 0.5)
+        # 其他 key 有独立的桶
+        self.assertEqual(limiter.acquire("b"), 0.0)
+
+        now[0] = 0.5
+        self.assertEqual(limiter.acquire("a"), 0.0)
+        self.assertGreater(limiter.acquire("a"), 0.0)
+
+    def test_disabled_and_bounded_keys(self) -> None:
+        self.assertEqual(RateLimiter(0, 0).acquire("a"), 0.0)
+
+        now = [0.0]
+        limiter = RateLimiter(1.0, 1, max_keys=2, clock=lambda: now[0])
+        limiter.acquire("a")
+        limiter.acquire("b")
+        limiter.acquire("c")
+        # 最久未使用的 a 被淘汰，重新拿到满桶
+        self.assertEqual(limiter.acquire("a"), 0.0)
+        self.assertGreater(limiter.acquire("c"), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,488 @@
+import gzip
+import http.client
+import json
+import os
+import select
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import server  # noqa: E402
+from executor import Executor  # noqa: E402
+from journal import Journal  # noqa: E402
+from queue_manager import QueueManager  # noqa: E402
+from rate_limit import RateLimiter  # noqa: E402
+
+TOKEN = "test-token"
+
+
+class ServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        server.AUTH_TOKEN = TOKEN
+        server.SimpleHandler.log_message = lambda *args: None
+        server.RATE_LIMITER = RateLimiter(0, 0)
+        cls.httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler)
+        cls.port = cls.httpd.server_address[1]
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def setUp(self) -> None:
+        server.QUEUE_MANAGER.stop_all()
+        self._wait_for_idle()
+
+    def _wait_for_idle(self) -> None:
+        deadline = time.time() + 2.0
+        while True:
+            status = server.QUEUE_MANAGER.status()
+            if status["current"] is None and not status["queued"]:
+                return
+            if time.time() > deadline:
+                self.fail("timeout waiting for idle queue")
+            time.sleep(0.01)
+
+    def _request(self, method: str, path: str, body=None, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        all_headers = {"Authorization": f"Bearer {TOKEN}"}
+        all_headers.update(headers or {})
+        data = json.dumps(body) if body is not None else None
+        conn.request(method, path, body=data, headers=all_headers)
+        response = conn.getresponse()
+        payload = response.read()
+        conn.close()
+        return response, payload
+
+    def _enqueue_later(self, delay: float) -> None:
+        def run() -> None:
+            time.sleep(delay)
+            server.QUEUE_MANAGER.enqueue("ping", {})
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def test_events_requires_auth(self) -> None:
+        response, _ = self._request("GET", "/events", headers={"Authorization": ""})
+        self.assertEqual(response.status, 401)
+
+    def test_events_long_poll_returns_new_entries(self) -> None:
+        since = server.QUEUE_MANAGER.last_log_seq()
+        self._enqueue_later(0.05)
+
+        started = time.monotonic()
+        response, payload = self._request("GET", f"/events?since={since}&timeout_ms=2000")
+        elapsed = time.monotonic() - started
+
+        body = json.loads(payload)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body["data"][0]["event"], "queued")
+        self.assertEqual(body["next_seq"], body["data"][-1]["seq"])
+        self.assertLess(elapsed, 1.0)
+
+    def test_events_long_poll_times_out_empty(self) -> None:
+        since = server.QUEUE_MANAGER.last_log_seq()
+        response, payload = self._request("GET", f"/events?since={since}&timeout_ms=50")
+        body = json.loads(payload)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body["data"], [])
+        self.assertEqual(body["next_seq"], since)
+
+    def test_events_sse_stream(self) -> None:
+        since = server.QUEUE_MANAGER.last_log_seq()
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request(
+            "GET",
+            f"/events?since={since}",
+            headers={"Authorization": f"Bearer {TOKEN}", "Accept": "text/event-stream"},
+        )
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self._enqueue_later(0.05)
+
+        lines = []
+        while True:
+            line = response.fp.readline().decode("utf-8").rstrip("\n")
+            if not line:
+                break
+            lines.append(line)
+        conn.close()
+
+        self.assertEqual(lines[0], f"id: {since + 1}")
+        self.assertEqual(lines[1], "event: queued")
+        self.assertEqual(json.loads(lines[2][len("data: "):])["seq"], since + 1)
+
+    def test_events_sse_streams_are_capped(self) -> None:
+        headers = {"Authorization": f"Bearer {TOKEN}", "Accept": "text/event-stream"}
+        with mock.patch.object(server, "SSE_STREAM_SLOTS", threading.BoundedSemaphore(1)):
+            first = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            self.addCleanup(first.close)
+            first.request("GET", "/events", headers=headers)
+            self.assertEqual(first.getresponse().status, 200)
+
+            response, payload = self._request("GET", "/events", headers=headers)
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "1")
+        self.assertEqual(json.loads(payload)["error"], "sse_streams_exhausted")
+
+    def test_batch_enqueues_all_in_order(self) -> None:
+        since = server.QUEUE_MANAGER.last_log_seq()
+        batch = [
+            {"action": "ping", "params": {}},
+            {"action": "noop", "params": {}},
+            {"action": "sleep", "params": {"ms": 1}},
+        ]
+        response, payload = self._request("POST", "/commands", body=batch)
+        body = json.loads(payload)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(body["task_ids"]), 3)
+        self.assertIsNone(body["stop"])
+        queued = server.QUEUE_MANAGER.logs(since_seq=since, event="queued")
+        self.assertEqual([entry["task_id"] for entry in queued], body["task_ids"])
+
+    def test_batch_rejects_all_when_one_item_invalid(self) -> None:
+        since = server.QUEUE_MANAGER.last_log_seq()
+        batch = [{"action": "ping", "params": {}}, {"action": "open_app", "params": {}}]
+        response, payload = self._request("POST", "/commands", body=batch)
+        body = json.loads(payload)
+
+        self.assertEqual(response.status, 400)
+        self.assertEqual(body["error"], "open_app_requires_app_name")
+        self.assertEqual(body["index"], 1)
+        self.assertEqual(server.QUEUE_MANAGER.logs(since_seq=since, event="queued"), [])
+
+    def test_batch_stop_semantics(self) -> None:
+        response, payload = self._request(
+            "POST", "/commands", body=[{"action": "ping", "params": {}}, {"action": "stop", "params": {}}]
+        )
+        self.assertEqual(response.status, 400)
+        self.assertEqual(json.loads(payload)["error"], "stop_must_be_first")
+
+        blocker = server.QUEUE_MANAGER.enqueue("sleep", {"ms": 5000})
+        response, payload = self._request(
+            "POST", "/commands", body=[{"action": "stop", "params": {}}, {"action": "ping", "params": {}}]
+        )
+        body = json.loads(payload)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(body["task_ids"]), 1)
+        self.assertIn(blocker, body["stop"]["cancelled_queue"] + body["stop"]["running"])
+
+    def test_command_rejects_invalid_scheduling(self) -> None:
+        for body, error in (
+            ({"action": "ping", "params": {}, "priority": "high"}, "priority_must_be_integer"),
+            ({"action": "ping", "params": {}, "priority": 99}, "priority_out_of_range"),
+            ({"action": "ping", "params": {}, "deadline_ms": 0}, "deadline_ms_out_of_range"),
+        ):
+            response, payload = self._request("POST", "/command", body=body)
+            self.assertEqual(response.status, 400)
+            self.assertEqual(json.loads(payload)["error"], error)
+
+        response, payload = self._request(
+            "POST", "/command", body={"action": "ping", "params": {}, "priority": 3, "deadline_ms": 1000}
+        )
+        self.assertEqual(response.status, 200)
+
+    def test_command_idempotency_key(self) -> None:
+        command = {"action": "ping", "params": {}}
+        headers = {"Idempotency-Key": f"key-{time.time()}"}
+        _, payload = self._request("POST", "/command", body=command, headers=headers)
+        first = json.loads(payload)
+        _, payload = self._request("POST", "/command", body=command, headers=headers)
+        again = json.loads(payload)
+        self.assertIsNone(first["deduplicated"])
+        self.assertEqual(again["task_id"], first["task_id"])
+        self.assertEqual(again["deduplicated"], "idempotency_key")
+
+        response, payload = self._request(
+            "POST", "/command", body=dict(command, coalesce="yes")
+        )
+        self.assertEqual(response.status, 400)
+        self.assertEqual(json.loads(payload)["error"], "coalesce_must_be_boolean")
+
+    def test_rate_limit_returns_429_but_exempts_status_and_stop(self) -> None:
+        server.RATE_LIMITER = RateLimiter(0.5, 1)
+        try:
+            response, _ = self._request("GET", "/logs?limit=1")
+            self.assertEqual(response.status, 200)
+            response, payload = self._request("GET", "/logs?limit=1")
+            self.assertEqual(response.status, 429)
+            self.assertEqual(json.loads(payload)["error"], "rate_limited")
+            self.assertGreaterEqual(int(response.getheader("Retry-After")), 1)
+
+            self.assertEqual(self._request("GET", "/status")[0].status, 200)
+            self.assertEqual(self._request("POST", "/stop")[0].status, 200)
+            response, _ = self._request("POST", "/command", body={"action": "stop", "params": {}})
+            self.assertEqual(response.status, 200)
+        finally:
+            server.RATE_LIMITER = RateLimiter(0, 0)
+
+    def test_nl_ticket_fast_path_and_validation(self) -> None:
+        response, payload = self._request("POST", "/nl", body={"text": "ping"})
+        self.assertEqual(response.status, 200)
+        ticket = json.loads(payload)["data"]
+        self.assertEqual(ticket["status"], "done")
+        self.assertEqual(ticket["command"]["action"], "ping")
+        self.assertIn("task_id", ticket["outcome"])
+
+        response, payload = self._request("GET", f"/nl/{ticket['ticket_id']}?wait_ms=10")
+        self.assertEqual(json.loads(payload)["data"]["ticket_id"], ticket["ticket_id"])
+        self.assertEqual(self._request("GET", "/nl/missing")[0].status, 404)
+
+        response, payload = self._request("POST", "/nl", body={"text": " "})
+        self.assertEqual(response.status, 400)
+        self.assertEqual(json.loads(payload)["error"], "text_required")
+
+    def test_command_with_delay_creates_cancellable_timer(self) -> None:
+        response, payload = self._request(
+            "POST", "/command", body={"action": "ping", "params": {}, "delay_ms": 60000, "repeat_ms": 1000}
+        )
+        self.assertEqual(response.status, 200)
+        timer_id = json.loads(payload)["timer_id"]
+        self.assertEqual(json.loads(self._request("GET", f"/timers/{timer_id}")[1])["data"]["repeat_ms"], 1000)
+        self.assertEqual(self._request("POST", f"/timers/{timer_id}/cancel")[0].status, 200)
+        self.assertEqual(self._request("GET", f"/timers/{timer_id}")[0].status, 404)
+
+        for body, error in (
+            ({"action": "ping", "params": {}, "delay_ms": 1, "run_at": time.time()}, "run_at_and_delay_ms_are_exclusive"),
+            ({"action": "ping", "params": {}, "repeat_ms": 10}, "repeat_ms_out_of_range"),
+            ({"action": "stop", "params": {}, "delay_ms": 10}, "stop_cannot_be_scheduled"),
+        ):
+            response, payload = self._request("POST", "/command", body=body)
+            self.assertEqual(response.status, 400)
+            self.assertEqual(json.loads(payload)["error"], error)
+
+    def test_task_lookup(self) -> None:
+        task_id = server.QUEUE_MANAGER.enqueue("ping", {})
+        deadline = time.time() + 1.0
+        while True:
+            response, payload = self._request("GET", f"/tasks/{task_id}")
+            data = json.loads(payload)["data"]
+            if data["status"] == "completed" or time.time() > deadline:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(data["status"], "completed")
+        self.assertEqual(data["result"]["message"], "pong")
+        self.assertIsNotNone(data["started_at"])
+
+        response, _ = self._request("GET", "/tasks/does-not-exist")
+        self.assertEqual(response.status, 404)
+
+    def test_macro_register_and_run(self) -> None:
+        steps = [{"action": "ping", "params": {}}, {"action": "noop", "params": {}}]
+        response, payload = self._request("POST", "/macros", body={"name": "check", "steps": steps})
+        self.assertEqual(response.status, 200)
+        response, payload = self._request(
+            "POST", "/macros", body={"name": "bad", "steps": [{"action": "sleep", "params": {}}]}
+        )
+        self.assertEqual(json.loads(payload), {"ok": False, "error": "sleep_requires_ms", "index": 0})
+
+        response, payload = self._request("POST", "/macro/check")
+        task_id = json.loads(payload)["task_id"]
+        self._wait_for_idle()
+        data = json.loads(self._request("GET", f"/tasks/{task_id}")[1])["data"]
+        self.assertEqual(data["status"], "completed")
+        self.assertEqual([step["status"] for step in data["result"]["steps"]], ["ok", "ok"])
+
+        self.assertEqual(self._request("POST", "/macro/missing")[0].status, 404)
+
+    def test_status_conditional_get(self) -> None:
+        response, _ = self._request("GET", "/status")
+        etag = response.getheader("ETag")
+        self.assertIsNotNone(etag)
+
+        response, payload = self._request("GET", "/status", headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(payload, b"")
+
+        server.QUEUE_MANAGER.enqueue("ping", {})
+        response, payload = self._request("GET", "/status", headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+        self.assertTrue(json.loads(payload)["ok"])
+
+    def test_etags_do_not_match_after_restart(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(directory)
+            before = QueueManager(executor=Executor(), journal=journal)
+            self.addCleanup(before.close)
+            before.enqueue("ping", {})
+            with mock.patch.object(server, "QUEUE_MANAGER", before):
+                self._wait_for_idle()
+                etags = {
+                    path: self._request("GET", path)[0].getheader("ETag")
+                    for path in ("/status", "/logs")
+                }
+            before.close()
+            journal.close()
+
+            # 重启：同一份 journal 恢复出新的 QueueManager
+            after = QueueManager(executor=Executor(), journal=Journal(directory))
+            self.addCleanup(after.close)
+            with mock.patch.object(server, "QUEUE_MANAGER", after):
+                for path, etag in etags.items():
+                    response, _ = self._request("GET", path, headers={"If-None-Match": etag})
+                    self.assertEqual(response.status, 200, path)
+
+    def test_logs_etag_and_gzip(self) -> None:
+        for _ in range(20):
+            server.QUEUE_MANAGER.enqueue("noop", {})
+        self._wait_for_idle()
+        response, payload = self._request(
+            "GET", "/logs?limit=50", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(payload))["data"]), 50)
+
+        etag = response.getheader("ETag")
+        response, _ = self._request("GET", "/logs?limit=50", headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+
+        response, payload = self._request("GET", "/logs?limit=1", headers={"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(len(json.loads(payload)["data"]), 1)
+
+    def test_logs_limit_defaults_to_max(self) -> None:
+        query, error = server._parse_logs_query("")
+        self.assertEqual((query["limit"], error), (server.MAX_LOGS_LIMIT, ""))
+        query, _ = server._parse_logs_query("limit=5000")
+        self.assertEqual(query["limit"], server.MAX_LOGS_LIMIT)
+
+    def test_metrics_exposes_prometheus_text(self) -> None:
+        task_id = server.QUEUE_MANAGER.enqueue("ping", {})
+        self._request("GET", f"/tasks/{task_id}")
+        self._wait_for_idle()
+
+        response, payload = self._request("GET", "/metrics")
+        text = payload.decode("utf-8")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain"))
+        self.assertIn('agent_queue_depth{lane="ui"} 0', text)
+        self.assertIn('agent_task_run_seconds_count{action="ping"}', text)
+        self.assertIn('agent_http_request_seconds_count{method="GET",path="/tasks/{id}"}', text)
+        self.assertIn('agent_lock_hold_seconds_bucket{lock="queue",le="+Inf"}', text)
+
+        response, _ = self._request("GET", "/metrics", headers={"Authorization": ""})
+        self.assertEqual(response.status, 401)
+
+    def test_malformed_request_line_does_not_break_handler(self) -> None:
+        errors = []
+        self.httpd.handle_error = lambda request, address: errors.append(address)
+        self.addCleanup(delattr, self.httpd, "handle_error")
+        for raw in (b"GARBAGE\r\n\r\n", b"\r\n"):
+            with socket.create_connection(("127.0.0.1", self.port), timeout=5) as sock:
+                sock.sendall(raw)
+                sock.shutdown(socket.SHUT_WR)
+                while sock.recv(4096):
+                    pass
+        self.assertEqual(self._request("GET", "/status")[0].status, 200)
+        self.assertEqual(errors, [])
+
+    def test_keep_alive_reuses_connection_with_content_length(self) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        headers = {"Authorization": f"Bearer {TOKEN}"}
+        for path in ("/status", "/logs?limit=1", "/"):
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+            self.assertEqual(response.version, 11)
+            self.assertEqual(int(response.getheader("Content-Length")), len(payload))
+            self.assertFalse(response.will_close)
+        conn.close()
+
+    def test_unread_body_closes_connection(self) -> None:
+        response, _ = self._request(
+            "POST", "/command", body={"action": "ping", "params": {}}, headers={"Authorization": ""}
+        )
+        self.assertEqual(response.status, 401)
+        self.assertEqual(response.getheader("Connection"), "close")
+
+    def test_stop_bypasses_saturated_pool(self) -> None:
+        httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler, max_threads=1)
+        port = httpd.server_address[1]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        headers = {"Authorization": f"Bearer {TOKEN}"}
+        try:
+            # 占住唯一的线程：连上后不发请求，线程阻塞在读请求行上
+            holder = socket.create_connection(("127.0.0.1", port), timeout=5)
+            time.sleep(0.1)
+            # 请求行迟迟不到的连接在分拣线程里等待，不拖慢 accept 线程
+            idle = [socket.create_connection(("127.0.0.1", port), timeout=5) for _ in range(20)]
+
+            started = time.monotonic()
+            stopper = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            stopper.request("POST", "/stop", headers=headers)
+            response = stopper.getresponse()
+            response.read()
+            elapsed = time.monotonic() - started
+
+            self.assertEqual(response.status, 200)
+            self.assertTrue(response.will_close)
+            self.assertLess(elapsed, 0.5)
+            holder.close()
+            stopper.close()
+            for sock in idle:
+                sock.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_keepalive_released_when_pool_is_busy(self) -> None:
+        httpd = server.AgentHTTPServer(("127.0.0.1", 0), server.SimpleHandler, max_threads=1)
+        port = httpd.server_address[1]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/status", headers={"Authorization": f"Bearer {TOKEN}"})
+            response = conn.getresponse()
+            response.read()
+            # 唯一的线程正在处理这个请求，响应后关闭连接而不是空等下一个请求
+            self.assertTrue(response.will_close)
+            conn.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_overflow_connections_get_503_without_extra_threads(self) -> None:
+        baseline = threading.active_count()
+        httpd = server.AgentHTTPServer(
+            ("127.0.0.1", 0), server.SimpleHandler, max_threads=2, max_pending=2
+        )
+        port = httpd.server_address[1]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        sockets = []
+        try:
+            for _ in range(20):
+                sockets.append(socket.create_connection(("127.0.0.1", port), timeout=5))
+            # 等分拣超时：请求行一直不到的连接按普通连接排队，队列满则 503
+            time.sleep(server.TRIAGE_TIMEOUT_SECONDS + 0.5)
+            # 2 个池线程 + 分拣线程 + serve_forever；等待中的连接不占线程
+            self.assertLessEqual(threading.active_count() - baseline, 4)
+
+            readable, _, _ = select.select(sockets, [], [], 0)
+            rejected = 0
+            for sock in readable:
+                data = sock.recv(1024)
+                if data.startswith(b"HTTP/1.1 503"):
+                    rejected += 1
+                    self.assertIn(b"Retry-After: 1", data)
+            # 最多 2 个在池线程里、2 个在队列里，其余都被拒绝
+            self.assertGreaterEqual(rejected, 16)
+        finally:
+            for sock in sockets:
+                sock.close()
+            httpd.shutdown()
+            httpd.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from actions import ACTION_LANES, validate_command  # noqa: E402
+from llm_parser import _validate_output  # noqa: E402
+from skill_registry import SKILLS, compile_validator  # noqa: E402
+
+
+class CompiledValidatorTest(unittest.TestCase):
+    def test_rules_report_first_error_code(self) -> None:
+        validate = compile_validator(
+            {
+                "name": {"type": str, "required": "name_required", "max_length": (3, "too_long")},
+                "count": {"type": int, "required": "count_required", "range": ((1, 9), "bad_count")},
+            },
+            None,
+        )
+        self.assertIsNone(validate({"name": "abc", "count": 1, "extra": 1}))
+        self.assertEqual(validate({"name": " ", "count": 1}), "name_required")
+        self.assertEqual(validate({"name": "abcd", "count": 1}), "too_long")
+        # bool 不算 int
+        self.assertEqual(validate({"name": "a", "count": True}), "count_required")
+        self.assertEqual(validate({"name": "a", "count": 10}), "bad_count")
+        self.assertEqual(validate({"name": "a", "count": 1, "extra": 1}, strict=True), "unexpected_params")
+
+    def test_every_layer_shares_the_registry(self) -> None:
+        # /command 校验已包含原先只在 skill 内部做的范围 / 允许列表检查
+        self.assertEqual(
+            validate_command({"action": "sleep", "params": {"ms": 60000}}), (False, "ms_out_of_range")
+        )
+        self.assertEqual(
+            validate_command({"action": "open_url", "params": {"url": "file:///etc/passwd"}}),
+            (False, "url_not_allowed"),
+        )
+        self.assertEqual(
+            validate_command({"action": "screenshot", "params": {"x": 1}}),
+            (False, "screenshot_params_must_be_empty"),
+        )
+
+        self.assertEqual(
+            _validate_output('{"action":"sleep","params":{"ms":500}}'),
+            {"action": "sleep", "params": {"ms": 500}},
+        )
+        for content in (
+            '{"action":"open_app","params":{"app_name":"Notes"}}',
+            '{"action":"ping","params":{"x":1}}',
+            '{"action":"sleep","params":{"ms":"500"}}',
+            '{"action":["ping"],"params":{}}',
+        ):
+            self.assertEqual(_validate_output(content), {"error": "unsupported_or_ambiguous_request"}, content)
+
+        self.assertEqual(ACTION_LANES["ui"]["actions"], {"open_app", "open_url", "screenshot", "macro"})
+        self.assertNotIn("stop", ACTION_LANES["background"]["actions"])
+
+    def test_redaction_rules(self) -> None:
+        redacted = SKILLS["notify"].redact_params({"title": "t" * 100, "message": "m", "extra": 1})
+        self.assertEqual(redacted, {"title": "t" * 77 + "...", "message": "m"})
+        self.assertEqual(SKILLS["ping"].redact_params({"a": 1}), {"a": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
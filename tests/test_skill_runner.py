@@ -0,0 +1,97 @@
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from cancellation import CancelEvent  # noqa: E402
+from executor import Executor  # noqa: E402
+from skill_runner import SkillRunner  # noqa: E402
+import skills  # noqa: E402
+
+
+class SkillRunnerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmpdir.cleanup)
+
+    def _fake_binary(self, body: str) -> str:
+        path = os.path.join(self._tmpdir.name, f"fake_{len(os.listdir(self._tmpdir.name))}")
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write("#!/bin/sh\n" + body + "\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def _cancel_after(self, event: CancelEvent, delay: float) -> None:
+        timer = threading.Timer(delay, event.set)
+        timer.daemon = True
+        timer.start()
+
+    def test_successful_command(self) -> None:
+        runner = SkillRunner(binaries={"osascript": self._fake_binary("exit 0")})
+        result = Executor(runner).execute(
+            "notify", {"title": "t", "message": "m"}, CancelEvent()
+        )
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(result["message"], "notified")
+        self.assertIsNone(result["terminate_ms"])
+
+    def test_nonzero_exit_fails(self) -> None:
+        runner = SkillRunner(binaries={"open": self._fake_binary("exit 3")})
+        result = Executor(runner).execute("open_url", {"url": "https://example.com"}, CancelEvent())
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["error_code"], "command_failed")
+
+    def test_stop_terminates_hung_command(self) -> None:
+        runner = SkillRunner(binaries={"open": self._fake_binary("exec sleep 30")})
+        event = CancelEvent()
+        self._cancel_after(event, 0.1)
+
+        started = time.monotonic()
+        result = Executor(runner).execute("open_app", {"app_name": "Notes"}, event)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(result["status"], "stopped")
+        self.assertIsNotNone(result["terminate_ms"])
+        self.assertLess(elapsed, 1.0)
+
+    def test_sigterm_ignored_escalates_to_sigkill(self) -> None:
+        binary = self._fake_binary("trap '' TERM\nwhile true; do sleep 0.05; done")
+        runner = SkillRunner(binaries={"screencapture": binary}, term_grace=0.2)
+        event = CancelEvent()
+        self._cancel_after(event, 0.2)
+
+        started = time.monotonic()
+        outcome = runner.run([binary], event, timeout=30)
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(outcome.cancelled)
+        self.assertEqual(outcome.returncode, -9)
+        self.assertGreaterEqual(outcome.terminate_ms, 200)
+        self.assertLess(elapsed, 2.0)
+
+    def test_per_action_timeout(self) -> None:
+        runner = SkillRunner(binaries={"osascript": self._fake_binary("exec sleep 30")}, term_grace=0.2)
+        original = skills.ACTION_TIMEOUTS["notify"]
+        skills.ACTION_TIMEOUTS["notify"] = 0.1
+        self.addCleanup(skills.ACTION_TIMEOUTS.__setitem__, "notify", original)
+
+        result = Executor(runner).execute("notify", {"title": "t", "message": "m"}, CancelEvent())
+        self.assertEqual(result["status"], "failed")
+        self.assertEqual(result["error_code"], "timed_out")
+        self.assertIsNotNone(result["terminate_ms"])
+
+    def test_already_cancelled_does_not_spawn(self) -> None:
+        event = CancelEvent()
+        event.set()
+        outcome = SkillRunner().run(["/nonexistent/binary"], event, timeout=1)
+        self.assertTrue(outcome.cancelled)
+        self.assertIsNone(outcome.returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
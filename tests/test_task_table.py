@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from task import Task  # noqa: E402
+from task_table import TaskTable  # noqa: E402
+
+
+def _task(task_id: str, status: str, result=None) -> Task:
+    task = Task(task_id, "ping", {}, lane="default", status=status)
+    task.result = result
+    return task
+
+
+class TaskTableTest(unittest.TestCase):
+    def test_lifecycle_timestamps_and_result(self) -> None:
+        table = TaskTable(clock=lambda: 11.0)
+        table.on_event("queued", _task("a", "queued"), 10.0)
+        table.on_event("running", _task("a", "running"), 10.5)
+        self.assertEqual(table.get("a")["status"], "running")
+
+        table.on_event("completed", _task("a", "completed", {"status": "ok"}), 11.0)
+        entry = table.get("a")
+        self.assertEqual(entry["queued_at"], 10.0)
+        self.assertEqual(entry["started_at"], 10.5)
+        self.assertEqual(entry["finished_at"], 11.0)
+        self.assertEqual(entry["duration_ms"], 500)
+        self.assertEqual(entry["result"], {"status": "ok"})
+        self.assertIsNone(table.get("missing"))
+
+    def test_finished_entries_evicted_by_lru(self) -> None:
+        table = TaskTable(max_finished=2, clock=lambda: 0.0)
+        table.on_event("queued", _task("live", "queued"), 0.0)
+        for task_id in ("a", "b"):
+            table.on_event("completed", _task(task_id, "completed"), 0.0)
+        table.get("a")
+        table.on_event("completed", _task("c", "completed"), 0.0)
+
+        self.assertIsNone(table.get("b"))
+        self.assertIsNotNone(table.get("a"))
+        self.assertIsNotNone(table.get("live"))
+        self.assertEqual(len(table), 3)
+
+    def test_finished_entries_expire_by_age(self) -> None:
+        now = [100.0]
+        table = TaskTable(max_age_seconds=10, clock=lambda: now[0])
+        table.on_event("completed", _task("old", "completed"), 100.0)
+        now[0] = 111.0
+        self.assertIsNone(table.get("old"))
+
+        table.on_event("completed", _task("x", "completed"), 100.0)
+        table.on_event("completed", _task("y", "completed"), 111.0)
+        self.assertEqual(len(table), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from actions import validate_timer  # noqa: E402
+from queue_manager import QueueManager  # noqa: E402
+from timers import Timer, TimerQueue  # noqa: E402
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.fired = []
+
+    def __call__(self, timer) -> None:
+        self.fired.append((timer.id, time.time()))
+
+
+class TimerQueueTest(unittest.TestCase):
+    def test_fires_in_due_order_and_repeats(self) -> None:
+        recorder = _Recorder()
+        timers = TimerQueue(recorder.lock, recorder)
+        self.addCleanup(timers.close)
+        now = time.time()
+        with recorder.lock:
+            timers.schedule_locked(Timer("late", "ping", {}, now + 0.11))
+            timers.schedule_locked(Timer("early", "ping", {}, now + 0.02))
+            timers.schedule_locked(Timer("tick", "ping", {}, now + 0.06, repeat_ms=100))
+        time.sleep(0.4)
+        with recorder.lock:
+            order = [timer_id for timer_id, _ in recorder.fired]
+            self.assertEqual(order[:3], ["early", "tick", "late"])
+            self.assertGreaterEqual(order.count("tick"), 3)
+            # 一次性定时器触发后移除，周期定时器保留
+            self.assertEqual(len(timers), 1)
+            self.assertTrue(timers.cancel_locked("tick"))
+            self.assertFalse(timers.cancel_locked("tick"))
+
+    def test_cancel_is_lazy_and_heap_compacts(self) -> None:
+        recorder = _Recorder()
+        timers = TimerQueue(recorder.lock, recorder)
+        self.addCleanup(timers.close)
+        far = time.time() + 3600
+        with recorder.lock:
+            for index in range(5000):
+                timers.schedule_locked(Timer(str(index), "ping", {}, far + index))
+            for index in range(4000):
+                timers.cancel_locked(str(index))
+            self.assertEqual(len(timers), 1000)
+            # 已取消条目过半时整体重建，堆不会无限增长
+            self.assertLess(len(timers._heap), 2500)
+            self.assertEqual(timers.clear_locked(), 1000)
+        self.assertEqual(recorder.fired, [])
+
+
+class QueueManagerTimerTest(unittest.TestCase):
+    def _wait_for_event(self, manager: QueueManager, event: str, timeout: float = 2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            entries = manager.logs(event=event)
+            if entries:
+                return entries
+            time.sleep(0.01)
+        self.fail(f"timeout waiting for {event}")
+
+    def test_delayed_task_is_enqueued_when_due(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+        scheduled_at = time.time()
+        result = manager.schedule("ping", {}, delay_ms=50)
+
+        self.assertEqual(manager.get_timer(result["timer_id"])["action"], "ping")
+        entry = self._wait_for_event(manager, "completed")[0]
+        self.assertGreaterEqual(entry["ts"] - scheduled_at, 0.045)
+        self.assertIsNone(manager.get_timer(result["timer_id"]))
+
+    def test_stop_all_clears_pending_timers(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+        timer_id = manager.schedule("ping", {}, delay_ms=100, repeat_ms=1000)["timer_id"]
+        manager.schedule("ping", {}, run_at=time.time() + 0.1)
+
+        self.assertEqual(manager.stop_all()["cancelled_timers"], 2)
+        time.sleep(0.2)
+        self.assertEqual(manager.logs(), [])
+        self.assertFalse(manager.cancel_timer(timer_id))
+        self.assertEqual(manager.pending_timers(), 0)
+
+    def test_non_finite_run_at_is_rejected(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+        with self.assertRaises(ValueError):
+            manager.schedule("ping", {}, run_at=float("nan"))
+        # 定时线程没有被卡住，队列锁仍可用
+        self.assertEqual(manager.stop_all()["cancelled_timers"], 0)
+        self.assertEqual(validate_timer({"action": "ping", "run_at": float("nan")}), (False, "run_at_must_be_number"))
+        self.assertEqual(validate_timer({"action": "ping", "run_at": float("inf")}), (False, "run_at_must_be_number"))
+
+    def test_idempotency_key_returns_same_timer(self) -> None:
+        manager = QueueManager()
+        self.addCleanup(manager.close)
+        first = manager.schedule("ping", {}, delay_ms=60000, idempotency_key="k")
+        again = manager.schedule("ping", {}, delay_ms=60000, idempotency_key="k")
+        self.assertEqual(again["timer_id"], first["timer_id"])
+        self.assertEqual(again["deduplicated"], "idempotency_key")
+        self.assertEqual(manager.pending_timers(), 1)
+
+        # 同一个 key 用于普通入队时得到真正的 task_id
+        submitted = manager.submit("noop", {}, idempotency_key="k")
+        self.assertIsNone(submitted["deduplicated"])
+        self.assertNotEqual(submitted["task_id"], first["timer_id"])
+        self.assertIsNotNone(manager.get_task(submitted["task_id"]))
+
+
+if __name__ == "__main__":
+    unittest.main()